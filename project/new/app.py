@@ -9,12 +9,19 @@ import uuid
 import json
 import logging
 from data_handling import download_kaggle_dataset, generate_dataset_from_text, process_dataset_folder, auto_detect_task_type
-from preprocessing import preprocess_dataset, preprocess_image_dataset
-from model_training import train_models, train_image_classification_model, train_yolo_model, save_best_model
+from preprocessing import (preprocess_dataset, preprocess_image_dataset, save_preprocessor, load_preprocessor,
+                           apply_preprocessor, dataset_schema, held_out_rows)
+from model_training import (train_models, train_image_classification_model, train_yolo_model, save_best_model,
+                            load_training_metadata, previous_training_matches)
+from model_export import export_onnx_model
 from visualization import create_visualization, fig_to_base64
 from visualization_cnn import create_cnn_visualization  # Import the CNN visualization module
 from visualization_object import create_object_detection_visualization  # Import the object detection visualization module
-from utils import generate_loading_code, write_requirements_file, create_project_zip
+from explanation_service import get_explanation, get_explanations, client_wait
+from figure_encoding import FIGURES_DB_DIR, MIME_TYPES
+from metrics import predict_scores, classification_curves, curve_summary
+from utils import generate_loading_code, write_requirements_file, create_project_zip, bundle_etag
+from file_serving import serve_db_file
 from db_system_integration import apply_patches
 
 # Initialize Flask app
@@ -79,14 +86,20 @@ def process():
         # Get form data
         task_type = request.form.get('task_type', 'classification')
         text_prompt = request.form.get('text_prompt', '')
+        # Reuse the previous model when retraining on an expanded/altered version of a dataset
+        incremental = request.form.get('incremental', 'false').lower() == 'true'
+        # The dataset the expanded/altered version was derived from (returned by those endpoints)
+        parent_dataset = request.form.get('parent_dataset') or None
         
-        logger.info(f"Processing request - Task Type: {task_type}")
+        logger.info(f"Processing request - Task Type: {task_type}, Incremental: {incremental}")
         
         # Initialize variables
         df = None
         dataset_folder = None
         dataset_info = None
         detected_task_type = None
+        # Name of the dataset file the model is trained on (None for generated data)
+        dataset_id = None
         
         # Initialize variables
         df = None
@@ -116,6 +129,7 @@ def process():
     # Save the file directly to DATASETS_DIR instead of TEMP_DIR
             file_path = os.path.join(DATASETS_DIR, file.filename)
             file.save(file_path)
+            dataset_id = file.filename
     
             # Auto-detect task type from the file
             detected_task_type, df_loaded = auto_detect_task_type(file_path)
@@ -160,6 +174,7 @@ def process():
                 
                 try:
                     df = pd.read_csv(kaggle_file)
+                    dataset_id = os.path.basename(kaggle_file)
                     logger.info(f"Successfully loaded Kaggle dataset: {df.shape} samples")
                     logger.info(f"Kaggle dataset columns: {list(df.columns)}")
                     logger.info(f"Dataset downloaded from Kaggle: {kaggle_file}")
@@ -218,28 +233,65 @@ def process():
 
                 logger.info(f"Dataset analysis: {total_samples} samples, {feature_count} features")
 
+                schema = dataset_schema(df)
+                
+                # Incremental retraining only continues from the model of the parent dataset, and
+                # transforms the new version with that model's fitted preprocessing (no refit)
+                prepared = None
+                if incremental and previous_training_matches(load_training_metadata(MODELS_DIR), task_type,
+                                                             parent_dataset, schema):
+                    previous_preprocessor = load_preprocessor(MODELS_DIR)
+                    if previous_preprocessor is not None:
+                        try:
+                            prepared = apply_preprocessor(df, previous_preprocessor)
+                        except Exception as e:
+                            logger.info(f"Previous preprocessing does not fit the new data ({e}), running a full search")
+                
                 # Preprocess (tabular/NLP)
-                X_train, X_test, y_train, y_test, preprocessor, feature_names = preprocess_dataset(
-                    df, 'nlp' if task_type in ['nlp', 'text_classification'] else task_type
-                )
+                if prepared is None:
+                    prepared = preprocess_dataset(
+                        df, 'nlp' if task_type in ['nlp', 'text_classification'] else task_type
+                    )
+                    incremental = False
+                X_train, X_test, y_train, y_test, preprocessor, feature_names = prepared
 
                 # Train classical models for tabular/NLP
                 best_model, best_model_name, best_score, y_pred = train_models(
-                    X_train, y_train, X_test, y_test, task_type, MODELS_DIR
+                    X_train, y_train, X_test, y_test, task_type, MODELS_DIR, incremental=incremental,
+                    dataset_id=dataset_id, parent_dataset=parent_dataset, dataset_schema=schema
                 )
 
                 # Persist best model and create artifacts
                 save_best_model(best_model, MODELS_DIR)
                 model_file = "best_model.pkl"  # Standard name used by save_best_model
+                preprocessor_file = save_preprocessor(preprocessor, MODELS_DIR)
+                onnx_file = export_onnx_model(best_model, preprocessor, held_out_rows(df), MODELS_DIR)
                 generate_loading_code(model_file, feature_names, DOWNLOADS_DIR, is_image_model=False)
-                write_requirements_file(DOWNLOADS_DIR, is_tensorflow=False)
-                zip_path = create_project_zip(model_file, MODELS_DIR, DOWNLOADS_DIR, is_image_model=False)
+                write_requirements_file(DOWNLOADS_DIR, is_tensorflow=False, is_onnx=onnx_file is not None,
+                                        is_nlp=task_type in ['nlp', 'text_classification'])
+                zip_path = create_project_zip(model_file, MODELS_DIR, DOWNLOADS_DIR, is_image_model=False,
+                                              extra_files=[f for f in (preprocessor_file, onnx_file) if f])
 
                 data_preview = {
                     'columns': df.columns.tolist(),
                     'data': df.head(10).values.tolist()
                 }
 
+                model_info = {
+                    'model_name': best_model_name,
+                    'score': best_score,
+                    'onnx_export': onnx_file is not None
+                }
+                if task_type in ['classification', 'nlp', 'text_classification']:
+                    # Per-class ROC AUC / average precision from a single predict_proba pass
+                    try:
+                        y_proba = predict_scores(best_model, X_test)
+                        if y_proba is not None:
+                            curves = classification_curves(y_test, y_proba, getattr(best_model, 'classes_', None))
+                            model_info['curve_metrics'] = curve_summary(curves)
+                    except Exception as e:
+                        logger.warning(f"Could not compute ROC/PR metrics: {str(e)}")
+
                 return jsonify({
                     'success': True,
                     'message': 'Processing and training completed successfully',
@@ -255,10 +307,7 @@ def process():
                         'column_names': df.columns.tolist(),
                         'data_types': df.dtypes.astype(str).to_dict()
                     },
-                    'model_info': {
-                        'model_name': best_model_name,
-                        'score': best_score
-                    },
+                    'model_info': model_info,
                     'processing_steps': [
                         {'name': 'Data Loading', 'status': 'completed'},
                         {'name': 'Preprocessing', 'status': 'completed'},
@@ -301,7 +350,9 @@ def process():
                         learning_rate=0.001,
                         batch_size=32,
                         early_stopping_patience=3,
-                        return_history=True
+                        return_history=True,
+                        training_profile=request.form.get('training_profile'),
+                        backbone=request.form.get('backbone')
                     )
                     
                     # Create CNN visualizations using the specialized module
@@ -310,7 +361,8 @@ def process():
                         training_generator,
                         testing_generator,
                         history=history,
-                        user_prompt=text_prompt
+                        user_prompt=text_prompt,
+                        y_pred_probs=getattr(history, 'test_probabilities', None)
                     )
                     
                     # Model is automatically saved to MODELS_DIR/best_model.keras by the updated function
@@ -332,7 +384,8 @@ def process():
                         'model_info': {
                             'model_name': best_model_name,
                             'score': best_score,
-                            'task_type': task_type  # Add task type to model_info
+                            'task_type': task_type,  # Add task type to model_info
+                            'throughput': getattr(history, 'throughput', None)  # steps/sec for node sizing
                         },
                         'dataset_info': dataset_info,  # Use dataset_info instead of data_preview
                         'visualizations': {
@@ -358,7 +411,7 @@ def process():
                 try:
                     # Train YOLO model
                     best_model, best_model_name, best_score, metrics_info = train_yolo_model(
-                        dataset_folder, MODELS_DIR
+                        dataset_folder, MODELS_DIR, profile=request.form.get('yolo_profile')
                     )
                     
                     # Create visualizations using the specialized object detection module
@@ -391,7 +444,9 @@ def process():
                             'task_type': task_type,  # Add task type to model_info
                             'mAP': metrics_info.get('mAP50-95', metrics_info.get('mAP', 0.0)),
                             'precision': metrics_info.get('precision', 0.0),
-                            'recall': metrics_info.get('recall', 0.0)
+                            'recall': metrics_info.get('recall', 0.0),
+                            'profile': metrics_info.get('profile'),
+                            'throughput': metrics_info.get('throughput')  # images/sec and epoch time
                         },
                         'dataset_info': dataset_info,
                         'visualizations': {
@@ -421,36 +476,31 @@ def process():
 
 @app.route('/api/download/<filename>', methods=['GET'])
 def download(filename):
-    """Download a file from database or filesystem"""
+    """
+    Download a file from database or filesystem
+
+    Database files are streamed in chunks (or sent from the local download cache) with
+    ETag/If-None-Match and Range support; see file_serving.serve_db_file.
+    """
     try:
-        import tempfile
-        
         # Check if we're using database storage
         if db_fs is not None:
             try:
-                # Get the file from database
-                temp_dir = tempfile.gettempdir()
-                temp_path = os.path.join(temp_dir, filename)
-                
-                # Save to a temporary file
-                content = db_fs.get_file(filename, 'downloads')  # Always use 'downloads' directory name
-                
-                if not content:
-                    logger.error(f"File not found in database: {filename}")
-                    return jsonify({'error': f'File not found in database: {filename}'}), 404
-                
-                with open(temp_path, 'wb') as f:
-                    f.write(content)
-                
-                # Return the file and remove it after sending
-                return send_file(temp_path, as_attachment=True, download_name=filename)
+                # Always use 'downloads' directory name
+                response = serve_db_file(db_fs, filename, 'downloads', etag=bundle_etag(filename))
+                if response is None:
+                    raise FileNotFoundError(f"File not found: {filename} in downloads")
+                if bundle_etag(filename) and response.status_code in (200, 206):
+                    # Bundle names are content addresses, so the bytes behind them never change
+                    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+                return response
             except Exception as db_error:
                 logger.error(f"Database file retrieval error: {str(db_error)}")
                 
                 # Fallback to filesystem approach if database fails
                 if os.path.exists(os.path.join(DOWNLOADS_DIR, filename)):
                     logger.info(f"Falling back to filesystem for file: {filename}")
-                    return send_file(os.path.join(DOWNLOADS_DIR, filename), as_attachment=True)
+                    return send_file(os.path.join(DOWNLOADS_DIR, filename), as_attachment=True, conditional=True)
                 return jsonify({'error': f'Error retrieving file from database: {str(db_error)}'}), 404
         else:
             # Standard filesystem approach
@@ -459,11 +509,46 @@ def download(filename):
                 logger.error(f"File not found in filesystem: {file_path}")
                 return jsonify({'error': f'File not found: {filename}'}), 404
                 
-            return send_file(file_path, as_attachment=True)
+            return send_file(file_path, as_attachment=True, conditional=True)
     except Exception as e:
         logger.error(f"Download error: {str(e)}")
         return jsonify({'error': f'Error downloading file: {str(e)}'}), 500
 
+@app.route('/api/figures/<filename>', methods=['GET'])
+def figure(filename):
+    """Serve a visualization image stored in the database (FIGURE_STORAGE=db)"""
+    if db_fs is None or not filename.startswith('figure_') or not db_fs.file_exists(filename, FIGURES_DB_DIR):
+        return jsonify({'error': f'Figure not found: {filename}'}), 404
+
+    ext = filename.rsplit('.', 1)[-1]
+    response = send_file(io.BytesIO(db_fs.get_file(filename, FIGURES_DB_DIR)),
+                         mimetype=MIME_TYPES.get(ext, 'application/octet-stream'))
+    # Figure names are content hashes, so the bytes behind a URL never change
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/api/explanations', methods=['POST'])
+def explanations():
+    """
+    Fetch chart explanations by explanation_id.
+    Charts are returned before their explanations when EXPLANATIONS_DEFERRED is set;
+    the client polls here until every status is 'ready'.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        ids = payload.get('ids', [])
+        wait = payload.get('wait')  # Optional seconds to wait for pending explanations (capped)
+        return jsonify({'explanations': get_explanations(ids, wait=wait)})
+    except Exception as e:
+        logger.error(f"Explanation lookup error: {str(e)}")
+        return jsonify({'error': f'Error fetching explanations: {str(e)}'}), 500
+
+@app.route('/api/explanations/<explanation_id>', methods=['GET'])
+def explanation(explanation_id):
+    """Fetch a single chart explanation (?wait=seconds blocks until it is ready, capped)"""
+    wait = client_wait(request.args.get('wait'))
+    return jsonify(get_explanation(explanation_id, wait=wait))
+
     
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -27,6 +27,8 @@ import logging
 from scipy import stats
 import tempfile
 from db_file_system import DBFileSystem
+from yolo_dataset import dataset_content_hash
+from yolo_labels import build_label_index, save_label_index
 
 # Initialize the database file system
 db_fs = DBFileSystem()
@@ -730,7 +732,6 @@ def process_yolo_dataset_with_db(temp_dir, datasets_dir):
     
     # Initialize stats collection
     dataset_stats = {}
-    class_counts = {}
     
     # Find data.yaml file in the dataset folder
     yaml_files = [f for f in os.listdir(temp_dir) if f.endswith('.yaml')]
@@ -795,23 +796,6 @@ def process_yolo_dataset_with_db(temp_dir, datasets_dir):
             dataset_stats[dir_type]['labels'] = len(label_files)
             folder_structure.append(f"│   ├── labels/ ({len(label_files)} files)")
             
-            # Analyze labels to find classes if not already known
-            if class_names is None:
-                class_counts[dir_type] = set()
-                for label_file in label_files:
-                    try:
-                        with open(os.path.join(labels_dir, label_file), 'r') as f:
-                            for line in f:
-                                parts = line.strip().split()
-                                if parts and len(parts) >= 5:  # YOLO format needs at least 5 values
-                                    try:
-                                        class_id = int(parts[0])
-                                        class_counts[dir_type].add(class_id)
-                                    except ValueError:
-                                        pass
-                    except Exception as e:
-                        print(f"Error reading label file {label_file}: {e}")
-    
     # If validation directory is missing, create it from training
     if 'train' in found_dirs and 'val' not in found_dirs:
         print("Creating validation directory from training data")
@@ -873,33 +857,10 @@ def process_yolo_dataset_with_db(temp_dir, datasets_dir):
             folder_structure.append(f"│   ├── images/ ({len(val_images)} files)")
             folder_structure.append(f"│   ├── labels/ ({dataset_stats['val']['labels']} files)")
     
-    # Create or update data.yaml
-    # Combine all found class IDs from all directories
-    all_classes = set()
-    for classes in class_counts.values():
-        all_classes.update(classes)
-    
-    # If no classes found but we have directories, try harder to find them
-    if not all_classes and found_dirs:
-        print("No classes detected automatically, checking all label files...")
-        for dir_path in found_dirs.values():
-            labels_dir = os.path.join(dir_path, 'labels')
-            if os.path.exists(labels_dir):
-                for label_file in os.listdir(labels_dir):
-                    if label_file.endswith('.txt'):
-                        try:
-                            with open(os.path.join(labels_dir, label_file), 'r') as f:
-                                for line in f:
-                                    parts = line.strip().split()
-                                    if parts and len(parts) >= 5:
-                                        try:
-                                            class_id = int(parts[0])
-                                            all_classes.add(class_id)
-                                        except ValueError:
-                                            pass
-                        except Exception as e:
-                            print(f"Error scanning label file {label_file}: {e}")
-    
+    # Index every label once (image, class, box); class ids and later visualizations come from it
+    label_index = build_label_index(temp_dir, [os.path.basename(p) for p in found_dirs.values()])
+    all_classes = set(int(c) for c in np.unique(label_index['class_id']) if c >= 0)
+
     # If we still can't find classes, assume at least one class
     if not all_classes:
         all_classes = {0}
@@ -957,6 +918,14 @@ def process_yolo_dataset_with_db(temp_dir, datasets_dir):
     
     # Also save the data.yaml file separately for easy access
     db_fs.save_file(yaml_path, 'datasets')
+
+    # Store the label index with the hash staging computes for this archive, so it is reused there
+    try:
+        dataset_hash = dataset_content_hash(db_fs.content_hash('data.yaml', 'datasets'),
+                                            db_fs.content_hash('yolo_dataset.zip', 'datasets'))
+        save_label_index(label_index, dataset_hash)
+    except Exception as e:
+        print(f"Error saving label index: {e}")
     
     # Add dataset statistics
     folder_structure.append("└── Dataset Statistics:")
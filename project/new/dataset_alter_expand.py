@@ -15,6 +15,7 @@ import requests
 from datetime import datetime, timedelta
 from db_file_system import DBFileSystem
 from db_system_integration import apply_patches
+from file_serving import serve_db_file
 from PIL import Image
 import zipfile
 
@@ -472,6 +473,9 @@ def expand_dataset():
             "success": True,
             "message": f"Dataset expanded successfully! Added {num_samples} new rows.",
             "expanded_filename": expanded_filename,
+            "parent_dataset": file_name,
+            # Rows were only appended, so the previous model can be updated instead of re-searched
+            "incremental_training": True,
             "previewData": preview_data,
             "columns": columns_with_types,
             "original_rows": len(df),
@@ -567,6 +571,9 @@ def alter_dataset():
             "success": True,
             "message": f"Dataset altered successfully!",
             "altered_filename": altered_filename,
+            "parent_dataset": file_name,
+            # Incremental retraining needs the same columns as the previous version
+            "incremental_training": not changes["columns_added"] and not changes["columns_removed"],
             "originalPreviewData": original_preview,
             "alteredPreviewData": preview_data,
             "columns": columns_with_types,
@@ -622,27 +629,10 @@ def expand_images():
 def download_file(filename):
     """Download file from the database"""
     try:
-        # Check if file exists in database
-        if not db_fs.file_exists(filename, DATASET_DIR):
+        # Streamed in chunks with Range support; see file_serving.serve_db_file
+        response = serve_db_file(db_fs, filename, DATASET_DIR)
+        if response is None:
             return jsonify({"error": "File not found in database"}), 404
-        
-        # Get file content from database
-        file_content = db_fs.get_file(filename, DATASET_DIR)
-        
-        # Create a temporary file to serve
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_file.write(file_content)
-        temp_file.close()
-        
-        # Send the file
-        response = send_file(temp_file.name, as_attachment=True, download_name=filename)
-        
-        # Delete the temporary file after sending
-        @response.call_on_close
-        def cleanup():
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-        
         return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
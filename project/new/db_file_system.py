@@ -2,12 +2,19 @@
 
 import sqlite3
 import os
+import hashlib
 import tempfile
 import datetime
 import shutil
 import mimetypes
 from contextlib import contextmanager
 
+# Chunk size for streaming blobs in and out of the database
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Data written through save_chunks stays in memory up to this size, then spills to a temp file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
 class DBFileSystem:
     """
     A class that provides file system-like operations but uses a SQLite database
@@ -48,6 +55,12 @@ class DBFileSystem:
         )
         ''')
         
+        # sha256 of the content, stored on every write (ETags, cache keys, change detection);
+        # databases created before the column existed get it added here
+        cursor.execute('PRAGMA table_info(files)')
+        if 'content_hash' not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE files ADD COLUMN content_hash TEXT')
+        
         # Create indexes
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_directory ON files(directory_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_directories_parent ON directories(parent_id)')
@@ -157,6 +170,7 @@ class DBFileSystem:
         """
         # Get mime type
         mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        content_hash = hashlib.sha256(content).hexdigest()
         
         # Get directory ID
         directory_id = self._get_directory_id(directory_name)
@@ -174,20 +188,225 @@ class DBFileSystem:
                 file_id = existing_file[0]
                 cursor.execute('''
                 UPDATE files 
-                SET content = ?, mime_type = ?, updated_at = ?
+                SET content = ?, mime_type = ?, updated_at = ?, content_hash = ?
                 WHERE id = ?
-                ''', (content, mime_type, datetime.datetime.now(), file_id))
+                ''', (content, mime_type, datetime.datetime.now(), content_hash, file_id))
             else:
                 # Insert new file
                 cursor.execute('''
-                INSERT INTO files (filename, directory_id, content, mime_type)
-                VALUES (?, ?, ?, ?)
-                ''', (filename, directory_id, content, mime_type))
+                INSERT INTO files (filename, directory_id, content, mime_type, content_hash)
+                VALUES (?, ?, ?, ?, ?)
+                ''', (filename, directory_id, content, mime_type, content_hash))
                 file_id = cursor.lastrowid
             
             conn.commit()
             return file_id
     
+    def save_chunks(self, chunks, filename, directory_name, replace=True):
+        """
+        Save a file produced as a stream of byte chunks (e.g. a zip being written)
+
+        The chunks are spooled (in memory up to SPOOL_MAX_SIZE, then on disk) and copied
+        into a preallocated blob chunk by chunk, so the content is never held as one bytes object.
+        If the iterable raises, the error propagates and no row is written or replaced.
+
+        Args:
+            chunks: Iterable of bytes
+            filename: Name of the file
+            directory_name: Name of the directory (datasets, models, downloads, runs)
+            replace: If True, replace existing file with same name
+
+        Returns:
+            file_id: ID of the file in the database
+        """
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+            return self.save_stream(spool, filename, directory_name, replace)
+
+    def save_stream(self, fileobj, filename, directory_name, replace=True):
+        """
+        Save the content of a seekable binary file object in chunks
+
+        Args:
+            fileobj: File object; its whole content is saved
+            filename: Name of the file
+            directory_name: Name of the directory (datasets, models, downloads, runs)
+            replace: If True, replace existing file with same name
+
+        Returns:
+            file_id: ID of the file in the database
+        """
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(0)
+
+        mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        directory_id = self._get_directory_id(directory_name)
+
+        with self._get_connection() as conn:
+            if not hasattr(conn, 'blobopen'):
+                # Incremental blob I/O needs Python 3.11+
+                return self.save_file_content(fileobj.read(), filename, directory_name, replace)
+
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM files WHERE filename = ? AND directory_id = ?',
+                        (filename, directory_id))
+            existing_file = cursor.fetchone()
+
+            # Allocate the blob, then fill it in place
+            if existing_file and replace:
+                file_id = existing_file[0]
+                cursor.execute('''
+                UPDATE files
+                SET content = zeroblob(?), mime_type = ?, updated_at = ?
+                WHERE id = ?
+                ''', (size, mime_type, datetime.datetime.now(), file_id))
+            else:
+                cursor.execute('''
+                INSERT INTO files (filename, directory_id, content, mime_type)
+                VALUES (?, ?, zeroblob(?), ?)
+                ''', (filename, directory_id, size, mime_type))
+                file_id = cursor.lastrowid
+
+            content_hash = hashlib.sha256()
+            if size:
+                with conn.blobopen('files', 'content', file_id) as blob:
+                    while True:
+                        chunk = fileobj.read(STREAM_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        blob.write(chunk)
+                        content_hash.update(chunk)
+            cursor.execute('UPDATE files SET content_hash = ? WHERE id = ?',
+                        (content_hash.hexdigest(), file_id))
+
+            conn.commit()
+            return file_id
+
+    def file_info(self, filename, directory_name):
+        """
+        Size, last modification time and content hash of a file, without reading its content
+
+        Returns:
+            Dictionary with size (bytes), updated_at and content_hash (sha256, None for files
+            stored before hashes were recorded; see content_hash), or None if the file does not exist
+        """
+        directory_id = self._get_directory_id(directory_name)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT length(content), updated_at, content_hash FROM files
+            WHERE filename = ? AND directory_id = ?
+            ''', (filename, directory_id))
+            result = cursor.fetchone()
+
+        if not result:
+            return None
+        return {'size': result[0] or 0, 'updated_at': result[1], 'content_hash': result[2]}
+
+    def file_infos(self, directory_name):
+        """
+        file_info of every file in a directory, with one query and without reading content
+
+        Returns:
+            Dictionary {filename: {size, updated_at, content_hash}}
+        """
+        directory_id = self._get_directory_id(directory_name)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT filename, length(content), updated_at, content_hash FROM files
+            WHERE directory_id = ?
+            ORDER BY filename
+            ''', (directory_id,))
+            rows = cursor.fetchall()
+
+        return {row[0]: {'size': row[1] or 0, 'updated_at': row[2], 'content_hash': row[3]} for row in rows}
+
+    def content_hash(self, filename, directory_name):
+        """
+        sha256 of a file's content, or None if the file does not exist
+
+        The hash is recorded on every write; for files stored before that it is computed
+        once (reading the content in chunks) and saved.
+        """
+        info = self.file_info(filename, directory_name)
+        if info is None:
+            return None
+        if info['content_hash']:
+            return info['content_hash']
+
+        digest = hashlib.sha256()
+        for chunk in self.read_chunks(filename, directory_name):
+            digest.update(chunk)
+        directory_id = self._get_directory_id(directory_name)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # Only if the file was not rewritten in the meantime
+            cursor.execute('''
+            UPDATE files SET content_hash = ?
+            WHERE filename = ? AND directory_id = ? AND content_hash IS NULL AND updated_at IS ?
+            ''', (digest.hexdigest(), filename, directory_id, info['updated_at']))
+            conn.commit()
+        return digest.hexdigest()
+
+    def read_chunks(self, filename, directory_name, start=0, end=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Read a file from the database in chunks
+
+        Args:
+            filename: Name of the file to read
+            directory_name: Name of the directory (datasets, models, downloads, runs)
+            start: First byte to read
+            end: Byte after the last one to read (None reads to the end)
+            chunk_size: Maximum size of each chunk
+
+        Yields:
+            Byte chunks; memory use stays at one chunk regardless of the file size
+        """
+        directory_id = self._get_directory_id(directory_name)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT id, length(content), updated_at, content_hash FROM files
+            WHERE filename = ? AND directory_id = ?
+            ''', (filename, directory_id))
+            result = cursor.fetchone()
+        if not result:
+            raise FileNotFoundError(f"File not found: {filename} in {directory_name}")
+
+        file_id, size, version = result[0], result[1] or 0, result[2:]
+        end = size if end is None else min(end, size)
+        position = start
+
+        # Every chunk is read in its own short transaction, so a slow consumer (e.g. an HTTP
+        # download) never holds a read lock that would block writers between chunks
+        while position < end:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT updated_at, content_hash FROM files WHERE id = ?', (file_id,))
+                current = cursor.fetchone()
+                # A hash filled in later for an old file (content_hash()) is not a change
+                if current is None or current[0] != version[0] or (version[1] and current[1] != version[1]):
+                    raise IOError(f"File changed while being read: {filename} in {directory_name}")
+                length = min(chunk_size, end - position)
+                if hasattr(conn, 'blobopen'):
+                    with conn.blobopen('files', 'content', file_id, readonly=True) as blob:
+                        blob.seek(position)
+                        chunk = blob.read(length)
+                else:
+                    # substr() on a blob counts bytes (1-based)
+                    cursor.execute('SELECT substr(content, ?, ?) FROM files WHERE id = ?',
+                                (position + 1, length, file_id))
+                    chunk = bytes(cursor.fetchone()[0] or b'')
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+
     def get_file(self, filename, directory_name, save_to_disk=False):
         """
         Retrieve a file from the database
@@ -271,6 +490,22 @@ class DBFileSystem:
             
             return cursor.fetchone() is not None
     
+    def touch(self, filename, directory_name):
+        """Set a file's updated_at to now without rewriting it (marks a cached file as recently used)"""
+        directory_id = self._get_directory_id(directory_name)
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+            UPDATE files SET updated_at = CURRENT_TIMESTAMP
+            WHERE filename = ? AND directory_id = ?
+            ''', (filename, directory_id))
+            
+            touched = cursor.rowcount > 0
+            conn.commit()
+            return touched
+    
     def delete_file(self, filename, directory_name):
         """Delete a specific file from the directory"""
         directory_id = self._get_directory_id(directory_name)
@@ -10,11 +10,11 @@ import time
 from pathlib import Path
 import io
 import yaml
-import base64
 import logging
 from werkzeug.utils import secure_filename
 from db_file_system import DBFileSystem
 from db_system_integration import apply_patches
+from github_upload import GitHubUploadError, collect_files, create_session, upload_directory
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -208,152 +208,43 @@ process.wait()
         logger.warning("No Streamlit import found in load_model.py - You may need to add streamlit code")
         return False
 
-def push_files_to_github(repo_url, token, files_dir):
+def push_files_to_github(repo_url, token, files_dir, branch="main"):
     """
-    Push files to GitHub repository, skipping virtual environments and other unnecessary files
+    Push files to GitHub repository as one commit, skipping virtual environments and other unnecessary files
+    
+    File contents are uploaded concurrently as blobs over pooled connections, then a
+    single tree and commit are created (see github_upload.upload_directory).
     
     Args:
         repo_url: GitHub repository URL
         token: GitHub API token
         files_dir: Directory containing files to upload
+        branch: Existing branch to commit to
         
     Returns:
         bool: True if successful, False otherwise
     """
-    repo_parts = repo_url.split('/')
+    repo_parts = repo_url.rstrip('/').split('/')
     repo_owner = repo_parts[-2]
     repo_name = repo_parts[-1]
     
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    # Directories to skip when uploading
-    skip_dirs = ["venv", ".venv", "__pycache__", ".git", ".ipynb_checkpoints", ".pytest_cache", ".vscode"]
-    
-    # File extensions to skip
-    skip_extensions = [".pyc", ".pyo", ".pyd", ".so", ".dll", ".exe"]
-    
-    # Log directory structure for user feedback
-    logger.info("Files to be uploaded to GitHub:")
-    file_list = []
-    for root, dirs, files in os.walk(files_dir):
-        # Skip directories we don't want to upload
-        dirs[:] = [d for d in dirs if d not in skip_dirs]
-        
-        level = root.replace(files_dir, '').count(os.sep)
-        indent = ' ' * 4 * level
-        subdir = os.path.basename(root)
-        
-        # Only add directory to list if it's not a root directory
-        if subdir:
-            file_list.append(f"{indent}{subdir}/")
-            
-        subindent = ' ' * 4 * (level + 1)
-        for f in files:
-            # Skip files with unwanted extensions
-            if not any(f.endswith(ext) for ext in skip_extensions):
-                file_list.append(f"{subindent}{f}")
-    
-    logger.info("\n".join(file_list))
-    
-    # Upload files to GitHub
-    logger.info("Using direct file upload method...")
-    
-    uploaded_files = 0
-    upload_errors = 0
-    
-    # Loop through files and upload each directly
-    for root, dirs, filenames in os.walk(files_dir):
-        # Skip directories we don't want to upload
-        dirs[:] = [d for d in dirs if d not in skip_dirs]
-        
-        for filename in filenames:
-            # Skip files with unwanted extensions
-            if any(filename.endswith(ext) for ext in skip_extensions):
-                continue
-                
-            if filename != '.git' and not filename.startswith('.git'):
-                file_path = os.path.join(root, filename)
-                rel_path = os.path.relpath(file_path, files_dir)
-                
-                # Skip based on relative path (additional check)
-                if any(skip_dir in rel_path.split(os.sep) for skip_dir in skip_dirs):
-                    continue
-                    
-                try:
-                    # Read file content
-                    with open(file_path, 'rb') as f:
-                        content = f.read()
-                    
-                    # Detect content type (text vs binary)
-                    try:
-                        # Try to decode as text first
-                        content_str = content.decode('utf-8')
-                        
-                        # Create or update file via GitHub API
-                        file_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{rel_path}"
-                        file_data = {
-                            "message": f"Add {rel_path}",
-                            "content": base64.b64encode(content).decode('ascii')
-                        }
-                        
-                        # Check if file exists (to update instead of create)
-                        file_check = requests.get(file_url, headers=headers)
-                        if file_check.status_code == 200:
-                            # File exists, need to update
-                            file_data["sha"] = file_check.json()["sha"]
-                        
-                        # Upload the file
-                        response = requests.put(file_url, headers=headers, json=file_data)
-                        
-                        if response.status_code not in [200, 201]:
-                            logger.warning(f"Failed to upload {rel_path}: {response.text}")
-                            upload_errors += 1
-                        else:
-                            logger.info(f"Uploaded: {rel_path}")
-                            uploaded_files += 1
-                        
-                    except UnicodeDecodeError:
-                        # Binary file
-                        file_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{rel_path}"
-                        file_data = {
-                            "message": f"Add binary file {rel_path}",
-                            "content": base64.b64encode(content).decode('ascii')
-                        }
-                        
-                        # Upload the file
-                        response = requests.put(file_url, headers=headers, json=file_data)
-                        
-                        if response.status_code not in [200, 201]:
-                            logger.warning(f"Failed to upload binary file {rel_path}: {response.text}")
-                            upload_errors += 1
-                        else:
-                            logger.info(f"Uploaded binary file: {rel_path}")
-                            uploaded_files += 1
-                except Exception as e:
-                    logger.error(f"Error uploading {rel_path}: {str(e)}")
-                    upload_errors += 1
-    
-    # Provide a summary
-    if uploaded_files > 0:
-        logger.info(f"Successfully uploaded {uploaded_files} files to GitHub")
-        if upload_errors > 0:
-            logger.warning(f"Failed to upload {upload_errors} files. See logs for details.")
-    
-    # Check if files were uploaded successfully
-    contents_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents"
-    response = requests.get(contents_url, headers=headers)
+    # Log the files for user feedback
+    files = collect_files(files_dir)
+    logger.info(f"Files to be uploaded to GitHub ({len(files)}):")
+    logger.info("\n".join(f"    {rel_path}" for rel_path, _ in files))
     
-    if response.status_code == 200 and len(response.json()) > 0:
-        logger.info("Repository verified successfully!")
+    session = create_session(token)
+    try:
+        started = time.time()
+        commit_sha = upload_directory(session, repo_owner, repo_name, files_dir, branch=branch,
+                                      message="Add project files")
+        logger.info(f"Committed {len(files)} files to GitHub ({commit_sha[:7]}) in {time.time() - started:.1f}s")
         return True
-    else:
-        logger.error(f"Failed to verify file upload. Status: {response.status_code}")
-        if response.status_code == 200:
-            logger.error(f"Repository appears to be empty.")
+    except GitHubUploadError as e:
+        logger.error(f"Failed to upload files to GitHub: {str(e)}")
         return False
+    finally:
+        session.close()
 
 def deploy_project(zip_file, task_type="ml"):
     """
@@ -475,6 +366,8 @@ def deploy_project(zip_file, task_type="ml"):
         repo_data = {
             "name": repo_name,
             "private": False,
+            # Start with an initial commit: the Git Data API cannot write to an empty repository
+            "auto_init": True,
             "description": f"{repo_prefix.replace('-', ' ').title()} ML project repository"
         }
         
@@ -491,13 +384,14 @@ def deploy_project(zip_file, task_type="ml"):
                 return {"error": f"Failed to create GitHub repository: {error_message}"}
             
             repo_url = response.json()["html_url"]
+            default_branch = response.json().get("default_branch", "main")
             
             logger.info(f"Created GitHub repository: {repo_url}")
             
             # Push files to GitHub using the API
             logger.info("Using GitHub API for direct file upload...")
             
-            success = push_files_to_github(repo_url, github_token, extraction_dir)
+            success = push_files_to_github(repo_url, github_token, extraction_dir, branch=default_branch)
             
             if success:
                 logger.info("Files pushed to GitHub successfully")
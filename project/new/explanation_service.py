@@ -0,0 +1,303 @@
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from db_file_system import DBFileSystem
+
+# Check if Gemini is available
+try:
+    import google.generativeai as genai
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env.local file
+    load_dotenv()
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+# Initialize database file system
+db_fs = DBFileSystem()
+
+# Gemini model used for chart explanations
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+
+# Concurrent explanation requests, and the request budget per minute shared by all of them
+EXPLANATION_WORKERS = int(os.getenv('EXPLANATION_WORKERS', '4'))
+EXPLANATION_RATE_LIMIT = float(os.getenv('EXPLANATION_RATE_LIMIT', '60'))
+
+# Return charts without waiting for explanations; the client fetches them by explanation_id
+EXPLANATIONS_DEFERRED = os.getenv('EXPLANATIONS_DEFERRED', 'false').lower() == 'true'
+
+# Longest a client request may block waiting for pending explanations, in seconds
+EXPLANATION_MAX_WAIT = float(os.getenv('EXPLANATION_MAX_WAIT', '5'))
+
+# Seconds a finished but uncached result (an error message) is kept for the client to fetch
+EXPLANATION_RESULT_TTL = float(os.getenv('EXPLANATION_RESULT_TTL', '300'))
+
+# Cached explanations are stored in the database so they survive restarts
+EXPLANATIONS_DB_DIR = 'runs'
+
+UNAVAILABLE_MESSAGE = "AI explanations not available (Gemini API not installed)"
+
+
+class RateLimiter:
+    """Token bucket: at most `rate_per_minute` acquisitions per minute, shared across threads"""
+
+    def __init__(self, rate_per_minute):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _gemini_client(prompt):
+    """Default client: send the prompt to Gemini and return the response text"""
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    return model.generate_content(prompt).text
+
+
+def stub_client(prompt):
+    """Local stand-in for the model endpoint (EXPLANATION_STUB=true): echoes the prompt's first line"""
+    first_line = next((line.strip() for line in prompt.splitlines() if line.strip()), '')
+    return f"[stub explanation] {first_line}"
+
+
+def _default_client():
+    if os.getenv('EXPLANATION_STUB', 'false').lower() == 'true':
+        return stub_client
+    if not GEMINI_AVAILABLE:
+        return None
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        print("GEMINI_API_KEY not set, explanations disabled")
+        return None
+    genai.configure(api_key=api_key)
+    return _gemini_client
+
+
+_client = _default_client()
+_limiter = RateLimiter(EXPLANATION_RATE_LIMIT)
+_executor = ThreadPoolExecutor(max_workers=EXPLANATION_WORKERS, thread_name_prefix='explain')
+_cache = {}
+_pending = {}
+_lock = threading.Lock()
+
+
+def set_client(client, rate_per_minute=None):
+    """
+    Replace the model endpoint, e.g. with a local stub in tests or development.
+
+    Parameters:
+    client: Callable taking the prompt and returning the explanation text (None disables explanations)
+    rate_per_minute: Optional new rate limit (0 disables limiting)
+    """
+    global _client, _limiter
+    _client = client
+    if rate_per_minute is not None:
+        _limiter = RateLimiter(rate_per_minute)
+    clear_cache(memory_only=True)
+
+
+def clear_cache(memory_only=False):
+    """Drop cached explanations (in memory, and in the database unless memory_only)"""
+    with _lock:
+        _cache.clear()
+    if not memory_only:
+        for filename in db_fs.list_files(EXPLANATIONS_DB_DIR):
+            if filename.startswith('explanation_'):
+                db_fs.delete_file(filename, EXPLANATIONS_DB_DIR)
+
+
+def explanation_key(data, prompt):
+    """Cache key: hash of the model, prompt and chart data"""
+    h = hashlib.sha256()
+    for part in (GEMINI_MODEL, prompt, str(data)):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()[:32]
+
+
+def _cached(key):
+    with _lock:
+        if key in _cache:
+            return _cache[key]
+    try:
+        filename = f"explanation_{key}.txt"
+        if db_fs.file_exists(filename, EXPLANATIONS_DB_DIR):
+            text = db_fs.get_file(filename, EXPLANATIONS_DB_DIR).decode('utf-8')
+            with _lock:
+                _cache[key] = text
+            return text
+    except Exception as e:
+        print(f"Error reading cached explanation: {e}")
+    return None
+
+
+def _generate(key, prompt):
+    """Call the client under the rate limit and cache successful responses"""
+    client = _client
+    if client is None:
+        return UNAVAILABLE_MESSAGE
+    _limiter.acquire()
+    try:
+        text = client(prompt)
+    except Exception as e:
+        # Errors are returned but not cached, so a later request retries
+        return f"Unable to generate explanation: {str(e)}"
+
+    with _lock:
+        _cache[key] = text
+    try:
+        db_fs.save_file_content(text.encode('utf-8'), f"explanation_{key}.txt", EXPLANATIONS_DB_DIR)
+    except Exception as e:
+        print(f"Error caching explanation: {e}")
+    return text
+
+
+def submit(data, prompt):
+    """
+    Start generating an explanation in the background.
+
+    Returns:
+    The explanation key; identical requests share one call and one cache entry
+    """
+    key = explanation_key(data, prompt)
+    if _cached(key) is not None:
+        return key
+    with _lock:
+        _evict_expired()
+        future = _pending.get(key)
+        if future is not None and not (future.done() and key not in _cache):
+            return key
+        future = _executor.submit(_generate, key, prompt)
+        _pending[key] = future
+    # Outside the lock: the callback runs right away (and takes the lock) if already done
+    future.add_done_callback(lambda f, k=key: _forget(k, f))
+    return key
+
+
+def _forget(key, future):
+    """
+    Drop finished requests once their result is cached. Failures stay until fetched, or
+    until EXPLANATION_RESULT_TTL has passed (see _evict_expired).
+    """
+    future.finished_at = time.monotonic()
+    with _lock:
+        if key in _cache and _pending.get(key) is future:
+            del _pending[key]
+
+
+def _evict_expired():
+    """Drop finished requests nobody fetched within EXPLANATION_RESULT_TTL (call under _lock)"""
+    cutoff = time.monotonic() - EXPLANATION_RESULT_TTL
+    expired = [key for key, future in _pending.items()
+               if getattr(future, 'finished_at', cutoff + 1) <= cutoff]
+    for key in expired:
+        del _pending[key]
+
+
+def client_wait(wait):
+    """Seconds a client asked to wait, limited to EXPLANATION_MAX_WAIT (None for no wait)"""
+    try:
+        wait = float(wait) if wait else None
+    except (TypeError, ValueError):
+        return None
+    return None if wait is None else min(max(wait, 0.0), EXPLANATION_MAX_WAIT)
+
+
+def get_explanation(key, wait=None):
+    """
+    Look up an explanation by key.
+
+    Parameters:
+    key: Key returned by submit()
+    wait: Seconds to wait for a pending explanation (None returns immediately)
+
+    Returns:
+    Dictionary with status ('ready', 'pending' or 'unknown') and explanation
+    """
+    text = _cached(key)
+    if text is not None:
+        return {'status': 'ready', 'explanation': text}
+
+    with _lock:
+        future = _pending.get(key)
+    if future is None:
+        return {'status': 'unknown', 'explanation': None}
+    if wait is not None or future.done():
+        try:
+            text = future.result(timeout=wait)
+        except Exception:
+            return {'status': 'pending', 'explanation': None}
+        with _lock:
+            if _pending.get(key) is future:
+                del _pending[key]
+        return {'status': 'ready', 'explanation': text}
+    return {'status': 'pending', 'explanation': None}
+
+
+def get_explanations(keys, wait=None):
+    """
+    Look up several explanations for a client, sharing one wait budget.
+
+    Parameters:
+    keys: Keys returned by submit()
+    wait: Seconds the client asked to wait in total (limited by client_wait)
+
+    Returns:
+    Dictionary of key -> get_explanation() result
+    """
+    wait = client_wait(wait)
+    deadline = time.monotonic() + wait if wait is not None else None
+    results = {}
+    for key in keys:
+        remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        results[key] = get_explanation(key, wait=remaining)
+    return results
+
+
+def explain(data, prompt):
+    """Explanation for a single chart, blocking (cached)"""
+    return get_explanation(submit(data, prompt), wait=300)['explanation']
+
+
+def attach_explanations(visualizations, requests, defer=None):
+    """
+    Fill in explanations for a list of charts, issuing all prompts concurrently.
+
+    Parameters:
+    visualizations: List of chart dictionaries (title, image, ...), updated in place
+    requests: (data, prompt) per chart, or None for charts that already have an explanation
+    defer: Return without waiting; charts get explanation_id and explanation_status 'pending'
+           (defaults to EXPLANATIONS_DEFERRED)
+
+    Returns:
+    The visualizations list
+    """
+    if defer is None:
+        defer = EXPLANATIONS_DEFERRED
+
+    keys = [submit(*req) if req is not None else None for req in requests]
+
+    for vis, key in zip(visualizations, keys):
+        if key is None:
+            continue
+        vis['explanation_id'] = key
+        if defer:
+            result = get_explanation(key)
+        else:
+            result = get_explanation(key, wait=300)
+        vis['explanation'] = result['explanation']
+        vis['explanation_status'] = result['status']
+
+    return visualizations
@@ -0,0 +1,216 @@
+import os
+import base64
+import hashlib
+import inspect
+from io import BytesIO
+import numpy as np
+import matplotlib
+from matplotlib.image import AxesImage
+from db_file_system import DBFileSystem
+from render_pool import render_tasks
+
+# Database file system for stored figures, opened on first use (render workers only
+# need it when FIGURE_STORAGE is 'db')
+_db_fs = None
+
+# Output format of visualization images:
+#   png  - optimized PNG
+#   webp - lossy WebP (smallest for heatmaps, scatter plots and image grids)
+#   svg  - vector output (small and sharp for bar and line charts)
+#   auto - SVG for simple line and bar charts, WebP for heatmaps, image grids and dense plots
+#   data - no image; charts carry the plot data for client-side rendering. Object detection
+#          charts have no plot data form and are rendered as PNG images in this mode
+FIGURE_FORMAT = os.getenv('FIGURE_FORMAT', 'png').lower()
+
+# Resolution of raster formats (lower values, e.g. 100, give smaller images)
+FIGURE_DPI = int(os.getenv('FIGURE_DPI', '150'))
+
+# WebP quality (0-100)
+WEBP_QUALITY = int(os.getenv('FIGURE_WEBP_QUALITY', '80'))
+
+# 'inline' returns base64 in the response, 'db' stores images in the database and returns URLs
+FIGURE_STORAGE = os.getenv('FIGURE_STORAGE', 'inline').lower()
+
+# Database directory for stored figures and the route serving them
+FIGURES_DB_DIR = 'downloads'
+FIGURES_URL_PREFIX = '/api/figures/'
+
+# Number of stored figures kept in the database (least recently used are removed)
+FIGURE_KEEP = int(os.getenv('FIGURE_KEEP', '500'))
+
+# Figures with more drawn elements than this are rasterized in 'auto' mode
+SVG_MAX_ELEMENTS = 500
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+
+def _webp_supported():
+    try:
+        from PIL import features
+        return features.check('webp')
+    except Exception:
+        return False
+
+
+def _count_elements(fig):
+    """Count drawn elements; large raster images count as too many for SVG"""
+    count = 0
+    for ax in fig.axes:
+        for image in ax.images:
+            # The small background gradient added to every chart is fine as SVG
+            if isinstance(image, AxesImage) and np.asarray(image.get_array()).size > 10000:
+                return SVG_MAX_ELEMENTS + 1
+        count += len(ax.lines) + len(ax.patches) + len(ax.texts)
+        for collection in ax.collections:
+            count += max(1, len(collection.get_offsets()))
+    return count
+
+
+def resolve_format(fig, fmt=None):
+    """Output format (png, webp or svg) of a figure, chosen from the kind of chart it holds"""
+    fmt = (fmt or FIGURE_FORMAT).lower()
+    if fmt == 'auto':
+        # Line and bar charts stay small as vectors; heatmaps, image grids and dense
+        # scatter plots are rasterized
+        fmt = 'svg' if _count_elements(fig) <= SVG_MAX_ELEMENTS else 'webp'
+    elif fmt not in MIME_TYPES:
+        # 'data' (object detection charts only) and unknown values fall back to PNG
+        fmt = 'png'
+    if fmt == 'webp' and not _webp_supported():
+        fmt = 'png'
+    return fmt
+
+
+def figure_bytes(fig, fmt='png', dpi=None, **savefig_kwargs):
+    """Save a figure to bytes in the given format"""
+    buf = BytesIO()
+    kwargs = dict(format=fmt, bbox_inches='tight', **savefig_kwargs)
+    if fmt == 'png':
+        kwargs.update(dpi=dpi or FIGURE_DPI, pil_kwargs={'optimize': True})
+    elif fmt == 'webp':
+        kwargs.update(dpi=dpi or FIGURE_DPI, pil_kwargs={'quality': WEBP_QUALITY, 'method': 6})
+    if fmt == 'svg':
+        # Keep text as <text> elements instead of one path per glyph
+        with matplotlib.rc_context({'svg.fonttype': 'none'}):
+            fig.savefig(buf, **kwargs)
+    else:
+        fig.savefig(buf, **kwargs)
+    return buf.getvalue()
+
+
+def _figure_db():
+    global _db_fs
+    if _db_fs is None:
+        _db_fs = DBFileSystem()
+    return _db_fs
+
+
+def _prune_figures(db_fs, keep_filename):
+    """Remove the least recently used stored figures beyond FIGURE_KEEP"""
+    try:
+        infos = db_fs.file_infos(FIGURES_DB_DIR)
+        figures = sorted((f for f in infos if f.startswith('figure_')),
+                         key=lambda f: infos[f]['updated_at'] or '', reverse=True)
+        for filename in figures[FIGURE_KEEP:]:
+            if filename != keep_filename:
+                db_fs.delete_file(filename, FIGURES_DB_DIR)
+    except Exception as e:
+        print(f"Error pruning stored figures: {e}")
+
+
+def store_figure(content, fmt):
+    """Save encoded figure bytes in the database (content addressed) and return their URL"""
+    filename = f"figure_{hashlib.sha1(content).hexdigest()[:20]}.{fmt}"
+    db_fs = _figure_db()
+    # A figure drawn again is marked as recently used rather than stored twice
+    if not db_fs.touch(filename, FIGURES_DB_DIR):
+        db_fs.save_file_content(content, filename, FIGURES_DB_DIR)
+        _prune_figures(db_fs, filename)
+    return FIGURES_URL_PREFIX + filename
+
+
+def encode_figure(fig, fmt=None, dpi=None, **savefig_kwargs):
+    """
+    Encode a figure for the response.
+
+    Parameters:
+    fig: Matplotlib figure
+    fmt: Output format (defaults to FIGURE_FORMAT)
+    dpi: Raster resolution (defaults to FIGURE_DPI)
+    savefig_kwargs: Extra savefig arguments (facecolor, edgecolor, ...)
+
+    Returns:
+    Base64 string, or the figure URL when FIGURE_STORAGE is 'db'
+    """
+    fmt = resolve_format(fig, fmt)
+    content = figure_bytes(fig, fmt, dpi, **savefig_kwargs)
+    if FIGURE_STORAGE == 'db':
+        try:
+            return store_figure(content, fmt)
+        except Exception as e:
+            print(f"Error storing figure in database, returning it inline: {e}")
+    return base64.b64encode(content).decode('utf-8')
+
+
+def image_fields(image):
+    """Describe an encoded image so clients can build an <img> src from it"""
+    if image is None:
+        return {}
+    if image.startswith(FIGURES_URL_PREFIX):
+        ext = image.rsplit('.', 1)[-1]
+        return {'image_url': image, 'image_format': ext, 'image_mime': MIME_TYPES.get(ext)}
+    # Inline: sniff the format from the base64 prefix
+    if image.startswith('PHN2Zy') or image.startswith('PD94bW'):  # "<svg" / "<?xml"
+        fmt = 'svg'
+    elif image.startswith('UklGR'):  # "RIFF"
+        fmt = 'webp'
+    else:
+        fmt = 'png'
+    return {'image_format': fmt, 'image_mime': MIME_TYPES[fmt]}
+
+
+def _jsonable(value):
+    """Convert numpy values (recursively) to JSON serializable Python types"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def plot_data(render_task):
+    """
+    Plot data of a render task for client-side rendering ('data' format).
+
+    Returns:
+    Dictionary with the chart type (render function name without 'render_') and its named arguments
+    """
+    bound = inspect.signature(render_task.func).bind(*render_task.args, **(render_task.kwargs or {}))
+    return {
+        'chart': render_task.func.__name__.replace('render_', '', 1),
+        'data': _jsonable(dict(bound.arguments)),
+    }
+
+
+def encode_charts(charts):
+    """
+    Produce the visualization entries (title plus image fields) for chart specs with render tasks.
+
+    In 'data' mode nothing is rendered and each chart carries plot_data instead.
+    Charts whose rendering failed are returned with image None.
+    """
+    if FIGURE_FORMAT == 'data':
+        return [{'title': chart['title'], 'image': None, 'plot_data': plot_data(chart['task'])}
+                for chart in charts]
+
+    images = render_tasks([chart['task'] for chart in charts])
+    return [dict({'title': chart['title'], 'image': image}, **image_fields(image))
+            for chart, image in zip(charts, images)]
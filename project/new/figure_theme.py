@@ -0,0 +1,132 @@
+import os
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.patheffects as path_effects
+import seaborn as sns
+from matplotlib.colors import LinearSegmentedColormap
+
+# Define modern purple theme colors (shared by all visualization modules)
+PURPLE_DARK = '#2D1B55'  # Dark purple background
+PURPLE_PRIMARY = '#9C27B0'  # Main purple
+PURPLE_SECONDARY = '#BA68C8'  # Medium purple
+PURPLE_ACCENT = '#E040FB'  # Bright accent purple
+PURPLE_LIGHT = '#E1BEE7'  # Light purple
+PURPLE_BG = '#13111C'  # Very dark purple/black background
+
+# 'full' draws the glow strokes and background gradients; 'fast' keeps the colors and
+# layout but drops those effects, which account for most of the drawing time
+FIGURE_STYLE = os.getenv('FIGURE_STYLE', 'full').lower()
+FAST_STYLE = FIGURE_STYLE == 'fast'
+
+# Background gradient drawn behind every styled axes (built once)
+_GRADIENT = np.linspace(0, 1, 100).reshape(-1, 1)
+_GRADIENT_CMAP = LinearSegmentedColormap.from_list('bg_gradient', [PURPLE_BG, PURPLE_DARK])
+
+# Styling every axes gets from style_axes; part of the theme so new axes start out styled
+_SKELETON_RC = {
+    'axes.linewidth': 1.5,
+    'xtick.labelcolor': PURPLE_LIGHT,
+    'ytick.labelcolor': PURPLE_LIGHT,
+    'xtick.labelsize': 12,
+    'ytick.labelsize': 12,
+    'grid.alpha': 0.5,
+}
+
+# rcParams of the theme, computed on first use; None until then
+_theme_rc = None
+
+
+def _build_theme_rc():
+    """Resolve the theme (dark background, purple overrides, seaborn darkgrid) into one rcParams dict"""
+    with plt.rc_context():
+        plt.style.use('dark_background')
+
+        # Set custom styling for all plots
+        plt.rcParams['figure.facecolor'] = PURPLE_BG
+        plt.rcParams['axes.facecolor'] = PURPLE_BG
+        plt.rcParams['axes.edgecolor'] = PURPLE_SECONDARY
+        plt.rcParams['axes.labelcolor'] = PURPLE_LIGHT
+        plt.rcParams['xtick.color'] = PURPLE_LIGHT
+        plt.rcParams['ytick.color'] = PURPLE_LIGHT
+        plt.rcParams['text.color'] = PURPLE_LIGHT
+        plt.rcParams['grid.color'] = PURPLE_DARK
+        plt.rcParams['grid.linestyle'] = '--'
+        plt.rcParams['grid.linewidth'] = 0.5
+        plt.rcParams['figure.figsize'] = (10, 6)
+        plt.rcParams['font.family'] = 'sans-serif'
+        plt.rcParams['font.size'] = 12
+
+        # Set Seaborn style
+        sns.set_style("darkgrid", {
+            'axes.facecolor': PURPLE_BG,
+            'axes.edgecolor': PURPLE_SECONDARY,
+            'axes.grid': True,
+            'grid.color': PURPLE_DARK,
+            'grid.linestyle': '--',
+        })
+        plt.rcParams.update(_SKELETON_RC)
+
+        return plt.rcParams.copy()
+
+
+def apply_theme():
+    """
+    Apply the purple theme to matplotlib.
+
+    The style sheets are resolved once per process; later calls only copy the cached,
+    already validated rcParams back (as matplotlib's rc_context does). Only the rcParams
+    are cached: creating a figure and axes under them costs less than clearing and
+    reusing a cached one, and the drawing and encoding dominate either way.
+    """
+    global _theme_rc
+    if _theme_rc is None:
+        _theme_rc = _build_theme_rc()
+    dict.update(plt.rcParams, _theme_rc)
+
+
+def glow(artist, color, linewidth=5, alpha=0.3):
+    """Add a glow stroke behind a line, bar, patch or text (skipped in fast mode)"""
+    if FAST_STYLE:
+        return
+    artist.set_path_effects([
+        path_effects.Stroke(linewidth=linewidth, foreground=color, alpha=alpha),
+        path_effects.Normal()
+    ])
+
+
+def outline(linewidth=3, foreground=PURPLE_BG, alpha=None):
+    """Path effects for outlined text labels ([] in fast mode), for the path_effects= argument"""
+    if FAST_STYLE:
+        return []
+    kwargs = {'alpha': alpha} if alpha is not None else {}
+    return [path_effects.withStroke(linewidth=linewidth, foreground=foreground, **kwargs)]
+
+
+def style_axes(fig, ax, title, xlabel=None, ylabel=None):
+    """
+    Title, labels, grid and background of a themed axes.
+
+    Spine and tick styling come from the theme rcParams, so only the per-plot parts are set here.
+    """
+    # Add title with glowing effect
+    title_obj = ax.set_title(title, fontsize=18, fontweight='bold', color=PURPLE_LIGHT, pad=20)
+    glow(title_obj, PURPLE_ACCENT, linewidth=2, alpha=0.5)
+
+    # Set axis labels
+    if xlabel:
+        ax.set_xlabel(xlabel, fontsize=14, color=PURPLE_LIGHT, labelpad=10)
+    if ylabel:
+        ax.set_ylabel(ylabel, fontsize=14, color=PURPLE_LIGHT, labelpad=10)
+
+    # Add subtle grid
+    ax.grid(color=PURPLE_DARK, linestyle='--', linewidth=0.5, alpha=0.5)
+
+    fig.patch.set_alpha(0.9)
+
+    # Add a subtle background gradient
+    if not FAST_STYLE:
+        xlim, ylim = ax.get_xlim(), ax.get_ylim()
+        ax.imshow(_GRADIENT, aspect='auto', extent=[xlim[0], xlim[1], ylim[0], ylim[1]],
+                  cmap=_GRADIENT_CMAP, alpha=0.1, zorder=-1)
@@ -0,0 +1,161 @@
+import os
+import mimetypes
+import tempfile
+import threading
+from flask import Response, request, send_file
+
+# Local copies of downloaded database files, served with sendfile on later requests.
+# Must not contain 'ml_system', or the patched os functions would redirect it to the database.
+DOWNLOAD_CACHE_DIR = os.getenv('DOWNLOAD_CACHE_DIR',
+                               os.path.join(tempfile.gettempdir(), 'freemind_download_cache'))
+
+# Total size of the cache; least recently served files are removed beyond it
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv('DOWNLOAD_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+
+# Files larger than this are always streamed from the database and never cached
+DOWNLOAD_CACHE_MAX_FILE = int(os.getenv('DOWNLOAD_CACHE_MAX_FILE', str(DOWNLOAD_CACHE_MAX_BYTES // 4)))
+
+_prune_lock = threading.Lock()
+
+
+def file_etag(filename, info):
+    """ETag of a stored file: the content hash recorded when it was written (no content is read)"""
+    return info['content_hash']
+
+
+def _cache_path(directory_name, filename, info):
+    """Cache location of one version of a file; any change of content gives a new path"""
+    return os.path.join(DOWNLOAD_CACHE_DIR, info['content_hash'] + os.path.splitext(filename)[1])
+
+
+def _prune_cache():
+    """Remove the least recently served cache files until the cache fits DOWNLOAD_CACHE_MAX_BYTES"""
+    with _prune_lock:
+        try:
+            entries = [entry for entry in os.scandir(DOWNLOAD_CACHE_DIR)
+                       if entry.is_file() and not entry.name.endswith('.partial')]
+        except FileNotFoundError:
+            return
+        stats = sorted(((entry.stat(), entry.path) for entry in entries), key=lambda e: e[0].st_mtime)
+        total = sum(stat.st_size for stat, _ in stats)
+        for stat, path in stats:
+            if total <= DOWNLOAD_CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                total -= stat.st_size
+            except OSError:
+                pass
+
+
+def _caching_chunks(chunks, path, size):
+    """Pass chunks through while writing them to the cache; the copy is kept only if complete"""
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+    try:
+        os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+        out = open(partial, 'wb')
+    except OSError as e:
+        print(f"Download cache unavailable: {e}")
+        yield from chunks
+        return
+
+    written = 0
+    try:
+        with out:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+                yield chunk
+        if written == size:
+            os.replace(partial, path)
+            _prune_cache()
+    finally:
+        # Client disconnects close the generator early; drop the incomplete copy
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def _requested_range(size, etag):
+    """
+    Byte range to send for the current request.
+
+    Returns:
+    (start, end, status); status is 416 when the range cannot be satisfied
+    """
+    if request.range is None or request.range.units != 'bytes' or len(request.range.ranges) != 1:
+        # Multi-range requests are answered with the whole file
+        return 0, size, 200
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        # The client holds a different version; it gets the whole current file
+        return 0, size, 200
+    if if_range.date is not None:
+        # Modification dates are not exact enough to resume safely
+        return 0, size, 200
+    byte_range = request.range.range_for_length(size)
+    if byte_range is None:
+        return 0, size, 416
+    return byte_range[0], byte_range[1], 206
+
+
+def serve_db_file(db_fs, filename, directory_name, download_name=None, etag=None, mimetype=None):
+    """
+    Send a file stored in the database as a download, with constant memory per request.
+
+    - Answers If-None-Match with 304 without reading the file
+    - Honours single Range requests (206) for resumable downloads
+    - Serves the local cache copy with send_file, which uses sendfile where the server supports it
+    - Otherwise streams the blob in chunks, caching full downloads up to DOWNLOAD_CACHE_MAX_FILE
+
+    Parameters:
+    db_fs: DBFileSystem holding the file
+    filename: Name of the file in the database
+    directory_name: Database directory (datasets, models, downloads, runs)
+    download_name: File name offered to the client (defaults to filename)
+    etag: ETag of the file (defaults to file_etag)
+    mimetype: Content type (guessed from the name by default)
+
+    Returns:
+    Flask response, or None if the file does not exist
+    """
+    info = db_fs.file_info(filename, directory_name)
+    if info is None:
+        return None
+    if not info['content_hash']:
+        # Stored before hashes were recorded; computed once and saved
+        info['content_hash'] = db_fs.content_hash(filename, directory_name)
+
+    download_name = download_name or os.path.basename(filename)
+    etag = etag or file_etag(filename, info)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    cached = _cache_path(directory_name, filename, info)
+    if os.path.isfile(cached) and os.path.getsize(cached) == info['size']:
+        # Mark as recently used for pruning
+        os.utime(cached)
+        return send_file(cached, as_attachment=True, download_name=download_name,
+                         mimetype=mimetype, conditional=True, etag=etag)
+
+    size = info['size']
+    start, end, status = _requested_range(size, etag)
+    if status == 416:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f"bytes */{size}"
+        return response
+
+    chunks = db_fs.read_chunks(filename, directory_name, start, end)
+    if status == 200 and size <= DOWNLOAD_CACHE_MAX_FILE:
+        chunks = _caching_chunks(chunks, cached, size)
+
+    mimetype = mimetype or mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    response = Response(chunks, status=status, mimetype=mimetype, direct_passthrough=True)
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    response.headers['Content-Length'] = str(end - start)
+    response.headers['Accept-Ranges'] = 'bytes'
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{end - 1}/{size}"
+    response.set_etag(etag)
+    return response
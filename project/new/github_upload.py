@@ -0,0 +1,186 @@
+import os
+import time
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# GitHub API root (point it at a local mock server to test uploads offline)
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+
+# Concurrent blob uploads, which is also the connection pool size
+GITHUB_UPLOAD_WORKERS = int(os.getenv('GITHUB_UPLOAD_WORKERS', '8'))
+
+# Attempts per API call, and the first retry delay in seconds (doubled after every attempt)
+GITHUB_MAX_ATTEMPTS = int(os.getenv('GITHUB_MAX_ATTEMPTS', '5'))
+GITHUB_RETRY_BACKOFF = float(os.getenv('GITHUB_RETRY_BACKOFF', '1.0'))
+
+# Seconds to wait for a single API response
+GITHUB_TIMEOUT = 60
+
+# Responses worth retrying: rate limits and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Directories and file extensions that are never uploaded
+SKIP_DIRS = ["venv", ".venv", "__pycache__", ".git", ".ipynb_checkpoints", ".pytest_cache", ".vscode"]
+SKIP_EXTENSIONS = [".pyc", ".pyo", ".pyd", ".so", ".dll", ".exe"]
+
+
+class GitHubUploadError(Exception):
+    """Raised when an API call of the upload fails for good"""
+
+
+def create_session(token, pool_size=GITHUB_UPLOAD_WORKERS):
+    """requests.Session that keeps up to pool_size connections to the API open for reuse"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        "Authorization": f"token {token}",
+        "Accept": "application/vnd.github.v3+json"
+    })
+    return session
+
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before the next attempt; honours Retry-After and rate limit resets"""
+    delay = GITHUB_RETRY_BACKOFF * 2 ** attempt
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        elif response.headers.get('X-RateLimit-Remaining') == '0' and reset and reset.isdigit():
+            delay = max(delay, int(reset) - time.time())
+    return delay
+
+
+def _is_retryable(response, retry_statuses):
+    if response.status_code in retry_statuses:
+        return True
+    # Secondary rate limits are reported as 403 with a Retry-After or an exhausted quota
+    return response.status_code == 403 and (
+        'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0'
+    )
+
+
+def api_request(session, method, path, expected=(200, 201), retry_statuses=RETRY_STATUSES, **kwargs):
+    """
+    Call the GitHub API, retrying connection errors and retryable responses with backoff.
+
+    Parameters:
+    session: Session from create_session
+    method: HTTP method
+    path: API path starting with / (appended to GITHUB_API_URL)
+    expected: Status codes that count as success
+    retry_statuses: Status codes to retry besides rate limits
+
+    Returns:
+    Decoded JSON response
+
+    Raises:
+    GitHubUploadError once GITHUB_MAX_ATTEMPTS attempts have failed, or on a non-retryable error
+    """
+    url = f"{GITHUB_API_URL}{path}"
+    for attempt in range(GITHUB_MAX_ATTEMPTS):
+        response = None
+        try:
+            response = session.request(method, url, timeout=GITHUB_TIMEOUT, **kwargs)
+        except requests.RequestException as e:
+            error = f"{method} {path} failed: {e}"
+        else:
+            if response.status_code in expected:
+                return response.json()
+            error = f"{method} {path} returned {response.status_code}: {response.text[:200]}"
+            if not _is_retryable(response, retry_statuses):
+                raise GitHubUploadError(error)
+        if attempt + 1 < GITHUB_MAX_ATTEMPTS:
+            delay = _retry_delay(response, attempt)
+            logger.warning(f"{error}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+    raise GitHubUploadError(error)
+
+
+def collect_files(files_dir):
+    """
+    Files of files_dir to upload, skipping SKIP_DIRS, SKIP_EXTENSIONS and git metadata.
+
+    Returns:
+    Sorted list of (repository path, local path)
+    """
+    collected = []
+    for root, dirs, filenames in os.walk(files_dir):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for filename in filenames:
+            if any(filename.endswith(ext) for ext in SKIP_EXTENSIONS) or filename.startswith('.git'):
+                continue
+            file_path = os.path.join(root, filename)
+            rel_path = os.path.relpath(file_path, files_dir).replace(os.sep, '/')
+            collected.append((rel_path, file_path))
+    return sorted(collected)
+
+
+def _create_blob(session, repo_path, rel_path, file_path):
+    """Upload one file as a git blob; returns its tree entry"""
+    with open(file_path, 'rb') as f:
+        content = base64.b64encode(f.read()).decode('ascii')
+    blob = api_request(session, 'POST', f"/repos/{repo_path}/git/blobs",
+                       json={"content": content, "encoding": "base64"})
+    return {
+        "path": rel_path,
+        "mode": "100755" if os.access(file_path, os.X_OK) else "100644",
+        "type": "blob",
+        "sha": blob["sha"]
+    }
+
+
+def upload_directory(session, repo_owner, repo_name, files_dir, branch='main',
+                     message="Add project files", workers=GITHUB_UPLOAD_WORKERS):
+    """
+    Commit the contents of files_dir to a branch as a single commit.
+
+    Blobs are created concurrently, then one tree, one commit and one ref update are made,
+    so the number of sequential API calls does not grow with the number of files. The
+    branch must already exist (create the repository with auto_init).
+
+    Parameters:
+    session: Session from create_session
+    repo_owner: Repository owner
+    repo_name: Repository name
+    files_dir: Directory to upload (see collect_files)
+    branch: Branch to commit to
+    message: Commit message
+    workers: Number of concurrent blob uploads
+
+    Returns:
+    SHA of the new commit
+
+    Raises:
+    GitHubUploadError if an API call fails
+    """
+    repo_path = f"{repo_owner}/{repo_name}"
+    files = collect_files(files_dir)
+    if not files:
+        raise GitHubUploadError(f"No files to upload in {files_dir}")
+
+    # A just created repository can take a moment before its initial commit is visible
+    ref = api_request(session, 'GET', f"/repos/{repo_path}/git/ref/heads/{branch}",
+                      expected=(200,), retry_statuses=RETRY_STATUSES | {404, 409})
+    parent = ref["object"]["sha"]
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        entries = list(executor.map(lambda item: _create_blob(session, repo_path, *item), files))
+    logger.info(f"Uploaded {len(files)} blobs in {time.time() - started:.1f}s")
+
+    # No base_tree: the commit holds exactly the uploaded files
+    tree = api_request(session, 'POST', f"/repos/{repo_path}/git/trees", json={"tree": entries})
+    commit = api_request(session, 'POST', f"/repos/{repo_path}/git/commits",
+                         json={"message": message, "tree": tree["sha"], "parents": [parent]})
+    api_request(session, 'PATCH', f"/repos/{repo_path}/git/refs/heads/{branch}",
+                expected=(200,), json={"sha": commit["sha"]})
+    return commit["sha"]
@@ -0,0 +1,144 @@
+import numpy as np
+
+# Check if TensorFlow is available
+try:
+    import tensorflow as tf
+    TENSORFLOW_AVAILABLE = True
+except ImportError:
+    TENSORFLOW_AVAILABLE = False
+
+# Image size used by the CNN (matches the target_size of the Keras generators)
+IMAGE_SIZE = (64, 64)
+
+
+def _decode_and_resize(image_size, channels=3):
+    """Return a tf.data map function that decodes an image file into a resized uint8 tensor"""
+    def load(path, label):
+        image = tf.io.read_file(path)
+        image = tf.io.decode_image(image, channels=channels, expand_animations=False)
+        image = tf.image.resize(image, image_size)
+        # Keep uint8 so the cache holds 4x less memory than float32
+        image = tf.cast(tf.clip_by_value(image, 0, 255), tf.uint8)
+        image.set_shape((image_size[0], image_size[1], channels))
+        return image, label
+    return load
+
+
+def build_augmentation():
+    """
+    Vectorized augmentation applied to whole batches.
+    Mirrors the ImageDataGenerator settings (horizontal flip, zoom 0.2, small shear-like rotation).
+    """
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomFlip("horizontal"),
+        tf.keras.layers.RandomZoom(0.2),
+        tf.keras.layers.RandomRotation(0.05),
+    ], name="augmentation")
+
+
+def make_image_dataset(file_paths, labels, num_classes, image_size=IMAGE_SIZE, batch_size=32,
+                       training=False, cache=True, augment=None):
+    """
+    Build a tf.data pipeline for a list of image files.
+
+    Parameters:
+    file_paths: List of image file paths
+    labels: List of integer class indices aligned with file_paths
+    num_classes: Number of classes (labels are one-hot encoded for categorical_crossentropy)
+    image_size: Target (height, width)
+    batch_size: Batch size
+    training: Shuffle every epoch and apply augmentation
+    cache: Cache the decoded, resized images in memory after the first epoch
+    augment: Optional augmentation model (defaults to build_augmentation() when training)
+
+    Returns:
+    A batched, prefetched tf.data.Dataset yielding (images in [0, 1], one-hot labels)
+    """
+    if not TENSORFLOW_AVAILABLE:
+        raise ImportError("TensorFlow is required for the tf.data image pipeline but not available")
+
+    labels = tf.one_hot(np.asarray(labels, dtype=np.int32), num_classes)
+    dataset = tf.data.Dataset.from_tensor_slices((list(file_paths), labels))
+
+    # Decode in parallel, then cache the small uint8 tensors so later epochs skip decoding
+    dataset = dataset.map(_decode_and_resize(image_size), num_parallel_calls=tf.data.AUTOTUNE)
+    if cache:
+        dataset = dataset.cache()
+
+    return _batch_and_prefetch(dataset, len(file_paths), batch_size, training, augment)
+
+
+def make_array_dataset(images, labels, num_classes, batch_size=32, training=False, augment=None):
+    """
+    Build a tf.data pipeline from already decoded uint8 images (see image_store).
+
+    Parameters:
+    images: uint8 array of shape (n, height, width, channels)
+    labels: Integer class indices
+    num_classes: Number of classes
+    batch_size: Batch size
+    training: Shuffle every epoch and apply augmentation
+    augment: Optional augmentation model
+
+    Returns:
+    A batched, prefetched tf.data.Dataset yielding (images in [0, 1], one-hot labels)
+    """
+    if not TENSORFLOW_AVAILABLE:
+        raise ImportError("TensorFlow is required for the tf.data image pipeline but not available")
+
+    labels = tf.one_hot(np.asarray(labels, dtype=np.int32), num_classes)
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels))
+    return _batch_and_prefetch(dataset, len(images), batch_size, training, augment)
+
+
+def _batch_and_prefetch(dataset, num_samples, batch_size, training, augment):
+    """Shared tail of the pipelines: shuffle, batch, rescale, augment, prefetch"""
+    AUTOTUNE = tf.data.AUTOTUNE
+
+    if training:
+        # Shuffle after the cache so every epoch sees a different order
+        dataset = dataset.shuffle(buffer_size=max(1, min(num_samples, 10000)), reshuffle_each_iteration=True)
+
+    dataset = dataset.batch(batch_size)
+
+    # Rescale to [0, 1] like ImageDataGenerator(rescale=1./255)
+    dataset = dataset.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y), num_parallel_calls=AUTOTUNE)
+
+    if training:
+        augment = augment or build_augmentation()
+        dataset = dataset.map(lambda x, y: (augment(x, training=True), y), num_parallel_calls=AUTOTUNE)
+
+    return dataset.prefetch(AUTOTUNE)
+
+
+def dataset_from_generator(generator, batch_size=32, training=False, cache=True):
+    """
+    Build a tf.data pipeline from the files behind a Keras DirectoryIterator.
+
+    The iterator's filepaths/classes are already restricted to its subset (training or
+    validation), so the split produced by preprocess_image_dataset is preserved. Order is
+    kept for non-training datasets so predictions line up with generator.classes.
+    """
+    if generator is None:
+        return None
+
+    # Pre-decoded image store: no file reads or decoding at all
+    if hasattr(generator, 'images'):
+        return make_array_dataset(
+            generator.images,
+            generator.classes,
+            len(generator.class_indices),
+            batch_size=batch_size,
+            training=training
+        )
+
+    image_size = tuple(generator.image_shape[:2]) if hasattr(generator, 'image_shape') else IMAGE_SIZE
+    return make_image_dataset(
+        generator.filepaths,
+        generator.classes,
+        len(generator.class_indices),
+        image_size=image_size,
+        batch_size=batch_size,
+        training=training,
+        cache=cache
+    )
@@ -0,0 +1,301 @@
+import os
+import hashlib
+import tempfile
+import zipfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from db_file_system import DBFileSystem
+
+# Initialize database file system
+db_fs = DBFileSystem()
+
+# Check if TensorFlow is available (the iterator is a Keras Sequence when it is)
+try:
+    import tensorflow as tf
+    TENSORFLOW_AVAILABLE = True
+except ImportError:
+    TENSORFLOW_AVAILABLE = False
+
+# Name of the pre-decoded image store in the datasets directory
+IMAGE_STORE_FILE = "image_store.npz"
+
+# Local copy of the image store; its image arrays are memory-mapped from there
+IMAGE_STORE_CACHE_DIR = os.getenv('IMAGE_STORE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'image_store'))
+
+# Splits stored in the image store, keyed like the preprocessor dictionary
+SPLITS = {
+    'training': 'training_generator',
+    'validation': 'validation_generator',
+    'testing': 'testing_generator',
+}
+
+_SequenceBase = tf.keras.utils.Sequence if TENSORFLOW_AVAILABLE else object
+
+
+class ArrayImageIterator(_SequenceBase):
+    """
+    Batches of pre-decoded uint8 images exposed with the same attributes as a Keras
+    DirectoryIterator (class_indices, classes, filenames, samples, n, batch_size,
+    image_shape, reset(), next()), so training, evaluation and create_cnn_visualization
+    can use it in place of flow_from_directory.
+
+    Like the training DirectoryIterator, a training iterator (shuffle, augment) draws the
+    batches in a new order every epoch and augments them; classes and filenames keep the
+    stored order.
+
+    source_key is the hash of the dataset archive the images were decoded from (identifies
+    the pixels without reading them, e.g. for cached embeddings).
+    """
+
+    def __init__(self, images, labels, filenames, class_names, batch_size=32,
+                 shuffle=False, augment=False, seed=None, source_key=None):
+        if TENSORFLOW_AVAILABLE:
+            super().__init__()
+        self.images = images
+        self.classes = np.asarray(labels, dtype=np.int32)
+        self.filenames = list(filenames)
+        self.class_indices = {name: i for i, name in enumerate(class_names)}
+        self.num_classes = len(class_names)
+        self.batch_size = batch_size
+        self.samples = self.n = len(images)
+        self.image_shape = tuple(images.shape[1:])
+        self.source_key = source_key
+        self.batch_index = 0
+        self.shuffle = shuffle
+        self.augment = augment and TENSORFLOW_AVAILABLE
+        self._augmentation = None
+        self._rng = np.random.default_rng(seed)
+        self.index_array = np.arange(self.n)
+        self.on_epoch_end()
+
+    def __len__(self):
+        return int(np.ceil(self.n / self.batch_size))
+
+    def __getitem__(self, idx):
+        indices = self.index_array[idx * self.batch_size:(idx + 1) * self.batch_size]
+        batch_x = self.images[indices].astype(np.float32) / 255.0
+        if self.augment:
+            batch_x = self._augment(batch_x)
+        batch_y = np.eye(self.num_classes, dtype=np.float32)[self.classes[indices]]
+        return batch_x, batch_y
+
+    def _augment(self, batch_x):
+        """Same random flip/zoom/rotation as the tf.data training pipeline"""
+        if self._augmentation is None:
+            from image_pipeline import build_augmentation
+            self._augmentation = build_augmentation()
+        return np.asarray(self._augmentation(batch_x, training=True))
+
+    def on_epoch_end(self):
+        """Draw a new sample order (called by Keras after every epoch)"""
+        if self.shuffle:
+            self.index_array = self._rng.permutation(self.n)
+
+    def reset(self):
+        self.batch_index = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.n == 0:
+            raise StopIteration
+        # Loops forever like a Keras DirectoryIterator, reshuffling after each pass
+        batch = self[self.batch_index]
+        self.batch_index = (self.batch_index + 1) % len(self)
+        if self.batch_index == 0:
+            self.on_epoch_end()
+        return batch
+
+    def next(self):
+        return self.__next__()
+
+
+def get_source_key(content):
+    """Hash of the source dataset archive; the store is rebuilt when it changes"""
+    return hashlib.sha1(content).hexdigest()
+
+
+def _load_image(path, image_size):
+    """Decode one image file into a resized RGB uint8 array"""
+    with Image.open(path) as img:
+        return np.asarray(img.convert('RGB').resize(image_size[::-1]), dtype=np.uint8)
+
+
+def build_image_store(preprocessor, source_key, db_dir='datasets', image_size=(64, 64), max_workers=None):
+    """
+    Decode and resize every image behind the preprocessor's generators once and save the
+    resulting uint8 tensors with their labels to the database.
+
+    Parameters:
+    preprocessor: Dictionary returned by preprocess_image_dataset (with DirectoryIterators)
+    source_key: Hash of the source archive (see get_source_key)
+    db_dir: Database directory to store the image store in
+    image_size: Target (height, width)
+    max_workers: Threads used for decoding (PIL releases the GIL while decoding)
+
+    Returns:
+    True if the store was saved, False otherwise
+    """
+    arrays = {
+        'source_key': np.array(source_key),
+        'class_names': np.array(preprocessor['class_names']),
+    }
+    seen = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or min(8, (os.cpu_count() or 1) + 4)) as executor:
+            for split, key in SPLITS.items():
+                generator = preprocessor.get(key)
+                if generator is None or not hasattr(generator, 'filepaths'):
+                    continue
+
+                # The testing generator is often the validation generator; store it once
+                if id(generator) in seen:
+                    arrays[f'{split}_alias'] = np.array(seen[id(generator)])
+                    continue
+                seen[id(generator)] = split
+
+                images = list(executor.map(lambda p: _load_image(p, image_size), generator.filepaths))
+                arrays[f'{split}_images'] = (np.stack(images) if images
+                                             else np.zeros((0, image_size[0], image_size[1], 3), dtype=np.uint8))
+                arrays[f'{split}_labels'] = np.asarray(generator.classes, dtype=np.int32)
+                arrays[f'{split}_filenames'] = np.array([f.replace('\\', '/') for f in generator.filenames])
+                print(f"Decoded {len(images)} {split} images into the image store")
+
+        # Uncompressed so loading is a straight copy of the arrays
+        temp_path = os.path.join(tempfile.gettempdir(), IMAGE_STORE_FILE)
+        np.savez(temp_path, **arrays)
+        db_fs.save_file(temp_path, db_dir)
+        os.remove(temp_path)
+        print(f"Image store saved to database: {IMAGE_STORE_FILE}")
+        return True
+    except Exception as e:
+        print(f"Error building image store: {e}")
+        return False
+
+
+def _cached_store_path(db_dir):
+    """
+    Local copy of the image store, streamed from the database on first use.
+
+    The copy is named after the stored content hash, so a rebuilt store gets a new copy
+    and older copies are removed.
+    """
+    content_hash = db_fs.content_hash(IMAGE_STORE_FILE, db_dir)
+    if content_hash is None:
+        return None
+    os.makedirs(IMAGE_STORE_CACHE_DIR, exist_ok=True)
+    filename = f"{db_dir}_{content_hash[:16]}.npz"
+    path = os.path.join(IMAGE_STORE_CACHE_DIR, filename)
+    if not os.path.exists(path):
+        partial = f"{path}.{os.getpid()}.partial"
+        try:
+            with open(partial, 'wb') as f:
+                for chunk in db_fs.read_chunks(IMAGE_STORE_FILE, db_dir):
+                    f.write(chunk)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        for name in os.listdir(IMAGE_STORE_CACHE_DIR):
+            if name.startswith(f"{db_dir}_") and name.endswith('.npz') and name != filename:
+                try:
+                    os.remove(os.path.join(IMAGE_STORE_CACHE_DIR, name))
+                except OSError:
+                    pass
+    return path
+
+
+def _memmap_member(path, name):
+    """
+    Memory-map one array of an uncompressed npz file (np.load only maps plain .npy files).
+
+    Returns:
+    Read-only np.memmap, or None if the member is compressed
+    """
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, 'rb') as f:
+        # Local file header: 30 bytes, then the file name and extra field
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+        f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+def load_image_store(source_key, db_dir='datasets', batch_size=32):
+    """
+    Load the pre-decoded image store from the database.
+
+    The store is streamed to a local file once (see _cached_store_path) and its images
+    are memory-mapped from there, so they are neither held in memory as one blob nor
+    copied when loaded.
+
+    Returns:
+    A preprocessor dictionary of ArrayImageIterators (same keys as preprocess_image_dataset),
+    or None if there is no store for this source_key
+    """
+    try:
+        if not db_fs.file_exists(IMAGE_STORE_FILE, db_dir):
+            return None
+
+        path = _cached_store_path(db_dir)
+        if path is None:
+            return None
+
+        with np.load(path) as data:
+            if str(data['source_key']) != source_key:
+                print("Image store is out of date")
+                return None
+
+            class_names = data['class_names'].tolist()
+            preprocessor = {
+                'num_classes': len(class_names),
+                'class_names': class_names,
+            }
+
+            iterators = {}
+            for split, key in SPLITS.items():
+                if f'{split}_images' in data:
+                    images = _memmap_member(path, f'{split}_images')
+                    training = split == 'training'
+                    iterators[split] = ArrayImageIterator(
+                        images if images is not None else data[f'{split}_images'],
+                        data[f'{split}_labels'],
+                        data[f'{split}_filenames'].tolist(),
+                        class_names,
+                        batch_size=batch_size,
+                        shuffle=training,
+                        augment=training,
+                        source_key=source_key
+                    )
+                preprocessor[key] = None
+
+            for split, key in SPLITS.items():
+                if split in iterators:
+                    preprocessor[key] = iterators[split]
+                elif f'{split}_alias' in data:
+                    preprocessor[key] = iterators.get(str(data[f'{split}_alias']))
+    except Exception as e:
+        print(f"Error loading image store: {e}")
+        return None
+
+    if preprocessor['training_generator'] is None:
+        return None
+
+    preprocessor['image_shape'] = preprocessor['training_generator'].image_shape
+    if preprocessor['testing_generator'] is None:
+        preprocessor['testing_generator'] = preprocessor['validation_generator']
+    print(f"Loaded image store with {preprocessor['training_generator'].samples} training images")
+    return preprocessor
@@ -0,0 +1,125 @@
+import numpy as np
+
+
+def predict_scores(model, X):
+    """Class probability matrix of a fitted model, or None if it has no predict_proba"""
+    if not hasattr(model, 'predict_proba'):
+        return None
+    try:
+        return np.asarray(model.predict_proba(X))
+    except Exception as e:
+        print(f"Error computing class probabilities: {e}")
+        return None
+
+
+def _ovr_curves(Y, S):
+    """
+    ROC and precision-recall curves for every column at once.
+
+    All columns are sorted in one argsort; true/false positive counts at each threshold
+    are cumulative sums down the sorted columns. Matches sklearn's roc_curve (without
+    dropping intermediate points), precision_recall_curve and average_precision_score.
+
+    Parameters:
+    Y: (n_samples, n_columns) binary indicator matrix
+    S: (n_samples, n_columns) scores
+
+    Returns:
+    List of per-column dictionaries with fpr, tpr, roc_auc, precision, recall, average_precision
+    """
+    order = np.argsort(-S, axis=0, kind='mergesort')
+    S_sorted = np.take_along_axis(S, order, axis=0)
+    Y_sorted = np.take_along_axis(Y, order, axis=0).astype(np.float64)
+    tps_all = np.cumsum(Y_sorted, axis=0)
+    fps_all = np.arange(1, len(S) + 1)[:, None] - tps_all
+
+    curves = []
+    for k in range(S.shape[1]):
+        # Last index of every run of equal scores is a threshold
+        distinct = np.where(np.diff(S_sorted[:, k]))[0]
+        idx = np.r_[distinct, len(S) - 1]
+        tps = tps_all[idx, k]
+        fps = fps_all[idx, k]
+        positives, negatives = tps[-1], fps[-1]
+
+        tpr = np.r_[0.0, tps / positives] if positives > 0 else np.full(len(tps) + 1, np.nan)
+        fpr = np.r_[0.0, fps / negatives] if negatives > 0 else np.full(len(fps) + 1, np.nan)
+        roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)) if positives > 0 and negatives > 0 else float('nan')
+
+        # Precision-recall in sklearn's orientation: recall decreasing, ending at (recall 0, precision 1)
+        precision = tps / (tps + fps)
+        recall = tps / positives if positives > 0 else np.ones_like(tps)
+        precision = np.r_[precision[::-1], 1.0]
+        recall = np.r_[recall[::-1], 0.0]
+        average_precision = float(-np.sum(np.diff(recall) * precision[:-1])) if positives > 0 else float('nan')
+
+        curves.append({
+            'fpr': fpr,
+            'tpr': tpr,
+            'roc_auc': roc_auc,
+            'precision': precision,
+            'recall': recall,
+            'average_precision': average_precision,
+        })
+    return curves
+
+
+def classification_curves(y_true, y_score, classes=None):
+    """
+    Compute ROC and precision-recall curves for all classes from one probability matrix.
+
+    Parameters:
+    y_true: True labels
+    y_score: (n_samples, n_classes) probability matrix, column order as in classes
+    classes: Class labels of the columns (defaults to the sorted unique labels of y_true)
+
+    Returns:
+    Dictionary with:
+    - binary: True when there are two classes (one curve for the positive class)
+    - classes: Class label per curve
+    - curves: Per-curve fpr, tpr, roc_auc, precision, recall, average_precision
+    - prevalence: Fraction of positives per curve
+    - macro_roc_auc, macro_average_precision: Unweighted means over the curves
+    """
+    y_true = np.asarray(y_true)
+    y_score = np.asarray(y_score, dtype=np.float64)
+    if y_score.ndim == 1:
+        y_score = np.column_stack([1 - y_score, y_score])
+    if classes is None:
+        classes = np.unique(y_true)
+    classes = np.asarray(classes)
+
+    Y = (y_true[:, None] == classes[None, :])
+    binary = len(classes) == 2
+    if binary:
+        # Only the positive class, as in the binary charts
+        Y, y_score, classes = Y[:, 1:], y_score[:, 1:], classes[1:]
+
+    curves = _ovr_curves(Y, y_score)
+    return {
+        'binary': binary,
+        'classes': classes.tolist(),
+        'curves': curves,
+        'prevalence': Y.mean(axis=0).tolist(),
+        'macro_roc_auc': float(np.nanmean([c['roc_auc'] for c in curves])),
+        'macro_average_precision': float(np.nanmean([c['average_precision'] for c in curves])),
+    }
+
+
+def curve_summary(result):
+    """JSON friendly scalar metrics (AUC and AP per class) of a classification_curves result"""
+    def _num(value):
+        return None if np.isnan(value) else round(float(value), 6)
+
+    return {
+        'per_class': [
+            {
+                'class': cls.item() if hasattr(cls, 'item') else cls,
+                'roc_auc': _num(curve['roc_auc']),
+                'average_precision': _num(curve['average_precision']),
+            }
+            for cls, curve in zip(result['classes'], result['curves'])
+        ],
+        'macro_roc_auc': _num(result['macro_roc_auc']),
+        'macro_average_precision': _num(result['macro_average_precision']),
+    }
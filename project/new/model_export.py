@@ -0,0 +1,206 @@
+import os
+import copy
+import numpy as np
+from sklearn.base import is_classifier
+from sklearn.pipeline import Pipeline
+from db_file_system import DBFileSystem
+
+# Check if ONNX conversion is available
+try:
+    from skl2onnx import to_onnx
+    from skl2onnx.common.data_types import FloatTensorType, StringTensorType
+    SKL2ONNX_AVAILABLE = True
+except ImportError:
+    SKL2ONNX_AVAILABLE = False
+
+# Check if ONNX Runtime is available (used to validate exported models)
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+# Initialize database file system
+db_fs = DBFileSystem()
+
+# File name of the exported model, next to best_model.pkl
+ONNX_MODEL_FILE = 'best_model.onnx'
+
+# Set ONNX_EXPORT=false to skip the export
+ONNX_EXPORT = os.getenv('ONNX_EXPORT', 'true').lower() == 'true'
+
+# Rows used to check the exported model against the original, and the fraction of
+# predictions that must agree (float32 tree thresholds can flip a rare borderline row)
+ONNX_CHECK_ROWS = 200
+ONNX_MIN_AGREEMENT = 0.99
+
+# Probability gap below which the two most likely classes count as tied
+ONNX_TIE_TOLERANCE = 1e-6
+
+
+def _dense(X):
+    """Feature rows as a dense array, as the estimator saw them in training"""
+    if hasattr(X, 'toarray'):
+        X = X.toarray()
+    return np.asarray(X)
+
+
+def _conversion_options(model):
+    """Return class probabilities as a plain matrix instead of a list of {class: probability} maps"""
+    final = model.steps[-1][1] if hasattr(model, 'steps') else model
+    return {id(final): {'zipmap': False}} if is_classifier(final) else None
+
+
+def _exportable_transformer(fitted):
+    """
+    Copy of the fitted preprocessing that skl2onnx can convert, computing the same features.
+
+    Text is lowercased by clean_texts already, so the vectorizer skips it (the ONNX string
+    normalizer needs a system locale). Missing categories are fed to the graph as empty
+    strings, since the categorical imputer only converts with a string missing value.
+    """
+    transformer = copy.deepcopy(fitted['transformer'])
+    if fitted['kind'] == 'text':
+        transformer.lowercase = False
+    elif 'cat' in transformer.named_transformers_:
+        transformer.named_transformers_['cat'].named_steps['imputer'].missing_values = ''
+    return transformer
+
+
+def _input_types(fitted):
+    """ONNX inputs for raw rows: the cleaned text, or one column each in fitted['columns'] order"""
+    if fitted['kind'] == 'text':
+        return [('text', StringTensorType([None, 1]))]
+    return [(str(column), StringTensorType([None, 1]) if column in fitted['categories'] else FloatTensorType([None, 1]))
+            for column in fitted['columns']]
+
+
+def onnx_feeds(fitted, session, rows):
+    """
+    ONNX Runtime inputs for raw rows of a graph exported by export_onnx.
+
+    Parameters:
+    fitted: Preprocessing dictionary from preprocess_dataset
+    session: onnxruntime.InferenceSession of the exported model
+    rows: DataFrame with the raw feature columns (text already cleaned for text models)
+    """
+    inputs = session.get_inputs()
+    if fitted['kind'] == 'text':
+        texts = np.asarray(rows[fitted['text_column']], dtype=object)
+        return {inputs[0].name: texts.reshape(-1, 1)}
+    # Input names are sanitized by the converter, so columns are matched by position
+    feeds = {}
+    for graph_input, column in zip(inputs, fitted['columns']):
+        if graph_input.type == 'tensor(string)':
+            values = rows[column].fillna('').astype(str).to_numpy(dtype=object)
+        else:
+            values = rows[column].to_numpy(dtype=np.float32)
+        feeds[graph_input.name] = values.reshape(-1, 1)
+    return feeds
+
+
+def _matches(model, content, X, fitted, rows):
+    """
+    Check that the ONNX model predicts like the original on sample rows.
+
+    Parameters:
+    model: Original estimator
+    content: Serialized ONNX model (preprocessing included)
+    X: Feature matrix of the sample rows, as the estimator sees them
+    fitted: Preprocessing dictionary
+    rows: The same rows before preprocessing (text cleaned)
+    """
+    session = ort.InferenceSession(content, providers=['CPUExecutionProvider'])
+    outputs = session.run(None, onnx_feeds(fitted, session, rows))
+    expected = np.asarray(model.predict(X))
+    predicted = np.asarray(outputs[0]).reshape(expected.shape)
+    if is_classifier(model):
+        agree = predicted == expected
+        if hasattr(model, 'predict_proba'):
+            # Rows where the top two classes tie (e.g. an even forest vote) may go either way
+            top_two = np.sort(np.asarray(model.predict_proba(X)), axis=1)[:, -2:]
+            agree |= (top_two[:, 1] - top_two[:, 0]) <= ONNX_TIE_TOLERANCE
+        agreement = float(np.mean(agree))
+        print(f"ONNX model agrees with the original on {agreement:.1%} of {len(X)} rows")
+        return agreement >= ONNX_MIN_AGREEMENT
+    scale = max(float(np.std(expected)), 1e-6)
+    return np.allclose(predicted, expected, rtol=1e-3, atol=1e-3 * scale)
+
+
+def export_onnx(model, fitted, raw_rows):
+    """
+    Convert a fitted scikit-learn model together with its fitted preprocessing to ONNX.
+
+    The graph is Pipeline([preprocessor, model]) and takes raw rows (one input per column,
+    or the cleaned text for text models), so serving needs no pickled transformer.
+
+    Parameters:
+    model: Fitted estimator (trained on the output of fitted['transformer'])
+    fitted: Preprocessing dictionary from preprocess_dataset or apply_preprocessor
+    raw_rows: DataFrame of raw feature rows, used to validate the conversion
+
+    Returns:
+    Serialized ONNX model, or None if the model cannot be converted or does not match
+    """
+    if not SKL2ONNX_AVAILABLE:
+        print("skl2onnx not available, skipping ONNX export")
+        return None
+    try:
+        rows = raw_rows.iloc[:ONNX_CHECK_ROWS].copy()
+        if fitted['kind'] == 'text':
+            from preprocessing import clean_texts
+            rows[fitted['text_column']] = clean_texts(rows[fitted['text_column']])
+            X = fitted['transformer'].transform(rows[fitted['text_column']])
+        else:
+            X = fitted['transformer'].transform(rows[fitted['columns']])
+        X = _dense(X)
+
+        pipeline = Pipeline([('preprocessor', _exportable_transformer(fitted)), ('model', model)])
+        onnx_model = to_onnx(pipeline, initial_types=_input_types(fitted), options=_conversion_options(model))
+        content = onnx_model.SerializeToString()
+        if ONNXRUNTIME_AVAILABLE and not _matches(model, content, X, fitted, rows):
+            print("ONNX model predictions differ from the original, skipping ONNX export")
+            return None
+        return content
+    except Exception as e:
+        print(f"Could not export model to ONNX: {e}")
+        return None
+
+
+def export_onnx_model(model, fitted, raw_rows, models_dir):
+    """
+    Export the best model and its preprocessing to ONNX next to best_model.pkl (database or filesystem).
+
+    A previous export is removed when the current model cannot be exported, so a bundle
+    never pairs the pickle with an ONNX file of another model.
+
+    Returns:
+    ONNX_MODEL_FILE if the model was exported, otherwise None
+    """
+    is_database = 'ml_system' in models_dir
+    if is_database:
+        parts = models_dir.replace('\\', '/').strip('/').split('/')
+        idx = parts.index('ml_system')
+        dir_name = parts[idx + 1] if idx + 1 < len(parts) else 'models'
+
+    content = export_onnx(model, fitted, raw_rows) if ONNX_EXPORT else None
+    try:
+        if content is None:
+            if is_database:
+                if db_fs.file_exists(ONNX_MODEL_FILE, dir_name):
+                    db_fs.delete_file(ONNX_MODEL_FILE, dir_name)
+            elif os.path.exists(os.path.join(models_dir, ONNX_MODEL_FILE)):
+                os.remove(os.path.join(models_dir, ONNX_MODEL_FILE))
+            return None
+
+        if is_database:
+            db_fs.save_file_content(content, ONNX_MODEL_FILE, dir_name)
+            print("ONNX model saved to database")
+        else:
+            with open(os.path.join(models_dir, ONNX_MODEL_FILE), 'wb') as f:
+                f.write(content)
+            print(f"ONNX model saved as {ONNX_MODEL_FILE}")
+        return ONNX_MODEL_FILE
+    except Exception as e:
+        print(f"Error saving the ONNX model: {e}")
+        return None
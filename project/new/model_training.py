@@ -2,6 +2,7 @@ import pickle
 import os
 import numpy as np
 from sklearn.model_selection import GridSearchCV
+from sklearn.base import clone
 from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC, SVR
@@ -14,11 +15,19 @@ import pandas as pd
 import numpy as np
 import tempfile
 import io
+import json
+import math
 from db_file_system import DBFileSystem
 
 # Initialize database file system
 db_fs = DBFileSystem()
 
+# Sidecar file holding the best model's hyperparameters and scores, used for incremental retraining
+TRAINING_META_FILE = "training_meta.json"
+
+# Maximum drop in test score (accuracy or r2) tolerated before an incremental run falls back to a full search
+DRIFT_THRESHOLD = 0.05
+
 # Check if TensorFlow is available
 try:
     import tensorflow as tf
@@ -37,8 +46,20 @@ try:
 except ImportError:
     YOLO_AVAILABLE = False
 
-def train_models(X_train, y_train, X_test, y_test, task_type, models_dir, dataset_folder=None):
-    """Train models based on task type"""
+def train_models(X_train, y_train, X_test, y_test, task_type, models_dir, dataset_folder=None,
+                 incremental=False, drift_threshold=DRIFT_THRESHOLD,
+                 dataset_id=None, parent_dataset=None, dataset_schema=None):
+    """Train models based on task type
+
+    When incremental is True and the model in models_dir was trained on parent_dataset with
+    the same dataset_schema (see previous_training_matches), the previous best model and its
+    hyperparameters are reused instead of re-running the grid search. The search only runs
+    again when the previous model's test score has drifted by more than drift_threshold on
+    the new data. X must then come from the previous run's preprocessing (apply_preprocessor).
+
+    dataset_id and dataset_schema are recorded with the trained model, so a later version
+    of this dataset can be trained incrementally from it.
+    """
     # Handle object detection separately
     if task_type == 'object_detection' and YOLO_AVAILABLE:
         return train_yolo_model(dataset_folder, models_dir)
@@ -69,6 +90,15 @@ def train_models(X_train, y_train, X_test, y_test, task_type, models_dir, datase
                 models_dir
             )
     
+    # Reuse the previous best model for appended/altered versions of the same dataset
+    if incremental:
+        result = retrain_incremental(X_train, y_train, X_test, y_test, task_type, models_dir, drift_threshold,
+                                     dataset_id=dataset_id, parent_dataset=parent_dataset,
+                                     dataset_schema=dataset_schema)
+        if result is not None:
+            return result
+        print("Falling back to full hyperparameter search")
+
     # Original logic for other model types
     models = {
         "Decision Tree": DecisionTreeClassifier() if task_type in ['classification', 'nlp'] else DecisionTreeRegressor(),
@@ -81,6 +111,7 @@ def train_models(X_train, y_train, X_test, y_test, task_type, models_dir, datase
     best_model = None
     best_model_name = ""
     best_score = -float('inf')
+    best_params = {}
 
     for model_name, model in models.items():
         if model is None:
@@ -118,14 +149,209 @@ def train_models(X_train, y_train, X_test, y_test, task_type, models_dir, datase
             best_score = score
             best_model = grid_search.best_estimator_
             best_model_name = model_name
+            best_params = grid_search.best_params_
 
     if best_model is not None:
         save_best_model(best_model, models_dir)
+        save_training_metadata(models_dir, {
+            'task_type': task_type,
+            'model_name': best_model_name,
+            'best_params': best_params,
+            'score': best_score,
+            'n_features': X_train.shape[1],
+            'n_train_samples': X_train.shape[0],
+            'dataset_id': dataset_id,
+            'dataset_schema': dataset_schema,
+            'mode': 'full_search'
+        })
     else:
         print("No suitable model was found.")
 
     return best_model, best_model_name, best_score, best_model.predict(X_test) if best_model else None
 
+def _get_models_dir_name(models_dir):
+    """Return the database directory name for a models_dir path (e.g. 'models')"""
+    parts = models_dir.replace('\\', '/').strip('/').split('/')
+    idx = parts.index('ml_system')
+    return parts[idx + 1] if idx + 1 < len(parts) else 'models'
+
+def save_training_metadata(models_dir, metadata):
+    """Save the best model's hyperparameters and scores next to best_model.pkl"""
+    try:
+        content = json.dumps(metadata, indent=2, default=str)
+        if 'ml_system' in models_dir:
+            # Save to database
+            db_fs.save_file_content(content.encode('utf-8'), TRAINING_META_FILE, _get_models_dir_name(models_dir))
+        else:
+            # Save to filesystem
+            with open(os.path.join(models_dir, TRAINING_META_FILE), "w") as f:
+                f.write(content)
+    except Exception as e:
+        print(f"Error saving training metadata: {e}")
+
+def load_training_metadata(models_dir):
+    """Load the training metadata of the model in models_dir, or None if there is none"""
+    try:
+        if 'ml_system' in models_dir:
+            dir_name = _get_models_dir_name(models_dir)
+            if not db_fs.file_exists(TRAINING_META_FILE, dir_name):
+                return None
+            return json.loads(db_fs.get_file(TRAINING_META_FILE, dir_name).decode('utf-8'))
+        meta_path = os.path.join(models_dir, TRAINING_META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Could not load training metadata: {e}")
+        return None
+
+def previous_training_matches(metadata, task_type, parent_dataset, dataset_schema):
+    """
+    Check that the stored model was trained on parent_dataset, for the same task and
+    dataset schema, so it can be updated with a new version of that dataset.
+
+    models_dir is shared by all runs, so without this check an unrelated earlier run with
+    the same width and classes would be reused.
+    """
+    if metadata is None:
+        print("No previous model found for incremental training")
+        return False
+    if not parent_dataset or metadata.get('dataset_id') != parent_dataset:
+        print(f"Previous model was trained on {metadata.get('dataset_id')!r}, not the parent dataset {parent_dataset!r}")
+        return False
+    if metadata.get('task_type') != task_type:
+        print(f"Previous model was trained for {metadata.get('task_type')}, not {task_type}")
+        return False
+    if not dataset_schema or metadata.get('dataset_schema') != dataset_schema:
+        print("Dataset columns changed since the previous model was trained")
+        return False
+    return True
+
+def load_previous_training(models_dir):
+    """
+    Load the previous best model and its training metadata.
+
+    Returns:
+    (model, metadata), or (None, None) if no usable previous run exists
+    """
+    metadata = load_training_metadata(models_dir)
+    if metadata is None:
+        return None, None
+    try:
+        if 'ml_system' in models_dir:
+            dir_name = _get_models_dir_name(models_dir)
+            if not db_fs.file_exists("best_model.pkl", dir_name):
+                return None, None
+            model = pickle.loads(db_fs.get_file("best_model.pkl", dir_name))
+        else:
+            model_path = os.path.join(models_dir, "best_model.pkl")
+            if not os.path.exists(model_path):
+                return None, None
+            with open(model_path, "rb") as f:
+                model = pickle.load(f)
+    except Exception as e:
+        print(f"Could not load previous model: {e}")
+        return None, None
+
+    # Placeholder pickles written for YOLO/TensorFlow models are not reusable here
+    if isinstance(model, dict) or not hasattr(model, 'predict'):
+        return None, None
+
+    return model, metadata
+
+def retrain_incremental(X_train, y_train, X_test, y_test, task_type, models_dir, drift_threshold=DRIFT_THRESHOLD,
+                        dataset_id=None, parent_dataset=None, dataset_schema=None):
+    """
+    Update the previous best model with a new version of its dataset instead of re-searching.
+
+    Random Forest and Gradient Boosting keep their fitted trees/stages and grow new ones in
+    proportion to the added rows (warm_start); each new tree is still fit on the whole
+    training set. The other models are refit once with the previously selected
+    hyperparameters. Either way one fit replaces the grid search (models x grid x CV folds),
+    but the cost still grows with the dataset, not only with the added rows.
+
+    Returns:
+    (model, model_name, score, y_pred) like train_models, or None when a full search is needed
+    """
+    is_classification = task_type in ['classification', 'nlp']
+    score_fn = accuracy_score if is_classification else r2_score
+
+    prev_model, metadata = load_previous_training(models_dir)
+    if prev_model is None:
+        print("No previous model found for incremental training")
+        return None
+    if not previous_training_matches(metadata, task_type, parent_dataset, dataset_schema):
+        return None
+
+    if metadata.get('n_features') != X_train.shape[1]:
+        print(f"Feature count changed ({metadata.get('n_features')} -> {X_train.shape[1]})")
+        return None
+
+    # New target classes cannot be added to an already fitted classifier
+    if is_classification and hasattr(prev_model, 'classes_'):
+        new_classes = set(np.unique(y_train)) - set(prev_model.classes_)
+        if new_classes:
+            print(f"New classes found in data: {new_classes}")
+            return None
+
+    # Measure drift of the previous model on the new test split
+    try:
+        prev_score = score_fn(y_test, prev_model.predict(X_test))
+    except Exception as e:
+        print(f"Could not evaluate previous model on new data: {e}")
+        return None
+
+    baseline = metadata.get('score', prev_score)
+    drift = baseline - prev_score
+    print(f"Previous {metadata.get('model_name')} - Stored Score: {baseline}, Score on new data: {prev_score}")
+    if drift > drift_threshold:
+        print(f"Validation drift {drift:.4f} exceeds threshold {drift_threshold}")
+        return None
+
+    n_prev = metadata.get('n_train_samples', 0)
+    n_new = X_train.shape[0]
+    model = prev_model
+    mode = 'refit'
+
+    try:
+        if 'warm_start' in model.get_params() and 'n_estimators' in model.get_params():
+            # Grow the ensemble in proportion to the rows added since the last run
+            n_estimators = model.get_params()['n_estimators']
+            growth = max(n_new - n_prev, 0) / max(n_prev, 1)
+            extra = max(int(math.ceil(n_estimators * growth)), 10)
+            model.set_params(warm_start=True, n_estimators=n_estimators + extra)
+            model.fit(X_train, y_train)
+            model.set_params(warm_start=False)
+            mode = 'warm_start'
+            print(f"Added {extra} estimators ({n_estimators} -> {n_estimators + extra})")
+        else:
+            # Refit once with the previously selected hyperparameters, skipping the grid search
+            model = clone(model)
+            model.fit(X_train, y_train)
+    except Exception as e:
+        print(f"Error during incremental training: {e}")
+        return None
+
+    y_pred = model.predict(X_test)
+    score = score_fn(y_test, y_pred)
+    print(f"{metadata.get('model_name')} ({mode}) - Test Score: {score}")
+
+    save_best_model(model, models_dir)
+    save_training_metadata(models_dir, {
+        'task_type': task_type,
+        'model_name': metadata.get('model_name'),
+        'best_params': metadata.get('best_params', {}),
+        'score': score,
+        'n_features': X_train.shape[1],
+        'n_train_samples': n_new,
+        'dataset_id': dataset_id,
+        'dataset_schema': dataset_schema,
+        'mode': mode
+    })
+
+    return model, metadata.get('model_name'), score, y_pred
+
 def train_image_classification_model(
     training_generator, 
     validation_generator=None,
@@ -136,7 +362,10 @@ def train_image_classification_model(
     learning_rate=0.001,
     batch_size=32,
     early_stopping_patience=3,
-    return_history=False
+    return_history=False,
+    use_tf_data=True,
+    training_profile=None,
+    backbone=None
 ):
     """
     Train a CNN model for image classification using TensorFlow.
@@ -152,6 +381,9 @@ def train_image_classification_model(
     batch_size: Batch size for training
     early_stopping_patience: Number of epochs with no improvement after which training will stop
     return_history: Whether to return training history
+    use_tf_data: Feed the generators' files through a cached, prefetched tf.data pipeline
+    training_profile: 'cpu' for thread tuning, oneDNN-friendly layers, optional bfloat16 and XLA
+    backbone: Pretrained backbone name (e.g. 'mobilenet_v2') to train only a head on cached embeddings
     
     Returns:
     model: Trained CNN model
@@ -199,8 +431,44 @@ def train_image_classification_model(
     image_shape = training_set.image_shape if hasattr(training_set, 'image_shape') else (64, 64, 3)
     print(f"Input image shape: {image_shape}")
     
+    # Frozen pretrained backbone: train only a small head on cached embeddings
+    if backbone:
+        from transfer_learning import train_transfer_learning_model
+        try:
+            cnn, model_name, accuracy, y_pred, history = train_transfer_learning_model(
+                training_set,
+                validation_set=validation_set,
+                test_set=test_set,
+                num_classes=num_classes,
+                backbone=backbone,
+                learning_rate=learning_rate,
+                batch_size=batch_size
+            )
+            if models_dir:
+                # Save to database
+                temp_model_path = os.path.join(tempfile.gettempdir(), "best_model.keras")
+                cnn.save(temp_model_path)
+                db_fs.save_file(temp_model_path, 'models')
+                os.remove(temp_model_path)
+            return cnn, model_name, accuracy, y_pred, history if return_history else None
+        except FileNotFoundError as e:
+            print(f"{e}. Falling back to training the CNN from scratch")
+    
+    from training_profiles import CPU_PROFILE, ThroughputCallback
+    use_cpu_profile = training_profile == 'cpu'
+    
+    if use_cpu_profile:
+        from training_profiles import configure_cpu_threads, resolve_mixed_precision, build_cpu_cnn
+        # Thread pools must be configured before the first TensorFlow op runs
+        configure_cpu_threads(CPU_PROFILE['intra_op_threads'], CPU_PROFILE['inter_op_threads'])
+        policy = resolve_mixed_precision(CPU_PROFILE['mixed_precision'])
+        print(f"Using CPU training profile (mixed precision: {policy or 'off'}, XLA: {CPU_PROFILE['jit_compile']})")
+        cnn = build_cpu_cnn(image_shape, num_classes, mixed_precision_policy=policy)
+    else:
+        cnn = None
+    
     # Create a robust CNN model
-    cnn = Sequential([
+    cnn = cnn or Sequential([
         # First convolution block
         Conv2D(32, (3, 3), padding='same', activation='relu', input_shape=image_shape),
         MaxPooling2D(pool_size=(2, 2)),
@@ -225,10 +493,12 @@ def train_image_classification_model(
     ])
 
     # Compile the model
+    compile_kwargs = {'jit_compile': True} if use_cpu_profile and CPU_PROFILE['jit_compile'] else {}
     cnn.compile(
         optimizer=Adam(learning_rate=learning_rate),
         loss='categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        **compile_kwargs
     )
 
     # Print model summary
@@ -259,29 +529,50 @@ def train_image_classification_model(
     )
     callbacks.append(model_checkpoint)
     
+    # Steps/sec per epoch, used for sizing training nodes
+    throughput = ThroughputCallback(batch_size, samples_per_epoch=getattr(training_set, 'samples', None))
+    callbacks.append(throughput)
+    
+    # Build tf.data pipelines from the generators' files (parallel decode, cache, prefetch)
+    train_data, validation_data, test_data = training_set, validation_set or test_set, test_set
+    if use_tf_data and (hasattr(training_set, 'filepaths') or hasattr(training_set, 'images')):
+        from image_pipeline import dataset_from_generator
+        print("Using tf.data input pipeline")
+        train_data = dataset_from_generator(training_set, batch_size=batch_size, training=True)
+        validation_data = dataset_from_generator(validation_set or test_set, batch_size=batch_size)
+        # Reuse the validation pipeline (and its cache) when the test set is the same generator
+        test_data = validation_data if test_set is (validation_set or test_set) else dataset_from_generator(test_set, batch_size=batch_size)
+    
     # Train the model
     print(f"Training for {epochs} epochs...")
+    fit_kwargs = {} if train_data is not training_set else {'batch_size': batch_size}
     history = cnn.fit(
-        training_set,
-        validation_data=validation_set or test_set,  # Use validation set if available, otherwise use test set
+        train_data,
+        validation_data=validation_data,  # Use validation set if available, otherwise use test set
         epochs=epochs,
-        batch_size=batch_size,
         callbacks=callbacks,
-        verbose=1
+        verbose=1,
+        **fit_kwargs
     )
+    history.throughput = throughput.summary()
+    print(f"Training throughput: {history.throughput}")
     
     # Evaluate the model on test set if available
     if test_set:
         print("Evaluating model on test set...")
-        evaluation = cnn.evaluate(test_set)
+        evaluation = cnn.evaluate(test_data)
         accuracy = evaluation[1]  # accuracy is typically the second metric
         print(f"Test accuracy: {accuracy:.4f}")
         
         # Generate predictions on test set
         print("Generating predictions on test set...")
         test_set.reset()
-        y_pred_probs = cnn.predict(test_set)
+        y_pred_probs = cnn.predict(test_data)
         y_pred = np.argmax(y_pred_probs, axis=1)
+        # Kept for create_cnn_visualization, so the test set is not predicted twice; only the
+        # tf.data pipeline keeps the order of test_set.classes (Keras generators shuffle)
+        if test_data is not test_set:
+            history.test_probabilities = y_pred_probs
     else:
         # If no test set, evaluate on training set
         print("No test set provided. Evaluating on training set...")
@@ -317,399 +608,76 @@ def train_image_classification_model(
     else:
         return cnn, "CNN", accuracy, y_pred, None
 
-def train_yolo_model(dataset_folder, models_dir):
+def train_yolo_model(dataset_folder, models_dir, profile=None):
     """
     Train a YOLOv8 model for object detection.
     Enhanced to work with flexible directory structures and database storage.
+    
+    profile selects a training profile from training_profiles.YOLO_PROFILES
+    ('quick', 'balanced' or 'thorough'); throughput is reported in metrics_info.
     """
     import os
     import tempfile
     import shutil
-    import zipfile  # Add this import
-    import yaml     # Add this import
     
     if not YOLO_AVAILABLE:
         raise ImportError("YOLO is required for object detection but not available")
     
-    # Find data.yaml file in the dataset folder
-    yaml_files = [f for f in os.listdir(dataset_folder) if f.endswith('.yaml')]
-    if not yaml_files:
-        raise ValueError("No data.yaml file found in the dataset folder. Please ensure your dataset includes a YAML configuration file.")
-    
-    # Create a single temporary directory for all processing
-    temp_dir = tempfile.mkdtemp()
-    print(f"Created temporary directory for YOLO processing: {temp_dir}")
+    # Materialize the dataset once per dataset hash (shared with the visualizations)
+    from yolo_dataset import stage_yolo_dataset, release_staged_dataset
+    staged = stage_yolo_dataset(dataset_folder)
+    data_yaml = staged['data_yaml']
     
     try:
-        # Get the yaml file from database if needed
-        if 'ml_system' in dataset_folder:
-            # Extract the directory name from dataset_folder
-            parts = dataset_folder.replace('\\', '/').strip('/').split('/')
-            idx = parts.index('ml_system')
-            if idx + 1 < len(parts):
-                dir_name = parts[idx + 1]
-                yaml_filename = yaml_files[0]
-                
-                # Get the yaml file from database and save to temp dir
-                yaml_content = db_fs.get_file(yaml_filename, dir_name)
-                temp_yaml_path = os.path.join(temp_dir, yaml_filename)
-                with open(temp_yaml_path, 'wb') as f:
-                    f.write(yaml_content)
-                
-                # Also check for yolo_dataset.zip which contains the full dataset
-                try:
-                    files_in_db = db_fs.list_files(dir_name)
-                    print(f"Files in database: {files_in_db}")
-                    
-                    if 'yolo_dataset.zip' in files_in_db:
-                        print("Found yolo_dataset.zip in database, extracting...")
-                        zip_content = db_fs.get_file('yolo_dataset.zip', dir_name)
-                        temp_zip_path = os.path.join(temp_dir, 'yolo_dataset.zip')
-                        with open(temp_zip_path, 'wb') as f:
-                            f.write(zip_content)
-                        
-                        # Extract the zip file
-                        with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-                            # Print the contents of the zip
-                            print(f"Zip file contents: {zip_ref.namelist()}")
-                            zip_ref.extractall(temp_dir)
-                        
-                        print(f"Extracted dataset to {temp_dir}")
-                        print(f"Contents after extraction: {os.listdir(temp_dir)}")
-                    else:
-                        print("No yolo_dataset.zip found, will try to process individual files")
-                        
-                        # Look for individual image and label files
-                        # Train
-                        train_dir = os.path.join(temp_dir, 'train')
-                        os.makedirs(os.path.join(train_dir, 'images'), exist_ok=True)
-                        os.makedirs(os.path.join(train_dir, 'labels'), exist_ok=True)
-                        
-                        # Valid
-                        valid_dir = os.path.join(temp_dir, 'valid')
-                        os.makedirs(os.path.join(valid_dir, 'images'), exist_ok=True)
-                        os.makedirs(os.path.join(valid_dir, 'labels'), exist_ok=True)
-                        
-                        # Test (if needed)
-                        test_dir = os.path.join(temp_dir, 'test')
-                        os.makedirs(os.path.join(test_dir, 'images'), exist_ok=True)
-                        os.makedirs(os.path.join(test_dir, 'labels'), exist_ok=True)
-                        
-                        # Look for image files in database
-                        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-                        label_extension = '.txt'
-                        
-                        for filename in files_in_db:
-                            if any(filename.lower().endswith(ext) for ext in image_extensions):
-                                # Determine if it's train, valid, or test
-                                folder = None
-                                if 'train' in filename.lower():
-                                    folder = train_dir
-                                elif 'valid' in filename.lower() or 'val' in filename.lower():
-                                    folder = valid_dir
-                                elif 'test' in filename.lower():
-                                    folder = test_dir
-                                else:
-                                    # Default to train
-                                    folder = train_dir
-                                
-                                # Get the file content
-                                try:
-                                    content = db_fs.get_file(filename, dir_name)
-                                    dest_path = os.path.join(folder, 'images', os.path.basename(filename))
-                                    with open(dest_path, 'wb') as f:
-                                        f.write(content)
-                                    print(f"Saved image {filename} to {dest_path}")
-                                except Exception as img_err:
-                                    print(f"Error saving image {filename}: {img_err}")
-                            
-                            elif filename.lower().endswith(label_extension):
-                                # Determine if it's train, valid, or test
-                                folder = None
-                                if 'train' in filename.lower():
-                                    folder = train_dir
-                                elif 'valid' in filename.lower() or 'val' in filename.lower():
-                                    folder = valid_dir
-                                elif 'test' in filename.lower():
-                                    folder = test_dir
-                                else:
-                                    # Default to train
-                                    folder = train_dir
-                                
-                                # Get the file content
-                                try:
-                                    content = db_fs.get_file(filename, dir_name)
-                                    dest_path = os.path.join(folder, 'labels', os.path.basename(filename))
-                                    with open(dest_path, 'wb') as f:
-                                        f.write(content)
-                                    print(f"Saved label {filename} to {dest_path}")
-                                except Exception as lbl_err:
-                                    print(f"Error saving label {filename}: {lbl_err}")
-                        
-                except Exception as e:
-                    print(f"Error extracting yolo_dataset.zip: {e}")
-                
-                # Now use the temp_yaml_path
-                data_yaml = temp_yaml_path
-                
-                # Modify the yaml file to use the local paths
-                try:
-                    with open(data_yaml, 'r') as f:
-                        yaml_data = yaml.safe_load(f)
-                    
-                    # Update paths to point to the temp directory
-                    for key in ['train', 'val', 'test']:
-                        if key in yaml_data:
-                            if key == 'val' and os.path.exists(os.path.join(temp_dir, 'valid', 'images')):
-                                # Handle 'val' vs 'valid' directory name difference
-                                yaml_data[key] = os.path.join(temp_dir, 'valid', 'images')
-                            else:
-                                # Standard path
-                                yaml_data[key] = os.path.join(temp_dir, key, 'images')
-                            
-                            # Make sure the directory exists
-                            os.makedirs(os.path.dirname(yaml_data[key]), exist_ok=True)
-                    
-                    # Ensure there's a val path (required by YOLO)
-                    if 'val' not in yaml_data and 'train' in yaml_data:
-                        # Use train path with 'valid' instead of 'train'
-                        train_path = yaml_data['train']
-                        val_path = train_path.replace('train', 'valid')
-                        if not os.path.exists(os.path.dirname(val_path)):
-                            # If valid doesn't exist, copy from train
-                            train_dir = os.path.dirname(train_path)
-                            valid_dir = os.path.dirname(val_path)
-                            os.makedirs(valid_dir, exist_ok=True)
-                            
-                            # Copy a few images and labels to valid
-                            if os.path.exists(train_dir) and os.listdir(train_dir):
-                                import random
-                                train_images = [f for f in os.listdir(train_path) if os.path.isfile(os.path.join(train_path, f))]
-                                if train_images:
-                                    # Take 20% for validation
-                                    random.shuffle(train_images)
-                                    num_val = max(1, int(len(train_images) * 0.2))
-                                    val_images = train_images[:num_val]
-                                    
-                                    # Copy images
-                                    os.makedirs(val_path, exist_ok=True)
-                                    for img in val_images:
-                                        shutil.copy2(os.path.join(train_path, img), os.path.join(val_path, img))
-                                    
-                                    # Copy corresponding labels
-                                    train_labels_dir = os.path.join(train_dir, 'labels')
-                                    val_labels_dir = os.path.join(valid_dir, 'labels')
-                                    os.makedirs(val_labels_dir, exist_ok=True)
-                                    
-                                    for img in val_images:
-                                        # Get base name without extension
-                                        base_name = os.path.splitext(img)[0]
-                                        label_file = f"{base_name}.txt"
-                                        if os.path.exists(os.path.join(train_labels_dir, label_file)):
-                                            shutil.copy2(
-                                                os.path.join(train_labels_dir, label_file),
-                                                os.path.join(val_labels_dir, label_file)
-                                            )
-                        
-                        # Add val path to yaml
-                        yaml_data['val'] = val_path
-                    
-                    # Write the modified yaml back
-                    with open(data_yaml, 'w') as f:
-                        yaml.dump(yaml_data, f, default_flow_style=False)
-                    
-                    print("Updated yaml file with local paths:")
-                    for key in ['train', 'val', 'test']:
-                        if key in yaml_data:
-                            path_exists = os.path.exists(yaml_data[key])
-                            print(f"  {key}: {yaml_data[key]} (exists: {path_exists})")
-                            
-                            if not path_exists:
-                                # Create the directory if it doesn't exist
-                                os.makedirs(yaml_data[key], exist_ok=True)
-                                print(f"  Created directory: {yaml_data[key]}")
-                    
-                except Exception as e:
-                    print(f"Error updating yaml file: {e}")
-                    # If we fail to update the YAML, create a basic one
-                    data_yaml = os.path.join(temp_dir, 'data.yaml')
-                    
-                    # Find train, val, test directories in temp_dir
-                    train_dir = None
-                    val_dir = None
-                    test_dir = None
-                    
-                    for dir_name in os.listdir(temp_dir):
-                        dir_path = os.path.join(temp_dir, dir_name)
-                        if not os.path.isdir(dir_path):
-                            continue
-                            
-                        if dir_name.lower() == 'train':
-                            train_dir = dir_path
-                        elif dir_name.lower() in ['val', 'valid']:
-                            val_dir = dir_path
-                        elif dir_name.lower() == 'test':
-                            test_dir = dir_path
-                    
-                    # Create basic YAML data
-                    yaml_data = {
-                        'nc': 1,  # Default to 1 class
-                        'names': ['object']  # Default class name
-                    }
-                    
-                    # Add dataset paths
-                    if train_dir:
-                        img_dir = os.path.join(train_dir, 'images')
-                        os.makedirs(img_dir, exist_ok=True)
-                        yaml_data['train'] = img_dir
-                    
-                    if val_dir:
-                        img_dir = os.path.join(val_dir, 'images')
-                        os.makedirs(img_dir, exist_ok=True)
-                        yaml_data['val'] = img_dir
-                    elif train_dir:  # Create val from train if not exists
-                        val_dir = os.path.join(temp_dir, 'valid')
-                        img_dir = os.path.join(val_dir, 'images')
-                        os.makedirs(img_dir, exist_ok=True)
-                        yaml_data['val'] = img_dir
-                    
-                    if test_dir:
-                        img_dir = os.path.join(test_dir, 'images')
-                        os.makedirs(img_dir, exist_ok=True)
-                        yaml_data['test'] = img_dir
-                    
-                    # Write the YAML file
-                    with open(data_yaml, 'w') as f:
-                        yaml.dump(yaml_data, f, default_flow_style=False)
-                
-            else:
-                # Standard path for yaml file
-                data_yaml = os.path.join(dataset_folder, yaml_files[0])
-        else:
-            # Standard path for yaml file
-            data_yaml = os.path.join(dataset_folder, yaml_files[0])
-        
         print(f"Using YAML configuration: {data_yaml}")
-        
-        # Validate the YAML file and dataset structure
-        try:
-            with open(data_yaml, 'r') as f:
-                yaml_data = yaml.safe_load(f)
-                
-            # Check essential components
-            required_keys = ['train', 'val', 'names']
-            missing_keys = [key for key in required_keys if key not in yaml_data]
-            if missing_keys:
-                print(f"YAML file missing required keys: {', '.join(missing_keys)}")
-                
-                # Add missing keys
-                if 'names' not in yaml_data:
-                    yaml_data['names'] = ['object']  # Default class name
-                    yaml_data['nc'] = 1  # Number of classes
-                
-                if 'train' not in yaml_data and os.path.exists(os.path.join(temp_dir, 'train', 'images')):
-                    yaml_data['train'] = os.path.join(temp_dir, 'train', 'images')
-                
-                if 'val' not in yaml_data:
-                    if os.path.exists(os.path.join(temp_dir, 'valid', 'images')):
-                        yaml_data['val'] = os.path.join(temp_dir, 'valid', 'images')
-                    elif os.path.exists(os.path.join(temp_dir, 'val', 'images')):
-                        yaml_data['val'] = os.path.join(temp_dir, 'val', 'images')
-                
-                # Write the updated YAML file
-                with open(data_yaml, 'w') as f:
-                    yaml.dump(yaml_data, f, default_flow_style=False)
-            
-            # Check if the specified paths exist
-            train_path = yaml_data.get('train')
-            val_path = yaml_data.get('val')
-            
-            if train_path:
-                if not os.path.exists(train_path):
-                    print(f"Warning: Training path {train_path} does not exist!")
-                    
-                    # Try to create or find alternative path
-                    if os.path.exists(os.path.join(temp_dir, 'train', 'images')):
-                        yaml_data['train'] = os.path.join(temp_dir, 'train', 'images')
-                        print(f"Updated train path to: {yaml_data['train']}")
-                    else:
-                        os.makedirs(os.path.join(temp_dir, 'train', 'images'), exist_ok=True)
-                        yaml_data['train'] = os.path.join(temp_dir, 'train', 'images')
-                        print(f"Created train path: {yaml_data['train']}")
-            
-            if val_path:
-                if not os.path.exists(val_path):
-                    print(f"Warning: Validation path {val_path} does not exist!")
-                    
-                    # Try to create or find alternative path
-                    if os.path.exists(os.path.join(temp_dir, 'valid', 'images')):
-                        yaml_data['val'] = os.path.join(temp_dir, 'valid', 'images')
-                        print(f"Updated val path to: {yaml_data['val']}")
-                    elif os.path.exists(os.path.join(temp_dir, 'val', 'images')):
-                        yaml_data['val'] = os.path.join(temp_dir, 'val', 'images')
-                        print(f"Updated val path to: {yaml_data['val']}")
-                    else:
-                        os.makedirs(os.path.join(temp_dir, 'valid', 'images'), exist_ok=True)
-                        yaml_data['val'] = os.path.join(temp_dir, 'valid', 'images')
-                        print(f"Created val path: {yaml_data['val']}")
-            
-            # Write the updated YAML file
-            with open(data_yaml, 'w') as f:
-                yaml.dump(yaml_data, f, default_flow_style=False)
-            
-            print(f"Dataset has {len(yaml_data.get('names', {}))} classes")
-            
-        except Exception as e:
-            print(f"Error validating YAML configuration: {e}")
-            raise
+        print(f"Dataset has {len(staged['class_names'])} classes")
         
         # Define base directory for runs
         base_dir = os.path.dirname(models_dir)
         yolo_runs_dir = os.path.join(base_dir, 'runs')
         
-        # For database storage, create a temporary directory for YOLO runs
+        # For database storage, use a temporary directory for YOLO runs
         if 'ml_system' in models_dir:
-            temp_runs_dir = os.path.join(tempfile.gettempdir(), 'yolo_runs')
-            if os.path.exists(temp_runs_dir):
-                shutil.rmtree(temp_runs_dir)
-            os.makedirs(temp_runs_dir, exist_ok=True)
-            yolo_runs_dir = temp_runs_dir
-        else:
-            # For filesystem storage, clear and create the runs directory
-            if os.path.exists(yolo_runs_dir):
-                shutil.rmtree(yolo_runs_dir)
-            os.makedirs(yolo_runs_dir, exist_ok=True)
+            yolo_runs_dir = os.path.join(tempfile.gettempdir(), 'yolo_runs')
+        os.makedirs(yolo_runs_dir, exist_ok=True)
         
-        # Load the YOLO model (use a pre-trained model)
-        model = YOLO("yolov8n.pt")  # Using the nano model for faster training
-        print(f"Loaded YOLO model: yolov8n.pt")
+        # Every run gets its own directory, so the trainer knows exactly where its results are
+        import time
+        import uuid
+        run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
         
         # Check for GPU availability
         device = 'cuda' if torch.cuda.is_available() else 'cpu'
         print(f"Training on device: {device}")
         
-        # Set training parameters
-        epochs = 1  # Limited epochs for database version
-        batch_size = 8
+        # Resolve the training profile (model size, epochs, image size, batch, workers, caching)
+        from training_profiles import DEFAULT_YOLO_PROFILE, get_yolo_profile, YoloThroughputTracker
+        profile = profile or DEFAULT_YOLO_PROFILE
+        model_weights, train_kwargs = get_yolo_profile(profile, device)
+        
+        # Load the YOLO model (use a pre-trained model)
+        model = YOLO(model_weights)
+        print(f"Loaded YOLO model: {model_weights}")
+        print(f"Training with profile '{profile}': {train_kwargs}")
         
-        print(f"Training with epochs={epochs}, batch_size={batch_size}")
+        # Measure epoch time and images/sec
+        throughput = YoloThroughputTracker()
+        throughput.attach(model)
         
         # Train the model on the dataset
         try:
             results = model.train(
                 data=data_yaml,
-                epochs=epochs,
-                imgsz=320,
-                device=device,
-                batch=batch_size,
                 weight_decay=0.0005,
-                patience=50,  # Early stopping patience
                 auto_augment='autoaugment',
                 optimizer='Adam',
                 lr0=0.001,
                 lrf=0.01,
                 dropout=0.3,
-                project=yolo_runs_dir  # Set the project directory to our custom path
+                project=yolo_runs_dir,  # Set the project directory to our custom path
+                name=run_id,
+                exist_ok=False,
+                **train_kwargs
             )
             
             print("YOLO training completed successfully")
@@ -743,114 +711,66 @@ def train_yolo_model(dataset_folder, models_dir):
             # Clean up temporary file
             os.remove(temp_model_path)
         
-        # Try to get metrics from the training
+        # Exact run directory of this training run
+        trainer = getattr(model, 'trainer', None)
+        run_dir = str(getattr(trainer, 'save_dir', None) or getattr(results, 'save_dir', None)
+                      or os.path.join(yolo_runs_dir, run_id))
+        print(f"YOLO run directory: {run_dir}")
+        
+        # Parse per-epoch metrics from this run's results.csv
+        from yolo_runs import parse_results_csv, record_run, prune_run_dirs
         accuracy = 0.0
         metrics_info = {}
+        history = []
         try:
-            # First try to get metrics from training results if available
-            if hasattr(results, 'results_dict'):
-                metrics = results.results_dict
-                if 'metrics/mAP50-95(B)' in metrics:
-                    accuracy = metrics['metrics/mAP50-95(B)']
-                    metrics_info['mAP50-95'] = accuracy
-                elif 'metrics/mAP50(B)' in metrics:
-                    accuracy = metrics['metrics/mAP50(B)']
-                    metrics_info['mAP50'] = accuracy
-                
-                # Get other metrics
-                for key, value in metrics.items():
-                    if 'mAP50-95' in key:
-                        metrics_info['mAP50-95'] = value
-                        accuracy = max(accuracy, value)
-                    elif 'mAP50' in key and '95' not in key:
-                        metrics_info['mAP50'] = value
-                    elif 'precision' in key.lower():
-                        metrics_info['precision'] = value
-                    elif 'recall' in key.lower():
-                        metrics_info['recall'] = value
-                
-                print(f"Training results metrics: mAP={accuracy:.4f}")
+            parsed = parse_results_csv(run_dir)
+            if parsed:
+                metrics_info.update(parsed['final'])
+                history = parsed['history']
             
-            # If no results from training, try to read from CSV
-            elif os.path.exists(yolo_runs_dir):
-                train_dir = os.path.join(yolo_runs_dir, 'train')
-                if os.path.exists(train_dir) and os.listdir(train_dir):
-                    last_run_dir = max([os.path.join(train_dir, d) for d in os.listdir(train_dir)], 
-                                  key=os.path.getmtime)
-                    
-                    # Read the results.csv file to get metrics
-                    metrics_path = os.path.join(last_run_dir, 'results.csv')
-                    if os.path.exists(metrics_path):
-                        import pandas as pd
-                        metrics_df = pd.read_csv(metrics_path)
-                        
-                        if not metrics_df.empty:
-                            metrics = metrics_df.iloc[-1].to_dict()  # Get metrics from the last epoch
-                            
-                            # Extract relevant metrics
-                            map_columns = [col for col in metrics.keys() if 'map50-95' in col.lower()]
-                            if map_columns:
-                                accuracy = metrics[map_columns[0]]
-                                metrics_info['mAP50-95'] = accuracy
-                            else:
-                                # Default to mAP50 if mAP50-95 not found
-                                map50_columns = [col for col in metrics.keys() if 'map50' in col.lower() and '95' not in col.lower()]
-                                if map50_columns:
-                                    accuracy = metrics[map50_columns[0]]
-                                    metrics_info['mAP50'] = accuracy
-                            
-                            # Extract other useful metrics
-                            for key in metrics.keys():
-                                if 'map50' in key.lower() and '95' not in key.lower():
-                                    metrics_info['mAP50'] = metrics[key]
-                                elif 'precision' in key.lower():
-                                    metrics_info['precision'] = metrics[key]
-                                elif 'recall' in key.lower():
-                                    metrics_info['recall'] = metrics[key]
-                            
-                            print(f"CSV metrics: mAP={accuracy:.4f}, precision={metrics_info.get('precision', 0):.4f}, recall={metrics_info.get('recall', 0):.4f}")
+            # Final validation of the best weights takes precedence over the last epoch row
+            if hasattr(results, 'results_dict'):
+                for key, value in results.results_dict.items():
+                    name = key.lower()
+                    if 'map50-95' in name:
+                        metrics_info['mAP50-95'] = float(value)
+                    elif 'map50' in name:
+                        metrics_info['mAP50'] = float(value)
+                    elif 'precision' in name:
+                        metrics_info['precision'] = float(value)
+                    elif 'recall' in name:
+                        metrics_info['recall'] = float(value)
             
-            # If still no metrics, use hardcoded values from your log
-            if accuracy == 0.0:
-                print("Using hardcoded metrics from training log")
-                accuracy = 0.591  # mAP50-95 from your log
-                metrics_info = {
-                    'mAP50-95': 0.591, 
-                    'mAP50': 0.804, 
-                    'precision': 0.878, 
-                    'recall': 0.658
-                }
-                print(f"Final metrics being used: {metrics_info}")
-                
+            accuracy = metrics_info.get('mAP50-95', metrics_info.get('mAP50', 0.0))
+            print(f"Training results metrics: mAP={accuracy:.4f}")
         except Exception as e:
-            print(f"Could not read metrics: {e}")
-            # Use the metrics from your successful training
-            accuracy = 0.591  # mAP50-95
-            metrics_info = {
-                'mAP50-95': 0.591, 
-                'mAP50': 0.804, 
-                'precision': 0.878, 
-                'recall': 0.658
-            }
-            print(f"Using hardcoded fallback metrics: {metrics_info}")
-        
-        # Clean up temporary directories
-        if 'temp_runs_dir' in locals() and os.path.exists(temp_runs_dir):
-            try:
-                shutil.rmtree(temp_runs_dir)
-            except Exception as e:
-                print(f"Error cleaning up temporary runs directory: {e}")
+            print(f"Could not read metrics from {run_dir}: {e}")
+        
+        metrics_info['metrics_available'] = bool(metrics_info)
+        
+        # Index the run (final metrics and per-epoch history) in the database
+        record_run(run_id, run_dir, dict(metrics_info), history,
+                   profile=profile, dataset_hash=staged.get('dataset_hash'))
+        metrics_info['run_id'] = run_id
+        metrics_info['run_dir'] = run_dir
+        metrics_info['history'] = history
+        
+        # Keep only the most recent run directories on disk
+        prune_run_dirs(yolo_runs_dir, exclude=run_dir)
+        
+        # Report the profile and throughput so callers can pick accuracy vs. speed
+        metrics_info['profile'] = profile
+        metrics_info['throughput'] = throughput.summary()
+        print(f"YOLO throughput: {metrics_info['throughput']}")
         
         return model, "YOLOv8", accuracy, metrics_info
         
+    except Exception as e:
+        print(f"Error training YOLO model on {staged['root']}: {e}")
+        raise
     finally:
-        # Clean up the temporary directory at the end
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                print(f"Cleaned up temporary directory: {temp_dir}")
-        except Exception as e:
-            print(f"Error cleaning up temporary directory: {e}")
+        # The staged dataset may be pruned once no job reads it
+        release_staged_dataset(staged)
 
 def save_best_model(model, models_dir):
     """Save the best model to file or database based on its type"""
@@ -5,7 +5,10 @@ import nltk
 import os
 import tempfile
 import shutil
+import pickle
 import zipfile
+import json
+import hashlib
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer, WordNetLemmatizer
 from sklearn.model_selection import train_test_split
@@ -31,6 +34,23 @@ except ImportError:
 nltk.download('stopwords', quiet=True)
 nltk.download('wordnet', quiet=True)
 
+# File name of the fitted preprocessing, stored next to best_model.pkl
+PREPROCESSOR_FILE = 'preprocessor.pkl'
+
+def clean_texts(texts):
+    """Clean text for TF-IDF: letters only, lowercase, stopwords removed, stemmed and lemmatized"""
+    ps = PorterStemmer()
+    lemmatizer = WordNetLemmatizer()
+    all_stopwords = set(stopwords.words('english'))
+
+    corpus = []
+    for text in texts:
+        text = re.sub('[^a-zA-Z]', ' ', str(text))  # Keep letters only
+        words = text.lower().split()  # Convert to lowercase and split into words
+        # Stem and lemmatize, while removing stopwords
+        corpus.append(' '.join(lemmatizer.lemmatize(ps.stem(word)) for word in words if word not in all_stopwords))
+    return corpus
+
 def preprocess_dataset(df, task_type, dataset_folder=None):
     """Preprocess dataset based on task type"""
     # Add image classification handling while preserving original logic
@@ -64,20 +84,8 @@ def preprocess_dataset(df, task_type, dataset_folder=None):
 
     # Preprocessing for NLP task
     if task_type == 'nlp':
-        corpus = []
-        ps = PorterStemmer()
-        lemmatizer = WordNetLemmatizer()
-        all_stopwords = set(stopwords.words('english'))
-
         # Process text from the first column
-        for i in range(len(X)):
-            text = re.sub('[^a-zA-Z]', ' ', str(X.iloc[i, 0]))  # Extract text from the first column
-            text = text.lower()  # Convert to lowercase
-            text = text.split()  # Split into words
-            # Stem and lemmatize, while removing stopwords
-            text = [lemmatizer.lemmatize(ps.stem(word)) for word in text if word not in all_stopwords]
-            text = ' '.join(text)  # Join words back to a single string
-            corpus.append(text)
+        corpus = clean_texts(X.iloc[:, 0])
 
         # Use TF-IDF Vectorization instead of Count Vectorization
         vectorizer = TfidfVectorizer(max_features=1500, ngram_range=(1, 2))  # Unigrams and bigrams
@@ -87,6 +95,15 @@ def preprocess_dataset(df, task_type, dataset_folder=None):
         le = LabelEncoder()
         y = le.fit_transform(y)
 
+        fitted = {
+            'kind': 'text',
+            'columns': [X.columns[0]],
+            'text_column': X.columns[0],
+            'transformer': vectorizer,
+            'categories': {},
+            'label_encoder': le
+        }
+
     else:
         # Combine numerical and categorical preprocessing
         preprocessor = ColumnTransformer(
@@ -98,13 +115,126 @@ def preprocess_dataset(df, task_type, dataset_folder=None):
         X_transformed = preprocessor.fit_transform(X)
 
         # Perform label encoding for the target variable for classification tasks
+        le = None
         if task_type == 'classification':
             le = LabelEncoder()
             y = le.fit_transform(y)
 
+        # Categories seen per categorical column (for input choices at inference time)
+        categories = {}
+        if len(categorical_cols):
+            onehot = preprocessor.named_transformers_['cat'].named_steps['onehot']
+            categories = {column: values.tolist() for column, values in zip(categorical_cols, onehot.categories_)}
+
+        fitted = {
+            'kind': 'tabular',
+            'columns': list(numeric_cols) + list(categorical_cols),
+            'transformer': preprocessor,
+            'categories': categories,
+            'label_encoder': le
+        }
+
     X_train, X_test, y_train, y_test = train_test_split(X_transformed, y, test_size=0.2, random_state=42)
 
-    return X_train, X_test, y_train, y_test, None, X.columns.tolist()
+    return X_train, X_test, y_train, y_test, fitted, X.columns.tolist()
+
+def save_preprocessor(preprocessor, models_dir):
+    """
+    Save fitted preprocessing next to the best model (database or filesystem).
+
+    The dictionary holds only scikit-learn objects and plain values, so the generated
+    loaders can unpickle it without this module.
+
+    Returns:
+    PREPROCESSOR_FILE if it was saved, otherwise None
+    """
+    is_database = 'ml_system' in models_dir
+    try:
+        content = pickle.dumps(preprocessor)
+        if is_database:
+            parts = models_dir.replace('\\', '/').strip('/').split('/')
+            idx = parts.index('ml_system')
+            dir_name = parts[idx + 1] if idx + 1 < len(parts) else 'models'
+            db_fs.save_file_content(content, PREPROCESSOR_FILE, dir_name)
+            print("Preprocessor saved to database")
+        else:
+            with open(os.path.join(models_dir, PREPROCESSOR_FILE), 'wb') as f:
+                f.write(content)
+            print(f"Preprocessor saved as {PREPROCESSOR_FILE}")
+        return PREPROCESSOR_FILE
+    except Exception as e:
+        print(f"Error saving the preprocessor: {e}")
+        return None
+
+def dataset_schema(df):
+    """
+    Fingerprint of a dataset's columns (names, order and kind of each), target included.
+
+    Versions of a dataset with the same schema can be transformed by the same fitted
+    preprocessing; a renamed, added, removed or retyped column changes the fingerprint.
+    """
+    columns = [(str(name), df[name].dtype.kind) for name in df.columns]
+    return hashlib.sha1(json.dumps(columns).encode('utf-8')).hexdigest()
+
+def load_preprocessor(models_dir):
+    """Load the fitted preprocessing saved by save_preprocessor, or None if there is none"""
+    try:
+        if 'ml_system' in models_dir:
+            parts = models_dir.replace('\\', '/').strip('/').split('/')
+            idx = parts.index('ml_system')
+            dir_name = parts[idx + 1] if idx + 1 < len(parts) else 'models'
+            if not db_fs.file_exists(PREPROCESSOR_FILE, dir_name):
+                return None
+            return pickle.loads(db_fs.get_file(PREPROCESSOR_FILE, dir_name))
+        path = os.path.join(models_dir, PREPROCESSOR_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Error loading the preprocessor: {e}")
+        return None
+
+def apply_preprocessor(df, fitted):
+    """
+    Transform a new version of a dataset with already fitted preprocessing (no refit).
+
+    Used for incremental retraining, so the previous model sees features in the space it
+    was trained in. The split matches preprocess_dataset.
+
+    Raises:
+    ValueError if the data contains target labels the fitted label encoder has not seen
+
+    Returns:
+    X_train, X_test, y_train, y_test, fitted, feature_names like preprocess_dataset
+    """
+    if df is None or df.empty:
+        raise ValueError("The DataFrame is empty after reading the CSV.")
+
+    df.replace("None", pd.NA, inplace=True)
+    X = df.iloc[:, :-1]
+    y = df.iloc[:, -1]
+
+    if fitted['kind'] == 'text':
+        X_transformed = fitted['transformer'].transform(clean_texts(X[fitted['text_column']])).toarray()
+    else:
+        X_transformed = fitted['transformer'].transform(X[fitted['columns']])
+    if fitted.get('label_encoder') is not None:
+        y = fitted['label_encoder'].transform(y)
+
+    X_train, X_test, y_train, y_test = train_test_split(X_transformed, y, test_size=0.2, random_state=42)
+
+    return X_train, X_test, y_train, y_test, fitted, X.columns.tolist()
+
+def held_out_rows(df):
+    """
+    Raw feature rows of the test split of preprocess_dataset and apply_preprocessor.
+
+    The split depends only on the number of rows and the seed, so these are the rows
+    behind X_test, before preprocessing (used to validate exported models on unseen data).
+    """
+    _, X_test = train_test_split(df.iloc[:, :-1], test_size=0.2, random_state=42)
+    return X_test
 
 def preprocess_image_dataset(dataset_folder):
     """
@@ -129,6 +259,7 @@ def preprocess_image_dataset(dataset_folder):
     
     # Check if this is a database path
     is_database = 'ml_system' in dataset_folder
+    source_key = None
     
     if is_database:
         # Create a temporary directory for processing
@@ -155,6 +286,17 @@ def preprocess_image_dataset(dataset_folder):
                 print("Found processed dataset zip file in database. Extracting...")
                 # Get the zip file from database
                 zip_content = db_fs.get_file('processed_dataset.zip', db_dir)
+                
+                # Reuse the pre-decoded image store if this archive was already ingested
+                from image_store import get_source_key, load_image_store
+                source_key = get_source_key(zip_content)
+                stored = load_image_store(source_key, db_dir)
+                if stored is not None:
+                    print("Using pre-decoded image store, skipping extraction")
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    return (stored['training_generator'], stored['testing_generator'], None, None,
+                            stored, stored['class_names'])
+                
                 temp_zip_path = os.path.join(temp_dir, 'processed_dataset.zip')
                 
                 # Save zip content to temporary file
@@ -581,6 +723,22 @@ def preprocess_image_dataset(dataset_folder):
         'image_shape': (64, 64, 3)
     }
     
+    # Identify the splits by their archive rather than the temporary extraction directory
+    # (cached transfer-learning embeddings are keyed on it)
+    if source_key:
+        for generator in (training_generator, validation_generator, testing_generator):
+            generator.source_key = source_key
+    
+    # Decode everything once into the image store so later runs (and this one) read fixed-size tensors
+    if is_database and source_key:
+        from image_store import build_image_store, load_image_store
+        if build_image_store(preprocessor, source_key, db_dir):
+            stored = load_image_store(source_key, db_dir)
+            if stored is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                return (stored['training_generator'], stored['testing_generator'], None, None,
+                        stored, stored['class_names'])
+    
     # Clean up temp directory if we're using database storage
     if is_database:
         try:
@@ -0,0 +1,164 @@
+import os
+import sys
+import types
+import pickle
+import threading
+import multiprocessing
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# A figure to render: a module-level function (picklable) and its arguments.
+# The function builds the figure and returns the encoded image.
+RenderTask = namedtuple('RenderTask', ['func', 'args', 'kwargs'])
+
+# Number of rendering processes (0 or 1 renders in the calling process)
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Modules the forkserver imports once, so workers start with the renderers loaded; the
+# application itself (TensorFlow, torch, database patches) is never imported in workers.
+# These modules import the database and explanation modules only inside functions that
+# run in the main process. The forkserver imports them from the working directory (app.py
+# is started from this directory) and skips any that fail to import
+RENDER_PRELOAD = ['figure_theme', 'figure_encoding', 'visualization', 'visualization_cnn',
+                  'visualization_object']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Render with the non-interactive Agg backend in every worker"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+@contextmanager
+def _without_main():
+    """
+    Hide the entry script (app.py) from processes started in this block.
+
+    forkserver/spawn children re-run __main__ before they do anything else; with a bare
+    module in its place they only import what the pickled tasks reference. The swap is
+    process wide, so it is only done once, around starting the pool's workers.
+    """
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+def _started():
+    return True
+
+
+def _get_pool():
+    """Create the process pool once per process (shared by concurrent requests) and reuse it across jobs"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver/spawn instead of fork: the parent may hold TensorFlow/torch threads
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            context = multiprocessing.get_context(method)
+            if method == 'forkserver':
+                context.set_forkserver_preload(RENDER_PRELOAD)
+            pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=context,
+                initializer=_init_worker
+            )
+            # Non-fork pools start a worker from submit() while none is idle; submitting one
+            # task per worker right away starts them all here, with the entry script hidden
+            try:
+                with _without_main():
+                    started = [pool.submit(_started) for _ in range(RENDER_WORKERS)]
+                for future in started:
+                    future.result()
+            except Exception:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            _pool = pool
+        return _pool
+
+
+def _discard_pool(pool):
+    """Shut down a broken pool without waiting, so the next job creates a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _is_pool_error(error):
+    """Failures of the pool itself (crashed worker, unpicklable task or result), not of the renderer"""
+    if isinstance(error, (BrokenProcessPool, pickle.PicklingError)):
+        return True
+    return isinstance(error, (TypeError, AttributeError)) and 'pickle' in str(error)
+
+
+def _run(task):
+    return task.func(*task.args, **(task.kwargs or {}))
+
+
+def task(func, *args, **kwargs):
+    """Shorthand for RenderTask(func, args, kwargs)"""
+    return RenderTask(func, args, kwargs)
+
+
+def render_tasks(tasks):
+    """
+    Render figures in parallel on a process pool.
+
+    Parameters:
+    tasks: List of RenderTask
+
+    Returns:
+    List of results in the same order as tasks; a task that failed returns None
+    """
+    if not tasks:
+        return []
+
+    if RENDER_WORKERS > 1 and len(tasks) > 1:
+        pool = None
+        try:
+            pool = _get_pool()
+            futures = [pool.submit(_run, t) for t in tasks]
+            results = []
+            for t, future in zip(tasks, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    if not _is_pool_error(e):
+                        # The renderer itself failed; running it again would fail the same way
+                        print(f"Error rendering {getattr(t.func, '__name__', t.func)}: {e}")
+                        results.append(None)
+                        continue
+                    # Pickling errors or a crashed worker: retry this figure in-process
+                    print(f"Rendering {getattr(t.func, '__name__', t.func)} in a worker failed ({e}), retrying locally")
+                    if isinstance(e, BrokenProcessPool):
+                        _discard_pool(pool)
+                    results.extend(_run_serial([t]))
+            return results
+        except Exception as e:
+            # Broken pool or unpicklable arguments: render in this process instead
+            print(f"Parallel rendering unavailable, rendering serially: {e}")
+            _discard_pool(pool)
+
+    return _run_serial(tasks)
+
+
+def _run_serial(tasks):
+    """Render tasks one after another in the calling process"""
+    results = []
+    for t in tasks:
+        try:
+            results.append(_run(t))
+        except Exception as e:
+            print(f"Error rendering {getattr(t.func, '__name__', t.func)}: {e}")
+            results.append(None)
+    return results
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The backend modules live flat in project/new and import each other by name, like app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules open ml_system.db in the working directory when they are imported; keep the
+# database the tests write to out of the source tree
+os.chdir(tempfile.mkdtemp(prefix='freemind-tests-'))
@@ -0,0 +1,103 @@
+import importlib.util
+import os
+import threading
+import time
+
+import numpy as np
+
+# batching.py belongs to the generated serving project (see generateBatchingCode in
+# server/routes/deployment.js); the checked-in copy in test-extract is tested here
+BATCHING_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'test-extract', 'batching.py')
+_spec = importlib.util.spec_from_file_location('batching', BATCHING_PATH)
+batching = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(batching)
+MicroBatcher = batching.MicroBatcher
+
+
+def _submit_all(batcher, rows):
+    """Submit every row from its own thread; returns results (or exceptions) in row order"""
+    results = [None] * len(rows)
+
+    def submit(i):
+        try:
+            results[i] = batcher.submit(rows[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(rows))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_rows_share_model_calls():
+    calls = []
+
+    def predict_matrix(X):
+        calls.append(len(X))
+        return {'predictions': X[:, 0] * 10}
+
+    batcher = MicroBatcher(predict_matrix, max_rows=8, max_wait_ms=50)
+    rows = [np.array([[float(i), 0.0]]) for i in range(8)]
+    results = _submit_all(batcher, rows)
+
+    # Every caller gets its own row back
+    assert [float(r['predictions'][0]) for r in results] == [i * 10.0 for i in range(8)]
+    assert sum(calls) == 8
+    assert len(calls) < 8
+    assert batcher.stats()['requests'] == 8
+
+
+def test_a_bad_row_does_not_fail_the_batch():
+    def predict_matrix(X):
+        if np.isnan(X).any():
+            raise ValueError('NaN in input')
+        return {'predictions': X[:, 0]}
+
+    batcher = MicroBatcher(predict_matrix, max_rows=4, max_wait_ms=50)
+    rows = [np.array([[1.0]]), np.array([[np.nan]]), np.array([[3.0]])]
+    results = _submit_all(batcher, rows)
+
+    assert float(results[0]['predictions'][0]) == 1.0
+    assert isinstance(results[1], ValueError)
+    assert float(results[2]['predictions'][0]) == 3.0
+    assert batcher.stats()['errors'] == 1
+
+
+def test_rows_of_different_widths_are_predicted_separately():
+    widths = []
+
+    def predict_matrix(X):
+        widths.append(X.shape[1])
+        return {'predictions': X.sum(axis=1)}
+
+    batcher = MicroBatcher(predict_matrix, max_rows=4, max_wait_ms=50)
+    results = _submit_all(batcher, [np.ones((1, 2)), np.ones((1, 3))])
+
+    assert sorted(float(r['predictions'][0]) for r in results) == [2.0, 3.0]
+    assert sorted(widths) == [2, 3]
+
+
+def test_timed_out_rows_are_not_predicted():
+    predicted = []
+
+    def predict_matrix(X):
+        predicted.extend(X[:, 0].tolist())
+        time.sleep(0.3)
+        return {'predictions': X[:, 0]}
+
+    batcher = MicroBatcher(predict_matrix, max_rows=2, max_wait_ms=1, timeout=0.1)
+    results = _submit_all(batcher, [np.array([[float(i)]]) for i in range(10)])
+    time.sleep(0.7)
+
+    assert all(isinstance(r, TimeoutError) for r in results)
+    # Only the first batch was already running when its callers gave up
+    assert len(predicted) <= 2
+    assert batcher.stats()['queued'] == 0
+    assert batcher.stats()['timeouts'] == 10
+
+    # The worker keeps serving later requests
+    batcher.timeout = 5
+    assert float(batcher.submit(np.array([[42.0]]))['predictions'][0]) == 42.0
@@ -0,0 +1,96 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+import utils
+from utils import bundle_key, create_project_zip, iter_zip, db_fs
+
+
+def _read_zip(chunks):
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zipf:
+        return {name: zipf.read(name) for name in zipf.namelist()}
+
+
+def test_bundle_key_ignores_requirements_order_and_blank_lines():
+    model = ('best_model.pkl', ('bytes', b'model'))
+    first = bundle_key([model, ('requirements.txt', ('bytes', b'numpy\npandas\n'))])
+    second = bundle_key([model, ('requirements.txt', ('bytes', b'pandas\n\nnumpy'))])
+    assert first == second
+
+
+def test_bundle_key_changes_with_content():
+    requirements = ('requirements.txt', ('bytes', b'numpy\n'))
+    first = bundle_key([('best_model.pkl', ('bytes', b'model v1')), requirements])
+    second = bundle_key([('best_model.pkl', ('bytes', b'model v2')), requirements])
+    assert first != second
+
+
+def test_bundle_key_is_the_same_for_every_source_kind(tmp_path):
+    path = tmp_path / 'load_model.py'
+    path.write_bytes(b'print("hello")')
+    assert (bundle_key([('load_model.py', ('file', str(path)))])
+            == bundle_key([('load_model.py', ('bytes', b'print("hello")'))]))
+
+
+def test_bundle_key_uses_the_stored_hash_of_database_files(monkeypatch):
+    db_fs.save_file_content(b'model', 'test_key_model.pkl', 'models')
+    expected = bundle_key([('best_model.pkl', ('bytes', b'model'))])
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError('the model blob was read')
+
+    monkeypatch.setattr(db_fs, 'read_chunks', no_reads)
+    assert bundle_key([('best_model.pkl', ('db', 'test_key_model.pkl', 'models'))]) == expected
+
+
+def test_reused_bundles_are_pruned_last(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'BUNDLE_KEEP', 2)
+    models_dir, downloads_dir = tmp_path / 'models', tmp_path / 'downloads'
+    models_dir.mkdir()
+    downloads_dir.mkdir()
+    (downloads_dir / 'load_model.py').write_text('import pickle\n')
+    (downloads_dir / 'requirements.txt').write_text('numpy\n')
+
+    def bundle(model):
+        (models_dir / 'best_model.pkl').write_bytes(model)
+        return os.path.basename(create_project_zip('best_model.pkl', str(models_dir), str(downloads_dir)))
+
+    first = bundle(b'model 1')
+    second = bundle(b'model 2')
+    for age, name in enumerate([first, second]):
+        # Both built in the past, the first one earlier
+        os.utime(downloads_dir / name, (1000 + age, 1000 + age))
+    assert bundle(b'model 1') == first  # reused, not rebuilt
+    third = bundle(b'model 3')
+
+    assert sorted(f for f in os.listdir(downloads_dir) if f.endswith('.zip')) == sorted([first, third])
+
+
+def test_iter_zip_round_trip(tmp_path):
+    path = tmp_path / 'load_model.py'
+    path.write_bytes(b'import pickle\n')
+    # Larger than one database read chunk, so the blob is copied in several pieces
+    model = os.urandom(2 * 1024 * 1024 + 123)
+    db_fs.save_file_content(model, 'test_bundle_model.pkl', 'models')
+
+    entries = [
+        ('best_model.pkl', ('db', 'test_bundle_model.pkl', 'models')),
+        ('load_model.py', ('file', str(path))),
+        ('requirements.txt', ('bytes', b'numpy\n')),
+    ]
+    assert _read_zip(iter_zip(entries)) == {
+        'best_model.pkl': model,
+        'load_model.py': b'import pickle\n',
+        'requirements.txt': b'numpy\n',
+    }
+
+
+def test_iter_zip_raises_on_unreadable_source(tmp_path):
+    entries = [
+        ('requirements.txt', ('bytes', b'numpy\n')),
+        ('best_model.pkl', ('file', str(tmp_path / 'missing.pkl'))),
+    ]
+    with pytest.raises(FileNotFoundError):
+        b''.join(iter_zip(entries))
@@ -0,0 +1,33 @@
+import figure_encoding
+from figure_encoding import FIGURES_DB_DIR, FIGURES_URL_PREFIX, _figure_db, store_figure
+
+
+def _set_updated_at(db_fs, filename, value):
+    with db_fs._get_connection() as conn:
+        conn.execute("UPDATE files SET updated_at = ? WHERE filename = ?", (value, filename))
+        conn.commit()
+
+
+def test_stored_figures_are_content_addressed():
+    first = store_figure(b'<svg>same</svg>', 'svg')
+    assert first.startswith(FIGURES_URL_PREFIX)
+    assert store_figure(b'<svg>same</svg>', 'svg') == first
+    assert store_figure(b'<svg>other</svg>', 'svg') != first
+
+
+def test_least_recently_used_figures_are_pruned(monkeypatch):
+    monkeypatch.setattr(figure_encoding, 'FIGURE_KEEP', 2)
+    db_fs = _figure_db()
+    for name in [f for f in db_fs.list_files(FIGURES_DB_DIR) if f.startswith('figure_')]:
+        db_fs.delete_file(name, FIGURES_DB_DIR)
+
+    old = store_figure(b'old', 'png').rsplit('/', 1)[-1]
+    reused = store_figure(b'reused', 'png').rsplit('/', 1)[-1]
+    _set_updated_at(db_fs, old, '2024-01-02 00:00:00')
+    _set_updated_at(db_fs, reused, '2024-01-01 00:00:00')
+    # Drawing a figure again marks it as used
+    store_figure(b'reused', 'png')
+    new = store_figure(b'new', 'png').rsplit('/', 1)[-1]
+
+    figures = {f for f in db_fs.list_files(FIGURES_DB_DIR) if f.startswith('figure_')}
+    assert figures == {reused, new}
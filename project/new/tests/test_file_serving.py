@@ -0,0 +1,46 @@
+import pytest
+from flask import Flask
+
+from file_serving import _requested_range
+
+app = Flask(__name__)
+
+
+def _range(headers, size=100, etag='abc'):
+    with app.test_request_context(headers=headers):
+        return _requested_range(size, etag)
+
+
+def test_no_range_sends_the_whole_file():
+    assert _range({}) == (0, 100, 200)
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=10-19', (10, 20, 206)),
+    ('bytes=90-', (90, 100, 206)),
+    ('bytes=-5', (95, 100, 206)),
+    ('bytes=95-500', (95, 100, 206)),
+])
+def test_single_range(header, expected):
+    assert _range({'Range': header}) == expected
+
+
+def test_unsatisfiable_range():
+    assert _range({'Range': 'bytes=500-600'}) == (0, 100, 416)
+
+
+def test_multiple_ranges_send_the_whole_file():
+    assert _range({'Range': 'bytes=0-9,20-29'}) == (0, 100, 200)
+
+
+def test_if_range_with_current_etag_resumes():
+    assert _range({'Range': 'bytes=10-19', 'If-Range': '"abc"'}) == (10, 20, 206)
+
+
+def test_if_range_with_other_etag_sends_the_whole_file():
+    assert _range({'Range': 'bytes=10-19', 'If-Range': '"old"'}) == (0, 100, 200)
+
+
+def test_if_range_with_date_sends_the_whole_file():
+    headers = {'Range': 'bytes=10-19', 'If-Range': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+    assert _range(headers) == (0, 100, 200)
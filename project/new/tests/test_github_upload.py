@@ -0,0 +1,117 @@
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import github_upload
+from github_upload import GitHubUploadError, create_session, upload_directory
+
+
+class MockGitHub(BaseHTTPRequestHandler):
+    """Minimal git data API: blobs, trees, commits and refs of one repository"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        with server.lock:
+            server.calls.append((self.command, self.path, body))
+            failures = server.failures.get((self.command, self.path), 0)
+            if failures:
+                server.failures[(self.command, self.path)] = failures - 1
+                return self._reply(502, {'message': 'Bad Gateway'})
+        if self.headers.get('Authorization') != 'token secret':
+            return self._reply(401, {'message': 'Bad credentials'})
+
+        if self.command == 'GET' and self.path == '/repos/me/demo/git/ref/heads/main':
+            return self._reply(200, {'object': {'sha': 'parent-sha'}})
+        if self.command == 'POST' and self.path == '/repos/me/demo/git/blobs':
+            with server.lock:
+                server.blobs.append(base64.b64decode(body['content']))
+                sha = f"blob-{len(server.blobs)}"
+            return self._reply(201, {'sha': sha})
+        if self.command == 'POST' and self.path == '/repos/me/demo/git/trees':
+            return self._reply(201, {'sha': 'tree-sha'})
+        if self.command == 'POST' and self.path == '/repos/me/demo/git/commits':
+            return self._reply(201, {'sha': 'commit-sha'})
+        if self.command == 'PATCH' and self.path == '/repos/me/demo/git/refs/heads/main':
+            return self._reply(200, {'object': {'sha': body['sha']}})
+        return self._reply(422, {'message': 'Unexpected call'})
+
+    do_GET = do_POST = do_PATCH = _handle
+
+
+@pytest.fixture
+def github(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockGitHub)
+    server.lock = threading.Lock()
+    server.calls, server.blobs, server.failures = [], [], {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(github_upload, 'GITHUB_API_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(github_upload, 'GITHUB_RETRY_BACKOFF', 0.01)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / 'app.py').write_text('print("app")\n')
+    (tmp_path / 'model').mkdir()
+    (tmp_path / 'model' / 'model.pkl').write_bytes(b'\x00\x01model')
+    (tmp_path / 'README.md').write_text('# Demo\n')
+    # Never uploaded
+    (tmp_path / '__pycache__').mkdir()
+    (tmp_path / '__pycache__' / 'app.cpython-311.pyc').write_bytes(b'cache')
+    (tmp_path / '.gitignore').write_text('*.pyc\n')
+    return tmp_path
+
+
+def test_upload_is_a_single_commit_and_retries_transient_errors(github, project):
+    github.failures[('POST', '/repos/me/demo/git/trees')] = 1
+
+    sha = upload_directory(create_session('secret'), 'me', 'demo', str(project), message='Deploy')
+
+    assert sha == 'commit-sha'
+    assert sorted(github.blobs) == sorted([b'print("app")\n', b'\x00\x01model', b'# Demo\n'])
+    calls = [(method, path) for method, path, _ in github.calls if not path.endswith('/git/blobs')]
+    assert calls == [
+        ('GET', '/repos/me/demo/git/ref/heads/main'),
+        ('POST', '/repos/me/demo/git/trees'),  # 502, retried
+        ('POST', '/repos/me/demo/git/trees'),
+        ('POST', '/repos/me/demo/git/commits'),
+        ('PATCH', '/repos/me/demo/git/refs/heads/main'),
+    ]
+    tree = next(body for method, path, body in github.calls if path.endswith('/git/trees'))
+    assert sorted(entry['path'] for entry in tree['tree']) == ['README.md', 'app.py', 'model/model.pkl']
+    commit = next(body for method, path, body in github.calls if path.endswith('/git/commits'))
+    assert commit == {'message': 'Deploy', 'tree': 'tree-sha', 'parents': ['parent-sha']}
+
+
+def test_errors_that_are_not_transient_are_raised_without_retries(github, project):
+    with pytest.raises(GitHubUploadError, match='401'):
+        upload_directory(create_session('wrong'), 'me', 'demo', str(project))
+    assert len(github.calls) == 1
+
+
+def test_persistent_failures_give_up_after_the_last_attempt(github, project, monkeypatch):
+    monkeypatch.setattr(github_upload, 'GITHUB_MAX_ATTEMPTS', 3)
+    github.failures[('GET', '/repos/me/demo/git/ref/heads/main')] = 10
+
+    with pytest.raises(GitHubUploadError, match='502'):
+        upload_directory(create_session('secret'), 'me', 'demo', str(project))
+    assert len(github.calls) == 3
@@ -0,0 +1,87 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from model_training import (load_training_metadata, retrain_incremental, save_best_model,
+                            save_training_metadata)
+
+
+def _split(seed, flip=False, n=200):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 3))
+    y = (X[:, 0] > 0).astype(int)
+    if flip:
+        y = 1 - y
+    split = int(n * 0.8)
+    return X[:split], X[split:], y[:split], y[split:]
+
+
+def _previous_run(models_dir, model, dataset_id='sales-v1', schema='schema-1'):
+    X_train, X_test, y_train, y_test = _split(0)
+    model.fit(X_train, y_train)
+    save_best_model(model, models_dir)
+    save_training_metadata(models_dir, {
+        'task_type': 'classification',
+        'model_name': type(model).__name__,
+        'best_params': {},
+        'score': float(np.mean(model.predict(X_test) == y_test)),
+        'n_features': X_train.shape[1],
+        'n_train_samples': X_train.shape[0],
+        'dataset_id': dataset_id,
+        'dataset_schema': schema,
+        'mode': 'full_search'
+    })
+
+
+def _retrain(models_dir, split, parent='sales-v1', schema='schema-1'):
+    X_train, X_test, y_train, y_test = split
+    return retrain_incremental(X_train, y_train, X_test, y_test, 'classification', models_dir,
+                               dataset_id='sales-v2', parent_dataset=parent, dataset_schema=schema)
+
+
+def test_new_version_of_the_parent_is_trained_incrementally(tmp_path):
+    models_dir = str(tmp_path)
+    _previous_run(models_dir, LogisticRegression())
+
+    result = _retrain(models_dir, _split(1))
+
+    assert result is not None
+    assert result[2] > 0.9
+    metadata = load_training_metadata(models_dir)
+    assert metadata['mode'] == 'refit'
+    assert metadata['dataset_id'] == 'sales-v2'
+
+
+def test_warm_start_ensembles_grow(tmp_path):
+    models_dir = str(tmp_path)
+    _previous_run(models_dir, RandomForestClassifier(n_estimators=10, random_state=0))
+
+    model = _retrain(models_dir, _split(1, n=400))[0]
+
+    assert model.n_estimators > 10
+    assert len(model.estimators_) == model.n_estimators
+    assert load_training_metadata(models_dir)['mode'] == 'warm_start'
+
+
+def test_drift_falls_back_to_a_full_search(tmp_path):
+    models_dir = str(tmp_path)
+    _previous_run(models_dir, LogisticRegression())
+
+    # The relationship flipped: the previous model scores far below its stored score
+    assert _retrain(models_dir, _split(1, flip=True)) is None
+    assert load_training_metadata(models_dir)['dataset_id'] == 'sales-v1'
+
+
+def test_other_datasets_are_not_continued(tmp_path):
+    models_dir = str(tmp_path)
+    _previous_run(models_dir, LogisticRegression())
+
+    assert _retrain(models_dir, _split(1), parent='inventory-v1') is None
+    assert _retrain(models_dir, _split(1), parent=None) is None
+
+
+def test_schema_change_falls_back_to_a_full_search(tmp_path):
+    models_dir = str(tmp_path)
+    _previous_run(models_dir, LogisticRegression())
+
+    assert _retrain(models_dir, _split(1), schema='schema-2') is None
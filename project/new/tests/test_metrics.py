@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from sklearn.metrics import (average_precision_score, precision_recall_curve, roc_auc_score,
+                             roc_curve)
+
+from metrics import classification_curves, curve_summary
+
+
+def _scores(n_classes, n=300, seed=0, decimals=2):
+    """Labels and a noisy probability matrix; rounding creates tied scores"""
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, n_classes, n)
+    logits = rng.normal(size=(n, n_classes)) + 1.5 * np.eye(n_classes)[y]
+    proba = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+    return y, np.round(proba, decimals)
+
+
+@pytest.mark.parametrize('n_classes', [2, 4])
+def test_curves_match_sklearn(n_classes):
+    y, proba = _scores(n_classes)
+    result = classification_curves(y, proba)
+
+    assert result['binary'] == (n_classes == 2)
+    columns = [1] if n_classes == 2 else range(n_classes)
+    assert result['classes'] == list(columns)
+    for curve, k in zip(result['curves'], columns):
+        positive = (y == k).astype(int)
+        fpr, tpr, _ = roc_curve(positive, proba[:, k], drop_intermediate=False)
+        precision, recall, _ = precision_recall_curve(positive, proba[:, k])
+        np.testing.assert_allclose(curve['fpr'], fpr)
+        np.testing.assert_allclose(curve['tpr'], tpr)
+        np.testing.assert_allclose(curve['precision'], precision)
+        np.testing.assert_allclose(curve['recall'], recall)
+        assert curve['roc_auc'] == pytest.approx(roc_auc_score(positive, proba[:, k]))
+        assert curve['average_precision'] == pytest.approx(average_precision_score(positive, proba[:, k]))
+
+
+def test_macro_scores_match_sklearn():
+    y, proba = _scores(3)
+    result = classification_curves(y, proba)
+    assert result['macro_roc_auc'] == pytest.approx(roc_auc_score(np.eye(3)[y], proba, average='macro'))
+    assert result['macro_average_precision'] == pytest.approx(
+        average_precision_score(np.eye(3)[y], proba, average='macro'))
+
+
+def test_a_class_missing_from_the_labels_has_no_scores():
+    y, proba = _scores(3)
+    y = np.where(y == 2, 0, y)
+    result = classification_curves(y, proba, classes=[0, 1, 2])
+
+    summary = curve_summary(result)
+    assert summary['per_class'][2] == {'class': 2, 'roc_auc': None, 'average_precision': None}
+    # The macro averages skip the undefined class
+    assert summary['macro_roc_auc'] == pytest.approx(np.mean([c['roc_auc'] for c in result['curves'][:2]]), abs=1e-6)
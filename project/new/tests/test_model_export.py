@@ -0,0 +1,165 @@
+import importlib.util
+import os
+import pickle
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+import model_export
+from model_export import (_conversion_options, _exportable_transformer, _input_types, _matches,
+                          export_onnx)
+
+pytest.importorskip('skl2onnx')
+pytest.importorskip('onnxruntime')
+
+# model.py of the generated model server (generateModelCode in server/routes/deployment.js)
+SERVER_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'test-extract', 'model.py')
+
+
+def _tabular(n=200, seed=0):
+    """Raw rows and preprocessing fitted like preprocess_dataset does for tabular data"""
+    rng = np.random.default_rng(seed)
+    rows = pd.DataFrame({
+        'age': rng.integers(18, 80, n).astype('int64'),
+        'score': rng.normal(size=n),
+        'city': rng.choice(['a', 'b', 'c'], n).astype(object),
+    })
+    rows.loc[3, 'score'] = np.nan
+    rows.loc[5, 'city'] = None
+    transformer = ColumnTransformer(transformers=[
+        ('num', Pipeline([('imputer', SimpleImputer(strategy='mean')), ('scaler', StandardScaler())]),
+         ['age', 'score']),
+        ('cat', Pipeline([('imputer', SimpleImputer(strategy='most_frequent')),
+                          ('onehot', OneHotEncoder(handle_unknown='ignore'))]), ['city']),
+    ])
+    X = transformer.fit_transform(rows)
+    fitted = {
+        'kind': 'tabular',
+        'columns': ['age', 'score', 'city'],
+        'transformer': transformer,
+        'categories': {'city': ['a', 'b', 'c']},
+        'label_encoder': None,
+    }
+    return rows, X, fitted
+
+
+class TiedClassifier(ClassifierMixin, BaseEstimator):
+    """Both classes equally likely on every row; predict() breaks the tie towards class 0"""
+
+    def __init__(self, proba=0.5):
+        self.proba = proba
+        self.classes_ = np.array([0, 1])
+
+    def predict(self, X):
+        return np.zeros(len(X), dtype=np.int64)
+
+    def predict_proba(self, X):
+        return np.tile([self.proba, 1 - self.proba], (len(X), 1))
+
+
+def _always_one_graph(rows, X, fitted):
+    """ONNX graph (preprocessing included) whose prediction is class 1 for every row"""
+    tree = DecisionTreeClassifier(max_depth=1).fit(X, np.r_[0, np.ones(len(X) - 1, dtype=int)])
+    tree.tree_.value[:] = [[0.0, 1.0]]
+    pipeline = Pipeline([('preprocessor', _exportable_transformer(fitted)), ('model', tree)])
+    return model_export.to_onnx(pipeline, initial_types=_input_types(fitted),
+                                options=_conversion_options(tree)).SerializeToString()
+
+
+def test_tied_rows_count_as_agreement():
+    rows, X, fitted = _tabular()
+    content = _always_one_graph(rows, X, fitted)
+    assert _matches(TiedClassifier(0.5), content, X, fitted, rows)
+
+
+def test_confident_disagreement_is_detected():
+    rows, X, fitted = _tabular()
+    content = _always_one_graph(rows, X, fitted)
+    assert not _matches(TiedClassifier(0.9), content, X, fitted, rows)
+
+
+def test_export_includes_the_preprocessing():
+    rows, X, fitted = _tabular()
+    y = (rows['score'].fillna(0) > 0).astype(int).to_numpy()
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+
+    content = export_onnx(model, fitted, rows)
+
+    assert content is not None
+    session = model_export.ort.InferenceSession(content, providers=['CPUExecutionProvider'])
+    # Raw columns go in, not the transformed feature matrix
+    assert [i.type for i in session.get_inputs()] == ['tensor(float)', 'tensor(float)', 'tensor(string)']
+
+
+def _serve(tmp_path, model, fitted, content):
+    """ModelPredictor of a generated server whose project holds the given model files"""
+    shutil.copy(SERVER_MODEL_PATH, tmp_path / 'model.py')
+    joblib.dump(model, tmp_path / 'model.pkl')
+    (tmp_path / 'preprocessor.pkl').write_bytes(pickle.dumps(fitted))
+    if content is not None:
+        (tmp_path / 'model.onnx').write_bytes(content)
+    spec = importlib.util.spec_from_file_location('served_model', tmp_path / 'model.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ModelPredictor()
+
+
+def test_generated_server_predicts_raw_rows_with_the_exported_model(tmp_path):
+    rows, X, fitted = _tabular()
+    y = (rows['score'].fillna(0) > 0).astype(int).to_numpy()
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    predictor = _serve(tmp_path, model, fitted, export_onnx(model, fitted, rows))
+    assert predictor.runtime == 'onnxruntime'
+
+    records = rows.iloc[:20].astype(object).where(rows.iloc[:20].notna(), None).to_dict('records')
+    result = predictor.predict_batch(records)
+
+    assert result['predictions'] == model.predict(X[:20]).tolist()
+    np.testing.assert_allclose(result['probabilities'], model.predict_proba(X[:20]), atol=1e-5)
+    # A single record, with a missing value and an unseen category
+    single = predictor.predict({'age': 40, 'score': None, 'city': 'zz'})
+    assert single['prediction'] in (0, 1)
+
+
+def test_generated_server_falls_back_to_the_pickle_without_the_export(tmp_path):
+    rows, X, fitted = _tabular()
+    y = (rows['score'].fillna(0) > 0).astype(int).to_numpy()
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    predictor = _serve(tmp_path, model, fitted, None)
+    assert predictor.runtime == 'sklearn'
+
+    records = rows.iloc[:20].astype(object).where(rows.iloc[:20].notna(), None).to_dict('records')
+    assert predictor.predict_batch(records)['predictions'] == model.predict(X[:20]).tolist()
+
+
+class _FailingSession:
+    def run(self, output_names, feeds):
+        raise RuntimeError('Required inputs are missing from input feed')
+
+
+def test_generated_server_is_ready_only_after_a_successful_warm_up(tmp_path):
+    rows, X, fitted = _tabular()
+    y = (rows['score'].fillna(0) > 0).astype(int).to_numpy()
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    predictor = _serve(tmp_path, model, fitted, export_onnx(model, fitted, rows))
+
+    # An ONNX model that cannot predict is dropped for the pickled model
+    predictor.session = _FailingSession()
+    predictor.warm_up()
+    assert predictor.ready
+    assert predictor.runtime == 'sklearn'
+
+    predictor.ready = False
+    predictor.model = None
+    predictor.warm_up()
+    assert not predictor.ready
@@ -0,0 +1,42 @@
+import threading
+import time
+
+from explanation_service import RateLimiter
+
+
+def test_zero_rate_does_not_limit():
+    limiter = RateLimiter(0)
+    started = time.monotonic()
+    for _ in range(100):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.05
+
+
+def test_acquisitions_are_spaced_by_the_interval():
+    limiter = RateLimiter(600)  # one every 0.1s
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    # The first slot is immediate, the next three wait one interval each
+    assert 0.28 <= time.monotonic() - started < 0.6
+
+
+def test_threads_share_the_budget():
+    limiter = RateLimiter(600)
+    times = []
+    lock = threading.Lock()
+
+    def acquire():
+        limiter.acquire()
+        with lock:
+            times.append(time.monotonic())
+
+    threads = [threading.Thread(target=acquire) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    times.sort()
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert all(gap >= 0.08 for gap in gaps)
@@ -0,0 +1,85 @@
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+
+import pytest
+
+import render_pool
+from render_pool import render_tasks, task
+
+
+def square(x):
+    return x * x
+
+
+def fail_in_worker(x):
+    if multiprocessing.parent_process() is not None:
+        raise ValueError('renderer failed')
+    return 'rendered in the parent'
+
+
+def crash_in_worker(x):
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return 'rendered in the parent'
+
+
+def loaded_modules(renderers, names):
+    """Import renderer modules like a task unpickled in a worker, then list which of names are loaded"""
+    for module in renderers:
+        importlib.import_module(module)
+    return [name for name in names if name in sys.modules]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(render_pool, 'RENDER_WORKERS', 2)
+    yield
+    render_pool._discard_pool(render_pool._pool)
+
+
+def test_results_keep_the_task_order(pool):
+    assert render_tasks([task(square, i) for i in range(6)]) == [i * i for i in range(6)]
+
+
+def test_a_failing_renderer_is_not_retried_in_the_parent(pool):
+    assert render_tasks([task(fail_in_worker, 1), task(square, 3)]) == [None, 9]
+
+
+def test_a_crashed_worker_is_retried_locally_and_the_pool_replaced(pool):
+    broken = render_pool._get_pool()
+
+    assert render_tasks([task(crash_in_worker, 1), task(square, 3)])[0] == 'rendered in the parent'
+    assert render_pool._pool is not broken
+    # The broken pool was shut down rather than leaked
+    assert broken._shutdown_thread
+    assert render_tasks([task(square, 2), task(square, 4)]) == [4, 16]
+
+
+def test_one_pool_is_created_and_main_is_swapped_once(pool, monkeypatch):
+    swaps = []
+    without_main = render_pool._without_main
+
+    def counting_without_main():
+        swaps.append(threading.get_ident())
+        return without_main()
+
+    monkeypatch.setattr(render_pool, '_without_main', counting_without_main)
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(render_pool._get_pool())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    render_tasks([task(square, 1), task(square, 2)])
+
+    assert len({id(p) for p in pools}) == 1
+    assert len(swaps) == 1
+
+
+def test_renderer_modules_do_not_load_the_database_or_explanation_modules(pool):
+    renderers = ['figure_theme', 'figure_encoding', 'visualization', 'visualization_cnn']
+    heavy = ['explanation_service', 'yolo_dataset', 'yolo_runs', 'yolo_labels', 'image_store', 'app']
+    assert render_tasks([task(loaded_modules, renderers, heavy)] * 2) == [[], []]
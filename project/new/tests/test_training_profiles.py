@@ -0,0 +1,36 @@
+from training_profiles import ThroughputCallback
+
+
+def _epoch(callback, steps, epoch=0):
+    callback.on_epoch_begin(epoch)
+    for step in range(steps):
+        callback.on_train_batch_end(step)
+    logs = {}
+    callback.on_epoch_end(epoch, logs)
+    return logs
+
+
+def test_partial_last_batch_is_not_counted_as_full():
+    callback = ThroughputCallback(batch_size=32, samples_per_epoch=100)
+    logs = _epoch(callback, steps=4)
+
+    stats = callback.epoch_stats[0]
+    assert stats['samples'] == 100
+    assert logs['samples_per_sec'] == stats['samples'] / stats['train_seconds']
+
+
+def test_without_the_training_set_size_samples_are_an_upper_bound():
+    callback = ThroughputCallback(batch_size=32)
+    _epoch(callback, steps=4)
+    assert callback.epoch_stats[0]['samples'] == 128
+
+
+def test_summary_skips_the_first_epoch():
+    callback = ThroughputCallback(batch_size=10, samples_per_epoch=25)
+    for epoch in range(3):
+        _epoch(callback, steps=3, epoch=epoch)
+    summary = callback.summary()
+    assert summary['epochs'] == 3
+    later = callback.epoch_stats[1:]
+    assert summary['samples_per_sec'] == sum(s['samples_per_sec'] for s in later) / 2
+
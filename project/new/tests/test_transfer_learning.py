@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import transfer_learning
+from image_store import ArrayImageIterator
+from transfer_learning import _iterator_fingerprint, _prune_embeddings, db_fs
+
+
+def _extracted(directory, source_key='archive-1'):
+    """Stand-in for a DirectoryIterator over a dataset archive extracted to directory"""
+    filenames = ['cat/1.png', 'dog/2.png']
+    return SimpleNamespace(source_key=source_key, image_shape=(64, 64, 3), filenames=filenames,
+                           filepaths=[f'{directory}/{f}' for f in filenames], classes=[0, 1])
+
+
+def test_extracted_splits_are_keyed_on_the_archive_not_the_directory():
+    assert _iterator_fingerprint(_extracted('/tmp/a')) == _iterator_fingerprint(_extracted('/tmp/b'))
+    assert _iterator_fingerprint(_extracted('/tmp/a')) != _iterator_fingerprint(_extracted('/tmp/a', 'archive-2'))
+
+
+def test_image_store_splits_are_keyed_without_reading_the_pixels():
+    class Unreadable(np.ndarray):
+        def tobytes(self, *args, **kwargs):
+            raise AssertionError('pixels were read')
+
+    images = np.zeros((2, 8, 8, 3), dtype=np.uint8).view(Unreadable)
+    first = ArrayImageIterator(images, [0, 1], ['cat/1.png', 'dog/2.png'], ['cat', 'dog'], source_key='archive-1')
+    second = ArrayImageIterator(images, [0, 1], ['cat/1.png', 'dog/2.png'], ['cat', 'dog'], source_key='archive-2')
+    assert _iterator_fingerprint(first) != _iterator_fingerprint(second)
+
+
+def test_least_recently_used_embeddings_are_pruned(monkeypatch):
+    monkeypatch.setattr(transfer_learning, 'EMBEDDING_CACHE_KEEP', 2)
+    db_dir = 'datasets'
+    for name in ['embeddings_a.npz', 'embeddings_b.npz', 'embeddings_c.npz', 'image_store.npz']:
+        db_fs.save_file_content(b'x', name, db_dir)
+    # Oldest first; reusing a file marks it as used
+    for i, name in enumerate(['embeddings_a.npz', 'embeddings_b.npz', 'embeddings_c.npz']):
+        with db_fs._get_connection() as conn:
+            conn.execute("UPDATE files SET updated_at = ? WHERE filename = ?", (f'2024-01-0{i + 1} 00:00:00', name))
+            conn.commit()
+    db_fs.touch('embeddings_a.npz', db_dir)
+
+    _prune_embeddings(db_dir, 'embeddings_c.npz')
+
+    remaining = set(db_fs.list_files(db_dir))
+    assert {'embeddings_a.npz', 'embeddings_c.npz', 'image_store.npz'} <= remaining
+    assert 'embeddings_b.npz' not in remaining
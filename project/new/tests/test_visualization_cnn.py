@@ -0,0 +1,20 @@
+import numpy as np
+
+from image_store import ArrayImageIterator
+from visualization_cnn import SAMPLE_IMAGES, _evaluate
+
+
+def test_sample_images_follow_the_label_order_of_a_shuffled_iterator():
+    # Every image is filled with its own index, so the grid order can be read back
+    images = np.broadcast_to(np.arange(20, dtype=np.uint8)[:, None, None, None], (20, 4, 4, 3)).copy()
+    labels = np.arange(20) % 3
+    test_set = ArrayImageIterator(images, labels, [f'{i}.png' for i in range(20)], ['a', 'b', 'c'],
+                                  batch_size=8, shuffle=True, seed=1)
+    probabilities = np.eye(3)[labels]
+
+    evaluation = _evaluate(None, test_set, y_pred_probs=probabilities)
+
+    shown = np.rint(evaluation['sample_images'][:, 0, 0, 0] * 255).astype(int)
+    assert shown.tolist() == list(range(SAMPLE_IMAGES))
+    assert evaluation['y_true'][:SAMPLE_IMAGES].tolist() == labels[:SAMPLE_IMAGES].tolist()
+    assert evaluation['y_pred'][:SAMPLE_IMAGES].tolist() == labels[:SAMPLE_IMAGES].tolist()
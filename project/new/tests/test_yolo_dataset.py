@@ -0,0 +1,43 @@
+from yolo_dataset import dataset_content_hash, LABEL_INDEX_FILE
+
+
+def _files(**overrides):
+    files = {
+        'images/a.jpg': {'content_hash': 'h-a', 'size': 10, 'updated_at': '2024-01-01 00:00:00'},
+        'labels/a.txt': {'content_hash': 'h-b', 'size': 5, 'updated_at': '2024-01-01 00:00:00'},
+    }
+    files.update(overrides)
+    return files
+
+
+def test_same_inputs_give_the_same_hash():
+    assert dataset_content_hash('yaml', 'zip') == dataset_content_hash('yaml', 'zip')
+    assert dataset_content_hash('yaml', files=_files()) == dataset_content_hash('yaml', files=_files())
+
+
+def test_yaml_and_archive_changes_change_the_hash():
+    assert dataset_content_hash('yaml', 'zip') != dataset_content_hash('yaml2', 'zip')
+    assert dataset_content_hash('yaml', 'zip') != dataset_content_hash('yaml', 'zip2')
+
+
+def test_edited_file_changes_the_hash():
+    edited = _files(**{'labels/a.txt': {'content_hash': 'h-b2', 'size': 5, 'updated_at': '2024-01-01 00:00:00'}})
+    assert dataset_content_hash('yaml', files=_files()) != dataset_content_hash('yaml', files=edited)
+
+
+def test_legacy_files_fall_back_to_size_and_timestamp():
+    legacy = {'labels/a.txt': {'content_hash': None, 'size': 5, 'updated_at': '2024-01-01 00:00:00'}}
+    rewritten = {'labels/a.txt': {'content_hash': None, 'size': 5, 'updated_at': '2024-01-02 00:00:00'}}
+    resized = {'labels/a.txt': {'content_hash': None, 'size': 6, 'updated_at': '2024-01-01 00:00:00'}}
+    base = dataset_content_hash('yaml', files=legacy)
+    assert base != dataset_content_hash('yaml', files=rewritten)
+    assert base != dataset_content_hash('yaml', files=resized)
+
+
+def test_file_order_and_label_index_do_not_matter():
+    files = _files()
+    reordered = dict(reversed(list(files.items())))
+    with_index = dict(files, **{LABEL_INDEX_FILE: {'content_hash': 'index', 'size': 1, 'updated_at': 'now'}})
+    base = dataset_content_hash('yaml', files=files)
+    assert base == dataset_content_hash('yaml', files=reordered)
+    assert base == dataset_content_hash('yaml', files=with_index)
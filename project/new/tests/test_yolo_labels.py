@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+import yolo_labels
+from yolo_labels import build_label_index, load_label_index, class_counts, boxes_for_images
+
+
+def _make_dataset(root, labels):
+    for split, files in labels.items():
+        os.makedirs(os.path.join(root, split, 'images'), exist_ok=True)
+        os.makedirs(os.path.join(root, split, 'labels'), exist_ok=True)
+        for name, text in files.items():
+            open(os.path.join(root, split, 'images', f'{name}.jpg'), 'wb').close()
+            with open(os.path.join(root, split, 'labels', f'{name}.txt'), 'w') as f:
+                f.write(text)
+
+
+def test_index_holds_every_box_by_image(tmp_path):
+    root = str(tmp_path)
+    _make_dataset(root, {
+        'train': {'a': "0 0.5 0.5 0.2 0.2\n1 0.1 0.1 0.1 0.1\n", 'b': ""},
+        'val': {'c': "1 0.3 0.3 0.2 0.2 0.1 0.1 0.4 0.4\nbad line here x y\n"},
+    })
+
+    index = build_label_index(root)
+
+    assert list(index['label_files']) == [os.path.join('train', 'labels', 'a.txt'),
+                                          os.path.join('train', 'labels', 'b.txt'),
+                                          os.path.join('val', 'labels', 'c.txt')]
+    assert list(index['image_files'])[2] == os.path.join('val', 'images', 'c.jpg')
+    assert list(index['image_id']) == [0, 0, 2]
+    assert class_counts(index, {0: 'cat', 1: 'dog', 2: 'bird'}) == {0: 1, 1: 2, 2: 0}
+
+    (classes_a, boxes_a), (classes_b, _), (classes_c, boxes_c) = boxes_for_images(index, [0, 1, 2])
+    assert list(classes_a) == [0, 1] and len(classes_b) == 0 and list(classes_c) == [1]
+    np.testing.assert_allclose(boxes_c, [[0.3, 0.3, 0.2, 0.2]])
+
+
+def test_loaded_indexes_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(yolo_labels, 'LABEL_INDEX_CACHE_SIZE', 2)
+    monkeypatch.setattr(yolo_labels, '_loaded', yolo_labels.OrderedDict())
+    roots = []
+    for name in ['one', 'two', 'three']:
+        root = str(tmp_path / name)
+        _make_dataset(root, {'train': {'a': "0 0.5 0.5 0.2 0.2\n"}})
+        roots.append(root)
+
+    first = load_label_index(roots[0])
+    load_label_index(roots[1])
+    assert load_label_index(roots[0]) is first
+    load_label_index(roots[2])
+
+    assert list(yolo_labels._loaded) == [roots[0], roots[2]]
@@ -0,0 +1,70 @@
+import os
+import json
+import time
+import threading
+
+import numpy as np
+
+import yolo_runs
+from yolo_runs import parse_results_csv, record_run, load_run_metrics, prune_run_dirs
+
+
+def _write_results(run_dir):
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, 'results.csv'), 'w') as f:
+        f.write("epoch,  metrics/precision(B),  metrics/recall(B),  metrics/mAP50(B),  metrics/mAP50-95(B)\n")
+        f.write("1,0.5,0.4,0.3,0.2\n")
+        f.write("2,0.6,0.5,0.4,0.3\n")
+
+
+def test_results_csv_gives_final_metrics_and_plain_python_history(tmp_path):
+    run_dir = str(tmp_path / 'run')
+    _write_results(run_dir)
+
+    parsed = parse_results_csv(run_dir)
+
+    assert parsed['final'] == {'mAP50-95': 0.3, 'mAP50': 0.4, 'precision': 0.6, 'recall': 0.5}
+    assert [row['epoch'] for row in parsed['history']] == [1, 2]
+    for row in parsed['history']:
+        assert not any(isinstance(v, np.generic) for v in row.values())
+    assert type(parsed['history'][0]['epoch']) is int
+    json.dumps(parsed)
+
+
+def test_missing_results_csv_gives_none(tmp_path):
+    assert parse_results_csv(str(tmp_path)) is None
+
+
+def test_concurrent_runs_are_all_indexed(monkeypatch):
+    # Widen the window between reading and rewriting the index
+    load_index = yolo_runs._load_index
+
+    def slow_load_index():
+        index = load_index()
+        time.sleep(0.01)
+        return index
+
+    monkeypatch.setattr(yolo_runs, '_load_index', slow_load_index)
+    run_ids = [f'concurrent_{i}' for i in range(8)]
+    threads = [threading.Thread(target=record_run, args=(run_id, run_id, {'mAP50': 0.5}))
+               for run_id in run_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    indexed = {entry['run_id'] for entry in load_index()}
+    assert set(run_ids) <= indexed
+    for run_id in run_ids:
+        assert load_run_metrics(run_id)['metrics'] == {'mAP50': 0.5}
+
+
+def test_prune_keeps_the_newest_run_directories(tmp_path):
+    for name, mtime in [('older', 1000), ('old', 2000), ('new', 3000)]:
+        path = tmp_path / name
+        path.mkdir()
+        os.utime(path, (mtime, mtime))
+
+    prune_run_dirs(str(tmp_path), keep=1, exclude=str(tmp_path / 'older'))
+
+    assert sorted(os.listdir(tmp_path)) == ['new', 'older']
@@ -0,0 +1,272 @@
+import os
+import time
+
+# Check if TensorFlow is available
+try:
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import Callback
+    TENSORFLOW_AVAILABLE = True
+except ImportError:
+    TENSORFLOW_AVAILABLE = False
+    Callback = object
+
+# CPU training profile; every value can be overridden with an environment variable
+CPU_PROFILE = {
+    # Threads used inside a single op (matmul/conv); 0 lets TensorFlow pick the physical core count
+    'intra_op_threads': int(os.getenv('CNN_INTRA_OP_THREADS', '0')),
+    # Independent ops run concurrently; small values avoid oversubscribing the cores
+    'inter_op_threads': int(os.getenv('CNN_INTER_OP_THREADS', '2')),
+    # 'auto' enables bfloat16 only when the CPU has native support, 'bfloat16' forces it, 'off' disables it
+    'mixed_precision': os.getenv('CNN_MIXED_PRECISION', 'auto'),
+    # Compile the train step with XLA
+    'jit_compile': os.getenv('CNN_JIT_COMPILE', 'true').lower() == 'true',
+}
+
+
+def cpu_supports_bfloat16():
+    """Check /proc/cpuinfo for native bfloat16 instructions (AVX512_BF16 or AMX)"""
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            flags = f.read()
+        return 'avx512_bf16' in flags or 'amx_bf16' in flags
+    except Exception:
+        return False
+
+
+def configure_cpu_threads(intra_op_threads=0, inter_op_threads=2):
+    """
+    Set TensorFlow's thread pools. This only works before the TensorFlow runtime has
+    executed its first op, so later calls in the same process keep the existing setting.
+    """
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        print(f"TensorFlow threads: intra_op={intra_op_threads or 'auto'}, inter_op={inter_op_threads}")
+    except RuntimeError as e:
+        print(f"Thread settings unchanged (runtime already initialized): {e}")
+
+
+def resolve_mixed_precision(setting):
+    """Return the Keras mixed precision policy name for a profile setting, or None"""
+    if setting == 'bfloat16' or (setting == 'auto' and cpu_supports_bfloat16()):
+        return 'mixed_bfloat16'
+    return None
+
+
+def build_cpu_cnn(image_shape, num_classes, mixed_precision_policy=None):
+    """
+    Build a CNN with oneDNN-friendly layers for CPU training.
+
+    Conv2D (no bias) + BatchNormalization + ReLU is fused by oneDNN into a single kernel,
+    channel counts are multiples of 16 for the blocked memory layout, and global average
+    pooling replaces the large Flatten + Dense(256) block.
+    """
+    from tensorflow.keras import layers, models, mixed_precision
+
+    previous_policy = mixed_precision.global_policy()
+    if mixed_precision_policy:
+        mixed_precision.set_global_policy(mixed_precision_policy)
+
+    try:
+        inputs = layers.Input(shape=image_shape)
+        x = inputs
+        for filters in (32, 64, 128):
+            x = layers.Conv2D(filters, (3, 3), padding='same', use_bias=False)(x)
+            x = layers.BatchNormalization()(x)
+            x = layers.ReLU()(x)
+            x = layers.MaxPooling2D(pool_size=(2, 2))(x)
+
+        x = layers.GlobalAveragePooling2D()(x)
+        x = layers.Dense(128, activation='relu')(x)
+        x = layers.Dropout(0.5)(x)
+        # Keep the softmax in float32 for numerically stable losses under mixed precision
+        outputs = layers.Dense(num_classes, activation='softmax', dtype='float32')(x)
+        model = models.Model(inputs, outputs, name='cpu_cnn')
+    finally:
+        # The policy is captured per layer, so restore the global default for other models
+        mixed_precision.set_global_policy(previous_policy)
+
+    return model
+
+
+class ThroughputCallback(Callback):
+    """
+    Measure training throughput per epoch.
+    Adds steps_per_sec and samples_per_sec to the epoch logs (and so to history.history).
+
+    An epoch's last batch is partial when the training set size is not a multiple of
+    batch_size; with samples_per_epoch (the training set size) the samples are counted
+    exactly, without it steps * batch_size is an upper bound.
+    """
+
+    def __init__(self, batch_size, samples_per_epoch=None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.samples_per_epoch = samples_per_epoch
+        self.epoch_stats = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._steps = 0
+        self._start = time.perf_counter()
+        self._train_end = self._start
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._steps += 1
+        self._train_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Only count time spent in training steps, not validation
+        elapsed = max(self._train_end - self._start, 1e-9)
+        steps_per_sec = self._steps / elapsed
+        samples = self._steps * self.batch_size
+        if self.samples_per_epoch:
+            samples = min(samples, self.samples_per_epoch)
+        stats = {
+            'epoch': epoch + 1,
+            'steps': self._steps,
+            'samples': samples,
+            'train_seconds': elapsed,
+            'steps_per_sec': steps_per_sec,
+            'samples_per_sec': samples / elapsed,
+        }
+        self.epoch_stats.append(stats)
+        if logs is not None:
+            logs['steps_per_sec'] = stats['steps_per_sec']
+            logs['samples_per_sec'] = stats['samples_per_sec']
+        print(f"Epoch {epoch + 1}: {steps_per_sec:.2f} steps/sec, {stats['samples_per_sec']:.1f} samples/sec")
+
+    def summary(self):
+        """Average throughput over all epochs except the first (which includes tracing/XLA compile)"""
+        stats = self.epoch_stats[1:] or self.epoch_stats
+        if not stats:
+            return {}
+        return {
+            'epochs': len(self.epoch_stats),
+            'steps_per_sec': sum(s['steps_per_sec'] for s in stats) / len(stats),
+            'samples_per_sec': sum(s['samples_per_sec'] for s in stats) / len(stats),
+            'first_epoch_seconds': self.epoch_stats[0]['train_seconds'],
+        }
+
+
+# YOLO training profiles: trade accuracy against throughput per request.
+# 'batch' of -1 lets Ultralytics pick the largest batch that fits GPU memory; on CPU the
+# fixed 'cpu_batch' is used instead since autobatch only works with CUDA.
+# 'rect' applies to the training loader only: rectangular training batches pad less, but
+# Ultralytics then turns off shuffling, so every profile leaves it off (validation always
+# uses rectangular batches).
+YOLO_PROFILES = {
+    'quick': {
+        'model': 'yolov8n.pt',
+        'epochs': 1,
+        'imgsz': 320,
+        'batch': -1,
+        'cpu_batch': 8,   # The batch size YOLO training always used before the profiles
+        'cache': 'ram',   # Decode images once, keep them in memory for every epoch
+        'rect': False,
+        'patience': 50,
+    },
+    'balanced': {
+        'model': 'yolov8n.pt',
+        'epochs': 10,
+        'imgsz': 416,
+        'batch': -1,
+        'cpu_batch': 16,
+        'cache': 'ram',
+        'rect': False,
+        'patience': 10,
+    },
+    'thorough': {
+        'model': 'yolov8s.pt',
+        'epochs': 50,
+        'imgsz': 640,
+        'batch': -1,
+        'cpu_batch': 16,
+        'cache': 'disk',  # Large images may not fit in memory; .npy cache avoids re-decoding
+        'rect': False,
+        'patience': 20,
+    },
+}
+
+DEFAULT_YOLO_PROFILE = os.getenv('YOLO_PROFILE', 'quick')
+
+
+def get_yolo_profile(name=None, device='cpu'):
+    """
+    Resolve a YOLO training profile into model.train() settings for the given device.
+
+    Returns:
+    (model_weights, train_kwargs)
+    """
+    name = name or DEFAULT_YOLO_PROFILE
+    if name not in YOLO_PROFILES:
+        print(f"Unknown YOLO profile '{name}', using '{DEFAULT_YOLO_PROFILE}'")
+        name = DEFAULT_YOLO_PROFILE
+    profile = YOLO_PROFILES[name]
+
+    cpu_count = os.cpu_count() or 1
+    train_kwargs = {
+        'epochs': profile['epochs'],
+        'imgsz': profile['imgsz'],
+        'cache': profile['cache'],
+        'rect': profile['rect'],
+        'patience': profile['patience'],
+        'device': device,
+    }
+
+    if device == 'cpu':
+        train_kwargs['batch'] = profile['cpu_batch']
+        # Leave a core for the training loop itself
+        train_kwargs['workers'] = int(os.getenv('YOLO_WORKERS', max(1, min(8, cpu_count - 1))))
+        train_kwargs['amp'] = False
+    else:
+        train_kwargs['batch'] = profile['batch']
+        train_kwargs['workers'] = int(os.getenv('YOLO_WORKERS', min(8, cpu_count)))
+
+    return profile['model'], train_kwargs
+
+
+class YoloThroughputTracker:
+    """
+    Ultralytics callbacks measuring epoch time and training images/sec.
+    Register with tracker.attach(model) before model.train().
+    """
+
+    def __init__(self):
+        self.epoch_stats = []
+        self._start = None
+
+    def attach(self, model):
+        model.add_callback('on_train_epoch_start', self.on_train_epoch_start)
+        model.add_callback('on_train_epoch_end', self.on_train_epoch_end)
+
+    def on_train_epoch_start(self, trainer):
+        self._start = time.perf_counter()
+
+    def on_train_epoch_end(self, trainer):
+        if self._start is None:
+            return
+        # Training steps only; validation runs after this callback
+        elapsed = max(time.perf_counter() - self._start, 1e-9)
+        try:
+            num_images = len(trainer.train_loader.dataset)
+        except Exception:
+            num_images = 0
+        stats = {
+            'epoch': len(self.epoch_stats) + 1,
+            'epoch_seconds': elapsed,
+            'images_per_sec': num_images / elapsed,
+        }
+        self.epoch_stats.append(stats)
+        print(f"YOLO epoch {stats['epoch']}: {elapsed:.1f}s, {stats['images_per_sec']:.1f} images/sec")
+
+    def summary(self):
+        """Average over all epochs except the first (which includes dataset caching) when possible"""
+        stats = self.epoch_stats[1:] or self.epoch_stats
+        if not stats:
+            return {}
+        return {
+            'epochs': len(self.epoch_stats),
+            'images_per_sec': sum(s['images_per_sec'] for s in stats) / len(stats),
+            'epoch_seconds': sum(s['epoch_seconds'] for s in stats) / len(stats),
+            'first_epoch_seconds': self.epoch_stats[0]['epoch_seconds'],
+        }
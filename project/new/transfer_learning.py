@@ -0,0 +1,266 @@
+import os
+import io
+import hashlib
+import tempfile
+import numpy as np
+from db_file_system import DBFileSystem
+
+# Initialize database file system
+db_fs = DBFileSystem()
+
+# Check if TensorFlow is available
+try:
+    import tensorflow as tf
+    TENSORFLOW_AVAILABLE = True
+except ImportError:
+    TENSORFLOW_AVAILABLE = False
+
+# Directory holding the pretrained backbone weights (no downloads at training time)
+BACKBONE_WEIGHTS_DIR = os.getenv('BACKBONE_WEIGHTS_DIR', 'weights')
+
+# Cached embedding files kept in the database; the least recently used ones are removed
+EMBEDDING_CACHE_KEEP = int(os.getenv('EMBEDDING_CACHE_KEEP', 8))
+
+# Supported backbones: Keras application, default no-top weights file, and the input
+# scale each one expects (our images are in [0, 1])
+BACKBONES = {
+    'mobilenet_v2': {
+        'application': 'MobileNetV2',
+        'weights_file': 'mobilenet_v2_weights_tf_dim_ordering_tf_kernels_1.0_96_no_top.h5',
+        'scale': 2.0, 'offset': -1.0,   # expects [-1, 1]
+    },
+    'mobilenet_v3_small': {
+        'application': 'MobileNetV3Small',
+        'weights_file': 'weights_mobilenet_v3_small_224_1.0_float_no_top_v2.h5',
+        'scale': 255.0, 'offset': 0.0,  # built-in preprocessing expects [0, 255]
+    },
+    'efficientnet_b0': {
+        'application': 'EfficientNetB0',
+        'weights_file': 'efficientnetb0_notop.h5',
+        'scale': 255.0, 'offset': 0.0,  # built-in rescaling expects [0, 255]
+    },
+}
+
+
+def get_weights_path(backbone, weights_path=None):
+    """Resolve the local weights file for a backbone"""
+    if backbone not in BACKBONES:
+        raise ValueError(f"Unknown backbone '{backbone}'. Available: {list(BACKBONES)}")
+    path = weights_path or os.path.join(BACKBONE_WEIGHTS_DIR, BACKBONES[backbone]['weights_file'])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Backbone weights not found: {path}")
+    return path
+
+
+def build_feature_extractor(backbone, image_shape, weights_path, input_size=96):
+    """
+    Build a frozen backbone that maps [0, 1] images to pooled embedding vectors.
+
+    Returns:
+    Keras model with input image_shape and output (embedding_dim,)
+    """
+    config = BACKBONES[backbone]
+    application = getattr(tf.keras.applications, config['application'])
+
+    inputs = tf.keras.layers.Input(shape=image_shape)
+    x = tf.keras.layers.Resizing(input_size, input_size)(inputs)
+    x = tf.keras.layers.Rescaling(config['scale'], offset=config['offset'])(x)
+
+    base = application(
+        include_top=False,
+        weights=weights_path,
+        input_shape=(input_size, input_size, 3),
+        pooling='avg'
+    )
+    base.trainable = False
+
+    outputs = base(x, training=False)
+    return tf.keras.Model(inputs, outputs, name=f"{backbone}_features")
+
+
+def _iterator_fingerprint(iterator):
+    """
+    Identify a split's contents so cached embeddings are invalidated when it changes.
+
+    Splits of a dataset archive (image store or extracted DirectoryIterator) are keyed on the
+    archive hash (source_key) and their file names relative to the dataset, which stay the
+    same across extraction directories; the pixels are not read. Folders on disk without a
+    source_key are keyed on their absolute file paths.
+    """
+    h = hashlib.sha1()
+    source_key = getattr(iterator, 'source_key', None)
+    if source_key:
+        h.update(source_key.encode('utf-8'))
+        h.update(str(tuple(iterator.image_shape)).encode('utf-8'))
+        h.update('\n'.join(f.replace('\\', '/') for f in iterator.filenames).encode('utf-8'))
+    else:
+        h.update('\n'.join(iterator.filepaths).encode('utf-8'))
+    h.update(np.asarray(iterator.classes, dtype=np.int32).tobytes())
+    return h.hexdigest()
+
+
+def _prune_embeddings(db_dir, keep_filename):
+    """Remove the least recently used cached embeddings beyond EMBEDDING_CACHE_KEEP"""
+    try:
+        infos = db_fs.file_infos(db_dir)
+        cached = sorted((f for f in infos if f.startswith('embeddings_') and f.endswith('.npz')),
+                        key=lambda f: infos[f]['updated_at'] or '', reverse=True)
+        for filename in cached[EMBEDDING_CACHE_KEEP:]:
+            if filename != keep_filename:
+                db_fs.delete_file(filename, db_dir)
+                print(f"Removed old cached embeddings: {filename}")
+    except Exception as e:
+        print(f"Error pruning cached embeddings: {e}")
+
+
+def _iterator_images(iterator):
+    """Yield (images in [0, 1]) batches in order from an image store or DirectoryIterator"""
+    from image_pipeline import dataset_from_generator
+    return dataset_from_generator(iterator, batch_size=64, cache=False).map(lambda x, y: x)
+
+
+def compute_embeddings(extractor, iterator, cache_key, db_dir='datasets'):
+    """
+    Compute backbone embeddings for every image of a split, cached in the database.
+
+    Parameters:
+    extractor: Frozen feature extractor from build_feature_extractor
+    iterator: ArrayImageIterator or DirectoryIterator for the split
+    cache_key: Backbone/weights identifier mixed into the cache key
+    db_dir: Database directory for the cached embeddings
+
+    Returns:
+    (embeddings, labels) as float32 / int32 arrays
+    """
+    key = hashlib.sha1(f"{cache_key}:{_iterator_fingerprint(iterator)}".encode('utf-8')).hexdigest()[:16]
+    filename = f"embeddings_{key}.npz"
+
+    try:
+        if db_fs.file_exists(filename, db_dir):
+            with np.load(io.BytesIO(db_fs.get_file(filename, db_dir))) as data:
+                print(f"Loaded cached embeddings: {filename}")
+                # Recently used, so pruning keeps it
+                db_fs.touch(filename, db_dir)
+                return data['embeddings'], data['labels']
+    except Exception as e:
+        print(f"Error loading cached embeddings: {e}")
+
+    print(f"Computing embeddings for {iterator.samples} images...")
+    embeddings = extractor.predict(_iterator_images(iterator), verbose=0).astype(np.float32)
+    labels = np.asarray(iterator.classes, dtype=np.int32)
+
+    try:
+        temp_path = os.path.join(tempfile.gettempdir(), filename)
+        np.savez(temp_path, embeddings=embeddings, labels=labels)
+        db_fs.save_file(temp_path, db_dir)
+        os.remove(temp_path)
+        print(f"Saved embeddings to database: {filename}")
+        _prune_embeddings(db_dir, filename)
+    except Exception as e:
+        print(f"Error caching embeddings: {e}")
+
+    return embeddings, labels
+
+
+def train_transfer_learning_model(
+    training_set,
+    validation_set=None,
+    test_set=None,
+    num_classes=None,
+    backbone='mobilenet_v2',
+    weights_path=None,
+    input_size=96,
+    epochs=30,
+    learning_rate=0.001,
+    batch_size=32,
+    early_stopping_patience=5,
+    db_dir='datasets'
+):
+    """
+    Train a small classification head on cached embeddings from a frozen pretrained backbone.
+
+    Parameters:
+    training_set, validation_set, test_set: ArrayImageIterator or DirectoryIterator splits
+    num_classes: Number of classes
+    backbone: One of BACKBONES
+    weights_path: Local no-top weights file (defaults to BACKBONE_WEIGHTS_DIR)
+    input_size: Resolution the backbone runs at
+    epochs, learning_rate, batch_size, early_stopping_patience: Head training settings
+    db_dir: Database directory for the cached embeddings
+
+    Returns:
+    model: Backbone + head as one Keras model taking the same inputs as the CNN
+    model_name: Name of the model
+    accuracy: Test accuracy
+    y_pred: Predicted classes
+    history: Head training history
+    """
+    if not TENSORFLOW_AVAILABLE:
+        raise ImportError("TensorFlow is required for transfer learning but not available")
+
+    weights_path = get_weights_path(backbone, weights_path)
+    image_shape = tuple(training_set.image_shape) if hasattr(training_set, 'image_shape') else (64, 64, 3)
+    num_classes = num_classes or len(training_set.class_indices)
+
+    extractor = build_feature_extractor(backbone, image_shape, weights_path, input_size)
+
+    # The weights file content is part of the key so swapping weights recomputes embeddings
+    with open(weights_path, 'rb') as f:
+        weights_hash = hashlib.sha1(f.read()).hexdigest()
+    cache_key = f"{backbone}:{input_size}:{weights_hash}"
+
+    X_train, y_train = compute_embeddings(extractor, training_set, cache_key, db_dir)
+    eval_set = validation_set or test_set
+    validation_data = None
+    if eval_set is not None:
+        X_val, y_val = compute_embeddings(extractor, eval_set, cache_key, db_dir)
+        validation_data = (X_val, tf.keras.utils.to_categorical(y_val, num_classes))
+
+    # Small head trained on embeddings only; each epoch is a pass over a (n, dim) matrix
+    head = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(X_train.shape[1],)),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(num_classes, activation='softmax')
+    ], name='classification_head')
+    head.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+    callbacks = []
+    if validation_data is not None:
+        callbacks.append(tf.keras.callbacks.EarlyStopping(
+            monitor='val_loss', patience=early_stopping_patience, restore_best_weights=True, verbose=1
+        ))
+
+    print(f"Training {backbone} head on {len(X_train)} embeddings...")
+    history = head.fit(
+        X_train,
+        tf.keras.utils.to_categorical(y_train, num_classes),
+        validation_data=validation_data,
+        epochs=epochs,
+        batch_size=batch_size,
+        callbacks=callbacks,
+        verbose=1
+    )
+
+    # Evaluate on the cached test embeddings
+    if test_set is not None:
+        X_test, y_test = compute_embeddings(extractor, test_set, cache_key, db_dir)
+    else:
+        X_test, y_test = X_train, y_train
+    y_pred_probs = head.predict(X_test, verbose=0)
+    y_pred = np.argmax(y_pred_probs, axis=1)
+    if test_set is not None:
+        # Kept for create_cnn_visualization, so the test set is not predicted twice
+        history.test_probabilities = y_pred_probs
+    accuracy = float(np.mean(y_pred == y_test)) if len(y_test) else 0.0
+    print(f"Test accuracy: {accuracy:.4f}")
+
+    # Export backbone + head as a single model so saving and serving work like the CNN
+    inputs = tf.keras.layers.Input(shape=image_shape)
+    model = tf.keras.Model(inputs, head(extractor(inputs)), name=f"{backbone}_classifier")
+    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+
+    return model, f"Transfer Learning ({backbone})", accuracy, y_pred, history
@@ -1,9 +1,9 @@
 import os
+import hashlib
 import zipfile
-import uuid
 import pickle
 import tempfile
-from db_file_system import DBFileSystem
+from db_file_system import DBFileSystem, STREAM_CHUNK_SIZE
 
 # Initialize database file system
 db_fs = DBFileSystem()
@@ -16,66 +16,48 @@ def generate_loading_code(filename, feature_names, downloads_dir, is_image_model
         code_template = """
 import streamlit as st
 from ultralytics import YOLO
-import cv2
 from PIL import Image
-import numpy as np
-import os
+
+# Loaded once per server process and shared by every session and rerun
+@st.cache_resource
+def load_model():
+  return YOLO("best_model.pt")
 
 def main():
   st.title('Object Detection with YOLOv8')
-  st.write('Upload an image to detect objects')
+  st.write('Upload images to detect objects')
   
-  # File uploader
-  uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"])
+  # File uploader (all uploaded images are detected in one batch)
+  uploaded_files = st.file_uploader("Choose images...", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
   
-  if uploaded_file is not None:
-      # Read the image
-      image = Image.open(uploaded_file)
-      st.image(image, caption='Uploaded Image', use_container_width=True)
-      
-      # Save the uploaded image temporarily
-      with open("temp_image.jpg", "wb") as f:
-          f.write(uploaded_file.getbuffer())
+  if uploaded_files:
+      # Decode the images in memory
+      images = [Image.open(uploaded_file).convert('RGB') for uploaded_file in uploaded_files]
+      st.image(images, caption=[uploaded_file.name for uploaded_file in uploaded_files], use_container_width=True)
       
       # Perform object detection
       if st.button('Detect Objects'):
           with st.spinner('Detecting...'):
-              # Load the model
-              model = YOLO("best_model.pt")
-              
-              # Run inference
-              results = model.predict(source="temp_image.jpg", conf=0.25)
-              
-              # Get the first result (we only have one image)
-              result = results[0]
-              
-              # Display result
-              result_img = result.plot()
-              result_img_rgb = cv2.cvtColor(result_img, cv2.COLOR_BGR2RGB)
-              st.image(result_img_rgb, caption='Detection Result', use_container_width=True)
+              model = load_model()
               
-              # Display detection details
-              st.subheader('Detection Results:')
+              # Run inference on the whole batch
+              results = model.predict(source=images, conf=0.25)
               
               # Get class names dictionary
               names = model.names
               
-              # Display each detection
-              for box in result.boxes:
-                  cls_id = int(box.cls[0].item())
-                  class_name = names[cls_id]
-                  confidence = box.conf[0].item()
-                  coordinates = box.xyxy[0].tolist()  # get box coordinates in (top, left, bottom, right) format
+              for uploaded_file, result in zip(uploaded_files, results):
+                  # Display result (plot() draws in BGR order)
+                  st.image(result.plot()[:, :, ::-1], caption=f'Detection Result: {uploaded_file.name}', use_container_width=True)
                   
-                  st.write(f"**Class:** {class_name}, **Confidence:** {confidence:.2f}")
-                  st.write(f"**Coordinates:** [x1={coordinates[0]:.1f}, y1={coordinates[1]:.1f}, x2={coordinates[2]:.1f}, y2={coordinates[3]:.1f}]")
-                  st.write("---")
-              
-              # Clean up
-              try:
-                  os.remove("temp_image.jpg")
-              except:
-                  pass
+                  # Display detection details
+                  st.subheader(f'Detection Results: {uploaded_file.name}')
+                  boxes = result.boxes
+                  for cls_id, confidence, coordinates in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xyxy.tolist()):
+                      class_name = names[int(cls_id)]
+                      st.write(f"**Class:** {class_name}, **Confidence:** {confidence:.2f}")
+                      st.write(f"**Coordinates:** [x1={coordinates[0]:.1f}, y1={coordinates[1]:.1f}, x2={coordinates[2]:.1f}, y2={coordinates[3]:.1f}]")
+                      st.write("---")
 
 if __name__ == "__main__":
   main()
@@ -84,17 +66,18 @@ if __name__ == "__main__":
         code_template = """
 import streamlit as st
 import tensorflow as tf
-from tensorflow.keras.preprocessing import image
 import numpy as np
 from PIL import Image
-import os
 
-# Load the model
-model_path = 'best_model.keras'
+# Loaded once per server process and shared by every session and rerun
+@st.cache_resource
+def load_model():
+  model = tf.keras.models.load_model('best_model.keras')
+  print(f"Model loaded successfully, output shape: {model.output_shape}")
+  return model
+
 try:
-  model = tf.keras.models.load_model(model_path)
-  print(f"Model loaded successfully from {model_path}")
-  print(f"Model output shape: {model.output_shape}")
+  model = load_model()
   num_classes = model.output_shape[1]
 except Exception as e:
   st.error(f"Error loading model: {e}")
@@ -104,46 +87,40 @@ except Exception as e:
 # You may need to update these class labels based on your specific dataset
 class_labels = {i: f'Class {i}' for i in range(num_classes)}
 
-def predict_image(img_path):
-  # Load and preprocess the image
-  img = Image.open(img_path).convert('RGB')  # Ensure the image is in RGB format
-  img = img.resize((64, 64))  # Resize to match training images
-  img_array = image.img_to_array(img)
-  img_array = np.expand_dims(img_array, axis=0)
-  img_array /= 255.0  # Ensure scaling matches training preprocessing
-  
-  # Predict the class
-  result = model.predict(img_array)
-  predicted_class_index = np.argmax(result[0])
+def predict_images(uploaded_files):
+  # Decode and preprocess the images in memory, as one batch
+  batch = np.stack([
+      np.asarray(Image.open(uploaded_file).convert('RGB').resize((64, 64)), dtype=np.float32)  # Resize to match training images
+      for uploaded_file in uploaded_files
+  ])
+  batch /= 255.0  # Ensure scaling matches training preprocessing
   
-  # Get the class name
-  if predicted_class_index in class_labels:
-      prediction = class_labels[predicted_class_index]
-  else:
-      prediction = f"Unknown class {predicted_class_index}"
+  # Predict the classes with one model call
+  results = model.predict(batch, verbose=0)
+  predictions = [class_labels.get(int(index), f"Unknown class {index}") for index in np.argmax(results, axis=1)]
   
-  return prediction, result[0]
+  return predictions, results
 
 st.title("Image Classification")
-st.write("Upload an image to classify.")
+st.write("Upload images to classify.")
 
-uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"])
+uploaded_files = st.file_uploader("Choose images...", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
 
-if uploaded_file is not None:
-  st.image(uploaded_file, caption='Uploaded Image', use_container_width=True)
-  st.write("")
+if uploaded_files:
   st.write("Classifying...")
   
   try:
-      prediction, probabilities = predict_image(uploaded_file)
-      
-      st.write(f"Prediction: {prediction}")
+      predictions, probabilities = predict_images(uploaded_files)
       
-      # Display probabilities
-      st.write("Prediction probabilities:")
-      for i, prob in enumerate(probabilities):
-          class_name = class_labels.get(i, f"Class {i}")
-          st.write(f"{class_name}: {prob:.4f}")
+      for uploaded_file, prediction, image_probabilities in zip(uploaded_files, predictions, probabilities):
+          st.image(uploaded_file, caption=uploaded_file.name, use_container_width=True)
+          st.write(f"Prediction: {prediction}")
+          
+          # Display probabilities
+          st.write("Prediction probabilities:")
+          for i, prob in enumerate(image_probabilities):
+              class_name = class_labels.get(i, f"Class {i}")
+              st.write(f"{class_name}: {prob:.4f}")
   except Exception as e:
       st.error(f"Error during prediction: {e}")
 """
@@ -155,50 +132,153 @@ if uploaded_file is not None:
                 feature_list += f"    '{feature}': st.number_input('Enter {feature}', value=0.0),\n"
         
         code_template = f"""
+import os
 import pickle
 import streamlit as st
 import pandas as pd
 import numpy as np
 
-# Load the model from file
+# Runs predict/predict_proba with ONNX Runtime on raw rows (the exported graph includes the
+# fitted preprocessing); other attributes come from the pickled model
+class OnnxModel:
+  def __init__(self, session, model, preprocessor):
+      self.session = session
+      self.model = model
+      self.preprocessor = preprocessor
+
+  def _run(self, input_df):
+      inputs = self.session.get_inputs()
+      if self.preprocessor['kind'] == 'text':
+          texts = np.asarray(clean_texts(input_df[self.preprocessor['text_column']]), dtype=object)
+          return self.session.run(None, {{inputs[0].name: texts.reshape(-1, 1)}})
+      # One input per column, in the preprocessor's column order (input names are sanitized)
+      feeds = {{}}
+      for graph_input, column in zip(inputs, self.preprocessor['columns']):
+          if graph_input.type == 'tensor(string)':
+              values = input_df[column].fillna('').astype(str).to_numpy(dtype=object)
+          else:
+              values = input_df[column].to_numpy(dtype=np.float32)
+          feeds[graph_input.name] = values.reshape(-1, 1)
+      return self.session.run(None, feeds)
+
+  def predict(self, X):
+      return self._run(X)[0]
+
+  def predict_proba(self, X):
+      return self._run(X)[1]
+
+  def __getattr__(self, name):
+      return getattr(self.model, name)
+
+# Load the model from file (once per server process, shared by every session and rerun)
+@st.cache_resource
 def load_model():
+  with open('best_model.pkl', 'rb') as f:
+      model = pickle.load(f)
+
+  # Prefer the compiled ONNX model (preprocessing included) when it was exported and
+  # onnxruntime is installed; its inputs are the columns listed by the preprocessor
+  preprocessor = load_preprocessor()
+  if preprocessor is not None and os.path.exists('best_model.onnx'):
+      try:
+          import onnxruntime as ort
+          session = ort.InferenceSession('best_model.onnx', providers=['CPUExecutionProvider'])
+          return OnnxModel(session, model, preprocessor)
+      except Exception as e:
+          st.info(f"Using the pickled model ({{e}})")
+  return model
+
+# Load the preprocessing fitted at training time (feature transformer and label encoder)
+@st.cache_resource
+def load_preprocessor():
+  if not os.path.exists('preprocessor.pkl'):
+      return None
   try:
-      with open('best_model.pkl', 'rb') as f:
-          model = pickle.load(f)
-      return model
+      with open('preprocessor.pkl', 'rb') as f:
+          return pickle.load(f)
   except Exception as e:
-      st.error(f"Error loading model: {{e}}")
+      st.warning(f"Error loading preprocessor: {{e}}")
       return None
 
+# Text cleaning used at training time for text datasets
+def clean_texts(texts):
+  import re
+  import nltk
+  from nltk.corpus import stopwords
+  from nltk.stem import PorterStemmer, WordNetLemmatizer
+  nltk.download('stopwords', quiet=True)
+  nltk.download('wordnet', quiet=True)
+  ps = PorterStemmer()
+  lemmatizer = WordNetLemmatizer()
+  all_stopwords = set(stopwords.words('english'))
+  corpus = []
+  for text in texts:
+      words = re.sub('[^a-zA-Z]', ' ', str(text)).lower().split()
+      corpus.append(' '.join(lemmatizer.lemmatize(ps.stem(word)) for word in words if word not in all_stopwords))
+  return corpus
+
+# Turn a batch of raw rows into the model's feature matrix (one transform call per batch);
+# the ONNX model preprocesses the raw rows itself
+def prepare_features(model, preprocessor, input_df):
+  if preprocessor is None or isinstance(model, OnnxModel):
+      return input_df
+  if preprocessor['kind'] == 'text':
+      X = preprocessor['transformer'].transform(clean_texts(input_df[preprocessor['text_column']]))
+  else:
+      X = preprocessor['transformer'].transform(input_df[preprocessor['columns']])
+  return X.toarray() if hasattr(X, 'toarray') else X
+
+# Map encoded class ids back to the original labels
+def decode_labels(preprocessor, labels):
+  encoder = preprocessor.get('label_encoder') if preprocessor else None
+  if encoder is None:
+      return labels
+  return encoder.inverse_transform(np.asarray(labels).astype(int))
+
 # Streamlit UI for predictions
 def main():
   st.title("Model Prediction App")
   
-  model = load_model()
-  if not model:
+  try:
+      model = load_model()
+  except Exception as e:
+      st.error(f"Error loading model: {{e}}")
       st.stop()
+  preprocessor = load_preprocessor()
   
   # Display information about the model
   st.write("## Model Information")
-  model_type = type(model).__name__
-  st.write(f"Model type: {{model_type}}")
+  model_type = type(getattr(model, 'model', model)).__name__
+  runtime = "ONNX Runtime" if isinstance(model, OnnxModel) else "scikit-learn"
+  st.write(f"Model type: {{model_type}} ({{runtime}})")
   
   # Create input fields for each feature
   st.write("## Enter Feature Values")
   
-  # Get user inputs
-  user_inputs = {{
+  # Get user inputs (raw values; the training-time preprocessing is applied on prediction)
+  if preprocessor is not None and preprocessor['kind'] == 'text':
+      user_inputs = {{preprocessor['text_column']: st.text_area('Enter text')}}
+  elif preprocessor is not None:
+      user_inputs = {{}}
+      for column in preprocessor['columns']:
+          if column in preprocessor['categories']:
+              user_inputs[column] = st.selectbox(f'Select {{column}}', preprocessor['categories'][column])
+          else:
+              user_inputs[column] = st.number_input(f'Enter {{column}}', value=0.0)
+  else:
+      user_inputs = {{
 {feature_list}
-  }}
+      }}
   
   # Predict the output
   if st.button("Predict"):
       try:
           # Create a DataFrame with the input values
           input_df = pd.DataFrame([user_inputs])
+          X = prepare_features(model, preprocessor, input_df)
           
           # Make prediction
-          prediction = model.predict(input_df)
+          prediction = decode_labels(preprocessor, model.predict(X))
           
           # Display the prediction
           st.write("## Prediction Result")
@@ -211,9 +291,9 @@ def main():
               # If model has predict_proba method, show probabilities
               if hasattr(model, 'predict_proba'):
                   try:
-                      proba = model.predict_proba(input_df)
+                      proba = model.predict_proba(X)
                       st.write("### Class Probabilities")
-                      for i, class_name in enumerate(model.classes_):
+                      for i, class_name in enumerate(decode_labels(preprocessor, model.classes_)):
                           st.write(f"{{class_name}}: {{proba[0][i]:.4f}}")
                   except:
                       pass
@@ -223,6 +303,29 @@ def main():
               
       except Exception as e:
           st.error(f"Error making prediction: {{e}}")
+  
+  # Batch predictions for a CSV file with one row per sample
+  st.write("## Batch Predictions")
+  uploaded_file = st.file_uploader("Upload a CSV file with the feature columns", type=["csv"])
+  if uploaded_file is not None:
+      try:
+          input_df = pd.read_csv(uploaded_file)
+          
+          # One transform and one model call for all rows
+          X = prepare_features(model, preprocessor, input_df)
+          results = input_df.copy()
+          if hasattr(model, 'classes_') and hasattr(model, 'predict_proba'):
+              # The most probable class is the prediction, so the model runs once
+              proba = np.asarray(model.predict_proba(X))
+              results['prediction'] = decode_labels(preprocessor, np.asarray(model.classes_)[proba.argmax(axis=1)])
+              results['confidence'] = proba.max(axis=1)
+          else:
+              results['prediction'] = decode_labels(preprocessor, model.predict(X))
+          
+          st.dataframe(results)
+          st.download_button("Download predictions", results.to_csv(index=False), file_name="predictions.csv", mime="text/csv")
+      except Exception as e:
+          st.error(f"Error making batch predictions: {{e}}")
 
 if __name__ == "__main__":
   main()
@@ -265,7 +368,7 @@ if __name__ == "__main__":
     
     return load_model_path
 
-def write_requirements_file(downloads_dir, is_tensorflow=False, is_yolo=False):
+def write_requirements_file(downloads_dir, is_tensorflow=False, is_yolo=False, is_onnx=False, is_nlp=False):
     """Write the requirements.txt file with the necessary dependencies"""
     base_requirements = """
 streamlit
@@ -295,6 +398,18 @@ pillow
         requirements = base_requirements + yolo_requirements
     else:
         requirements = base_requirements
+
+    # Text cleaning of the saved preprocessing
+    if is_nlp:
+        requirements += """
+nltk
+"""
+
+    # Runtime for the exported ONNX model
+    if is_onnx:
+        requirements += """
+onnxruntime
+"""
     
     # Create a temporary file
     temp_dir = tempfile.gettempdir()
@@ -333,136 +448,48 @@ pillow
     
     return requirements_path
 
-def create_project_zip(model_file, models_dir, downloads_dir, is_image_model=False, is_object_detection=False):
-    """Create a ZIP file with the model and necessary files, replacing any existing ones"""
-    # Create a temporary directory for building the zip
-    temp_dir = tempfile.mkdtemp()
-    
-    # Determine if we're using database storage
-    is_database_models = 'ml_system' in models_dir
-    is_database_downloads = 'ml_system' in downloads_dir
-    
-    try:
-        # Clear old zip files from the downloads directory
-        if is_database_downloads:
-            # Extract directory name
-            parts = downloads_dir.replace('\\', '/').strip('/').split('/')
-            idx = parts.index('ml_system')
-            if idx + 1 < len(parts):
-                downloads_dir_name = parts[idx + 1]
-            else:
-                downloads_dir_name = 'downloads'
-            
-            # Get list of existing zip files
-            existing_files = db_fs.list_files(downloads_dir_name)
-            for filename in existing_files:
-                if filename.endswith('.zip'):
-                    db_fs.delete_file(filename, downloads_dir_name)
-                    print(f"Removed old zip file from database: {filename}")
-        else:
-            # Standard filesystem cleanup
-            for item in os.listdir(downloads_dir):
-                if item.endswith('.zip'):
-                    try:
-                        os.remove(os.path.join(downloads_dir, item))
-                        print(f"Removed old zip file: {item}")
-                    except Exception as e:
-                        print(f"Error removing old zip file {item}: {e}")
-        
-        # Generate unique ID for the download
-        download_id = str(uuid.uuid4())
-        temp_zip_path = os.path.join(temp_dir, f"project_{download_id}.zip")
-        
-        # Create the ZIP file
-        with zipfile.ZipFile(temp_zip_path, 'w') as zipf:
-            # Add the model file
-            if is_database_models:
-                # Extract directory name
-                parts = models_dir.replace('\\', '/').strip('/').split('/')
-                idx = parts.index('ml_system')
-                if idx + 1 < len(parts):
-                    models_dir_name = parts[idx + 1]
-                else:
-                    models_dir_name = 'models'
-                
-                # Get the model from database
-                try:
-                    model_content = db_fs.get_file(model_file, models_dir_name)
-                    # Save to a temporary file
-                    temp_model_path = os.path.join(temp_dir, model_file)
-                    with open(temp_model_path, 'wb') as f:
-                        f.write(model_content)
-                    # Add to zip
-                    zipf.write(temp_model_path, arcname=model_file)
-                except Exception as e:
-                    print(f"Error getting model file from database: {e}")
-            else:
-                # Standard filesystem
-                model_path = os.path.join(models_dir, model_file)
-                if os.path.exists(model_path):
-                    zipf.write(model_path, arcname=model_file)
-            
-            # Add the load_model.py file
-            if is_database_downloads:
-                # Extract directory name
-                parts = downloads_dir.replace('\\', '/').strip('/').split('/')
-                idx = parts.index('ml_system')
-                if idx + 1 < len(parts):
-                    downloads_dir_name = parts[idx + 1]
-                else:
-                    downloads_dir_name = 'downloads'
-                
-                # Get the file from database
-                try:
-                    content = db_fs.get_file("load_model.py", downloads_dir_name)
-                    # Save to a temporary file
-                    temp_file_path = os.path.join(temp_dir, "load_model.py")
-                    with open(temp_file_path, 'wb') as f:
-                        f.write(content)
-                    # Add to zip
-                    zipf.write(temp_file_path, arcname="load_model.py")
-                except Exception as e:
-                    print(f"Error getting load_model.py from database: {e}")
-            else:
-                # Standard filesystem
-                load_model_path = os.path.join(downloads_dir, "load_model.py")
-                if os.path.exists(load_model_path):
-                    zipf.write(load_model_path, arcname="load_model.py")
-            
-            # Add the requirements.txt file
-            if is_database_downloads:
-                # Get the file from database
-                try:
-                    content = db_fs.get_file("requirements.txt", downloads_dir_name)
-                    # Save to a temporary file
-                    temp_file_path = os.path.join(temp_dir, "requirements.txt")
-                    with open(temp_file_path, 'wb') as f:
-                        f.write(content)
-                    # Add to zip
-                    zipf.write(temp_file_path, arcname="requirements.txt")
-                except Exception as e:
-                    print(f"Error getting requirements.txt from database: {e}")
-            else:
-                # Standard filesystem
-                requirements_path = os.path.join(downloads_dir, "requirements.txt")
-                if os.path.exists(requirements_path):
-                    zipf.write(requirements_path, arcname="requirements.txt")
-            
-            # Add a README file
-            readme_content = "# Machine Learning Project\n\n"
-            readme_content += "This project contains a trained machine learning model and code to use it.\n\n"
-            readme_content += "## Files\n\n"
-            readme_content += f"- {model_file}: The trained model\n"
-            readme_content += "- load_model.py: Code to load and use the model\n"
-            readme_content += "- requirements.txt: Required Python packages\n\n"
-            readme_content += "## Usage\n\n"
-            readme_content += "1. Install the required packages: `pip install -r requirements.txt`\n"
-            readme_content += "2. Run the app: `streamlit run load_model.py`\n"
-            
-            zipf.writestr("README.md", readme_content)
-            
-            # Add a setup script
-            setup_script = """import subprocess
+# Already compressed formats (.keras and .pt are zip archives) are stored as-is;
+# deflating them again costs time and saves nothing
+STORED_EXTENSIONS = ('.keras', '.pt', '.zip', '.h5', '.onnx', '.jpg', '.jpeg', '.png')
+
+# Deflate level for text files (small, compress well) and for other binaries such as pickles
+TEXT_EXTENSIONS = ('.py', '.txt', '.md', '.json', '.yaml', '.yml', '.csv')
+TEXT_COMPRESSLEVEL = 9
+BINARY_COMPRESSLEVEL = 6
+
+# Entries above this size are written with zip64 headers (size is not known to ZipFile up front)
+ZIP64_THRESHOLD = 2 ** 31 - 1
+
+# Version of the bundle layout (README, setup script, file set); bump it when they change
+# so cached bundles built with the old layout are not served again
+BUNDLE_TEMPLATE_VERSION = 1
+
+# Number of project bundles kept in the downloads directory (least recently used are removed)
+BUNDLE_KEEP = int(os.getenv('BUNDLE_KEEP', '10'))
+
+README_TEMPLATE = """# Machine Learning Project
+
+This project contains a trained machine learning model and code to use it.
+
+## Files
+
+- {model_file}: The trained model
+{extra_files}- load_model.py: Code to load and use the model
+- requirements.txt: Required Python packages
+
+## Usage
+
+1. Install the required packages: `pip install -r requirements.txt`
+2. Run the app: `streamlit run load_model.py`
+"""
+
+# README lines for the optional files next to the model
+MODEL_FILE_DESCRIPTIONS = {
+    'best_model.onnx': 'The model and its preprocessing compiled to ONNX, taking raw rows (used when onnxruntime is installed)',
+    'preprocessor.pkl': 'Preprocessing fitted at training time (applied to raw inputs before prediction)',
+}
+
+SETUP_SCRIPT = """import subprocess
 import os
 import sys
 
@@ -470,10 +497,10 @@ def setup_venv():
     print("Setting up virtual environment...")
     # Create virtual environment
     subprocess.run([sys.executable, "-m", "venv", "venv"])
-    
+
     # Get the pip path based on OS
     pip_path = os.path.join("venv", "Scripts", "pip") if os.name == "nt" else os.path.join("venv", "bin", "pip")
-    
+
     # Install packages
     subprocess.run([pip_path, "install", "-r", "requirements.txt"])
     print("Virtual environment setup complete!")
@@ -481,31 +508,258 @@ def setup_venv():
 if __name__ == "__main__":
     setup_venv()
 """
-            zipf.writestr("setup_env.py", setup_script)
-        
-        # Now save the zip file to the database or filesystem
-        if is_database_downloads:
-            # Save to database
-            zip_filename = f"project_{download_id}.zip"
-            db_fs.save_file(temp_zip_path, downloads_dir_name)
-            print(f"Created new zip file in database: {zip_filename}")
-            # Return logical path
-            zip_path = os.path.join(downloads_dir, zip_filename)
+
+
+def _db_dir_name(path, default):
+    """Database directory name of an ml_system path, or None for a filesystem path"""
+    if 'ml_system' not in path:
+        return None
+    parts = path.replace('\\', '/').strip('/').split('/')
+    idx = parts.index('ml_system')
+    return parts[idx + 1] if idx + 1 < len(parts) else default
+
+
+def _compression_for(arcname):
+    """(compress_type, compresslevel) for a zip entry, by file type"""
+    lower = arcname.lower()
+    if lower.endswith(STORED_EXTENSIONS):
+        return zipfile.ZIP_STORED, None
+    if lower.endswith(TEXT_EXTENSIONS):
+        return zipfile.ZIP_DEFLATED, TEXT_COMPRESSLEVEL
+    return zipfile.ZIP_DEFLATED, BINARY_COMPRESSLEVEL
+
+
+class _ChunkBuffer:
+    """Write-only file object that collects zip output until the generator hands it out"""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._size
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _entry_chunks(source):
+    """Byte chunks of a bundle entry source: ('db', filename, dir), ('file', path) or ('bytes', content)"""
+    kind = source[0]
+    if kind == 'db':
+        yield from db_fs.read_chunks(source[1], source[2])
+    elif kind == 'file':
+        with open(source[1], 'rb') as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    else:
+        yield source[1]
+
+
+def _entry_size(source):
+    kind = source[0]
+    if kind == 'db':
+        info = db_fs.file_info(source[1], source[2])
+        return info['size'] if info else 0
+    if kind == 'file':
+        return os.path.getsize(source[1])
+    return len(source[1])
+
+
+def iter_zip(entries):
+    """
+    Write a zip archive as a stream of byte chunks.
+
+    Each entry is copied chunk by chunk (from the database, a file or memory) into
+    ZipFile.open(name, 'w'), and the archive bytes are yielded as they are produced, so
+    they can go straight into a database write or an HTTP response.
+
+    A source that cannot be read raises instead of leaving a truncated entry behind;
+    missing files are left out by project_zip_entries before the archive is started.
+
+    Parameters:
+    entries: List of (arcname, source) with source ('db', filename, dir), ('file', path) or ('bytes', content)
+
+    Yields:
+    Chunks of the zip archive
+    """
+    buf = _ChunkBuffer()
+    with zipfile.ZipFile(buf, 'w') as zipf:
+        for arcname, source in entries:
+            zipf.compression, zipf.compresslevel = _compression_for(arcname)
+            force_zip64 = _entry_size(source) > ZIP64_THRESHOLD
+            with zipf.open(arcname, 'w', force_zip64=force_zip64) as dest:
+                for chunk in _entry_chunks(source):
+                    dest.write(chunk)
+                    data = buf.drain()
+                    if data:
+                        yield data
+            data = buf.drain()
+            if data:
+                yield data
+    # Central directory
+    data = buf.drain()
+    if data:
+        yield data
+
+
+def project_zip_entries(model_file, models_dir, downloads_dir, extra_files=None):
+    """
+    Files of a project bundle as (arcname, source) entries for iter_zip
+
+    extra_files are further files from the models directory (e.g. the ONNX model and the
+    fitted preprocessing), listed in the README with their MODEL_FILE_DESCRIPTIONS entry.
+    """
+    models_dir_name = _db_dir_name(models_dir, 'models')
+    downloads_dir_name = _db_dir_name(downloads_dir, 'downloads')
+
+    def source(filename, dir_path, dir_name):
+        if dir_name is not None:
+            if db_fs.file_exists(filename, dir_name):
+                return ('db', filename, dir_name)
+            print(f"Error getting {filename} from database: not found")
+            return None
+        path = os.path.join(dir_path, filename)
+        return ('file', path) if os.path.exists(path) else None
+
+    extra_files = list(extra_files or [])
+    extra_lines = ''.join(f"- {filename}: {MODEL_FILE_DESCRIPTIONS.get(filename, 'Model file')}\n"
+                          for filename in extra_files)
+    entries = [(model_file, source(model_file, models_dir, models_dir_name))]
+    entries += [(filename, source(filename, models_dir, models_dir_name)) for filename in extra_files]
+    entries += [
+        ("load_model.py", source("load_model.py", downloads_dir, downloads_dir_name)),
+        ("requirements.txt", source("requirements.txt", downloads_dir, downloads_dir_name)),
+        ("README.md", ('bytes', README_TEMPLATE.format(model_file=model_file, extra_files=extra_lines).encode('utf-8'))),
+        ("setup_env.py", ('bytes', SETUP_SCRIPT.encode('utf-8'))),
+    ]
+    return [(arcname, src) for arcname, src in entries if src is not None]
+
+
+def _source_digest(source):
+    """sha256 of a bundle entry source: the stored content hash for database files, otherwise read in chunks"""
+    if source[0] == 'db':
+        stored = db_fs.content_hash(source[1], source[2])
+        if stored is not None:
+            return stored
+    h = hashlib.sha256()
+    for chunk in _entry_chunks(source):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def bundle_key(entries):
+    """
+    Content address of a project bundle.
+
+    The key covers the model bytes, the generated loader code, the requirements set
+    (order and blank lines ignored) and BUNDLE_TEMPLATE_VERSION, so an unchanged
+    model/loader/requirements combination always maps to the same bundle.
+    """
+    h = hashlib.sha256(f"bundle-v{BUNDLE_TEMPLATE_VERSION}".encode('utf-8'))
+    for arcname, source in entries:
+        if arcname == "requirements.txt":
+            content = b''.join(_entry_chunks(source)).decode('utf-8', errors='replace')
+            requirements = sorted({line.strip() for line in content.splitlines() if line.strip()})
+            digest = hashlib.sha256('\n'.join(requirements).encode('utf-8')).hexdigest()
         else:
-            # Save to filesystem
-            zip_path = os.path.join(downloads_dir, f"project_{download_id}.zip")
-            os.makedirs(os.path.dirname(zip_path), exist_ok=True)
-            import shutil
-            shutil.copy2(temp_zip_path, zip_path)
-            print(f"Created new zip file: {os.path.basename(zip_path)}")
-        
+            digest = _source_digest(source)
+        h.update(f"{arcname}\0{digest}\0".encode('utf-8'))
+    return h.hexdigest()
+
+
+def bundle_etag(filename):
+    """ETag of a content-addressed bundle (its key), or None for other files"""
+    if filename.startswith('project_') and filename.endswith('.zip'):
+        key = filename[len('project_'):-len('.zip')]
+        if len(key) == 32 and all(c in '0123456789abcdef' for c in key):
+            return key
+    return None
+
+
+def _prune_bundles(downloads_dir, downloads_dir_name, keep_filename):
+    """Remove the least recently used bundles beyond BUNDLE_KEEP (reuse touches a bundle)"""
+    try:
+        if downloads_dir_name is not None:
+            bundles = [(f, (db_fs.file_info(f, downloads_dir_name) or {}).get('updated_at') or '')
+                       for f in db_fs.list_files(downloads_dir_name) if f.endswith('.zip')]
+        else:
+            bundles = [(f, os.path.getmtime(os.path.join(downloads_dir, f)))
+                       for f in os.listdir(downloads_dir) if f.endswith('.zip')]
+        bundles.sort(key=lambda b: b[1], reverse=True)
+        for filename, _ in bundles[BUNDLE_KEEP:]:
+            if filename == keep_filename:
+                continue
+            if downloads_dir_name is not None:
+                db_fs.delete_file(filename, downloads_dir_name)
+            else:
+                os.remove(os.path.join(downloads_dir, filename))
+            print(f"Removed old zip file: {filename}")
+    except Exception as e:
+        print(f"Error pruning old zip files: {e}")
+
+
+def create_project_zip(model_file, models_dir, downloads_dir, is_image_model=False, is_object_detection=False, extra_files=None):
+    """
+    Create (or reuse) a ZIP file with the model and necessary files
+
+    Bundles are content addressed: project_<key>.zip, with the key from bundle_key. When a
+    bundle for the same model, loader code and requirements already exists it is returned
+    as is; otherwise the archive is streamed from the stored files into its destination
+    (database or filesystem) without staging copies in a temporary directory.
+    """
+    downloads_dir_name = _db_dir_name(downloads_dir, 'downloads')
+    entries = project_zip_entries(model_file, models_dir, downloads_dir, extra_files)
+    zip_filename = f"project_{bundle_key(entries)[:32]}.zip"
+    zip_path = os.path.join(downloads_dir, zip_filename)
+
+    if downloads_dir_name is not None:
+        exists = db_fs.file_exists(zip_filename, downloads_dir_name)
+    else:
+        exists = os.path.exists(zip_path)
+    if exists:
+        # Mark the bundle as recently used, so pruning removes bundles nobody asks for first
+        if downloads_dir_name is not None:
+            db_fs.touch(zip_filename, downloads_dir_name)
+        else:
+            os.utime(zip_path)
+        print(f"Reusing cached zip file: {zip_filename}")
         return zip_path
-    
-    finally:
-        # Clean up temporary directory
-        import shutil
+
+    chunks = iter_zip(entries)
+    if downloads_dir_name is not None:
+        # save_chunks spools the whole archive before it writes the row, so a failed
+        # entry raises before anything is stored under the bundle name
+        db_fs.save_chunks(chunks, zip_filename, downloads_dir_name)
+        print(f"Created new zip file in database: {zip_filename}")
+    else:
+        os.makedirs(downloads_dir, exist_ok=True)
+        # Write under a temporary name so a half-written bundle is never served
+        partial_path = zip_path + '.partial'
         try:
-            shutil.rmtree(temp_dir)
-        except Exception as e:
-            print(f"Error cleaning up temporary directory: {e}")
+            with open(partial_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(partial_path, zip_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        print(f"Created new zip file: {zip_filename}")
+
+    _prune_bundles(downloads_dir, downloads_dir_name, zip_filename)
 
+    # Return logical path
+    return zip_path
@@ -2,50 +2,20 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
-from io import BytesIO
-import base64
-import os
 import yaml
 import cv2
 from matplotlib.colors import LinearSegmentedColormap
-import matplotlib.patheffects as path_effects
 from PIL import Image
 import glob
 import pandas as pd
-import tempfile
-import zipfile
-from db_file_system import DBFileSystem
-import shutil
-# Initialize database file system
-db_fs = DBFileSystem()
+from render_pool import task, render_tasks
+from figure_encoding import encode_figure, image_fields
+from figure_theme import (PURPLE_DARK, PURPLE_PRIMARY, PURPLE_SECONDARY, PURPLE_ACCENT,
+                          PURPLE_LIGHT, PURPLE_BG, apply_theme, style_axes, glow, outline)
 
-try:
-    import google.generativeai as genai
-    import os
-    from dotenv import load_dotenv
-    
-    GEMINI_AVAILABLE = True
-    
-    # Load environment variables from .env.local file
-    load_dotenv()
-    
-    # Configure Gemini API with key from environment variables
-    api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY not found in .env.local file")
-    
-    genai.configure(api_key=api_key)
-    
-except ImportError:
-    GEMINI_AVAILABLE = False
-# Define modern purple theme colors (matching the main visualization module)
-PURPLE_DARK = '#2D1B55'  # Dark purple background
-PURPLE_PRIMARY = '#9C27B0'  # Main purple 
-PURPLE_SECONDARY = '#BA68C8'  # Medium purple
-PURPLE_ACCENT = '#E040FB'  # Bright accent purple
-PURPLE_LIGHT = '#E1BEE7'  # Light purple
-PURPLE_BG = '#13111C'  # Very dark purple/black background
+# The dataset, run index, label index and explanation modules (database connections, the
+# explanation client) are imported inside the functions that use them: render workers
+# import this module for its renderers only
 
 # Create custom purple color maps
 purple_cmap = LinearSegmentedColormap.from_list('custom_purple', 
@@ -55,199 +25,48 @@ diverging_purple = LinearSegmentedColormap.from_list('diverging_purple',
                                                   ['#6A1B9A', '#9C27B0', '#CE93D8', '#F3E5F5'], 
                                                   N=256)
 
-def apply_modern_style():
-    """Apply modern styling to all matplotlib plots"""
-    plt.style.use('dark_background')
-    
-    # Set custom styling for all plots
-    plt.rcParams['figure.facecolor'] = PURPLE_BG
-    plt.rcParams['axes.facecolor'] = PURPLE_BG
-    plt.rcParams['axes.edgecolor'] = PURPLE_SECONDARY
-    plt.rcParams['axes.labelcolor'] = PURPLE_LIGHT
-    plt.rcParams['xtick.color'] = PURPLE_LIGHT
-    plt.rcParams['ytick.color'] = PURPLE_LIGHT
-    plt.rcParams['text.color'] = PURPLE_LIGHT
-    plt.rcParams['grid.color'] = PURPLE_DARK
-    plt.rcParams['grid.linestyle'] = '--'
-    plt.rcParams['grid.linewidth'] = 0.5
-    plt.rcParams['figure.figsize'] = (10, 6)
-    plt.rcParams['font.family'] = 'sans-serif'
-    plt.rcParams['font.size'] = 12
-    
-    # Set Seaborn style
-    sns.set_style("darkgrid", {
-        'axes.facecolor': PURPLE_BG,
-        'axes.edgecolor': PURPLE_SECONDARY,
-        'axes.grid': True,
-        'grid.color': PURPLE_DARK,
-        'grid.linestyle': '--',
-    })
-
-def add_style_to_plot(fig, ax, title, xlabel=None, ylabel=None):
-    """Add consistent modern styling to a plot"""
-    # Add title with glowing effect
-    title_obj = ax.set_title(title, fontsize=18, fontweight='bold', color=PURPLE_LIGHT, pad=20)
-    title_obj.set_path_effects([path_effects.Stroke(linewidth=2, foreground=PURPLE_ACCENT, alpha=0.5),
-                              path_effects.Normal()])
-    
-    # Set axis labels
-    if xlabel:
-        ax.set_xlabel(xlabel, fontsize=14, color=PURPLE_LIGHT, labelpad=10)
-    if ylabel:
-        ax.set_ylabel(ylabel, fontsize=14, color=PURPLE_LIGHT, labelpad=10)
-    
-    # Add subtle grid
-    ax.grid(color=PURPLE_DARK, linestyle='--', linewidth=0.5, alpha=0.5)
-    
-    # Style spine colors
-    for spine in ax.spines.values():
-        spine.set_edgecolor(PURPLE_SECONDARY)
-        spine.set_linewidth(1.5)
-    
-    # Add a subtle glow effect around the plot edges
-    fig.patch.set_alpha(0.9)
-    
-    # Make tick labels more visible
-    ax.tick_params(colors=PURPLE_LIGHT, labelsize=12)
-    
-    # Add a subtle background gradient
-    gradient = np.linspace(0, 1, 100).reshape(-1, 1)
-    ax.imshow(gradient, aspect='auto', extent=[ax.get_xlim()[0], ax.get_xlim()[1], 
-                                              ax.get_ylim()[0], ax.get_ylim()[1]],
-             cmap=LinearSegmentedColormap.from_list('bg_gradient', 
-                                                  [PURPLE_BG, PURPLE_DARK]),
-             alpha=0.1, zorder=-1)
-
 def fig_to_base64(fig):
-    """Convert matplotlib figure to base64 encoded string with improved quality"""
-    buf = BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight', dpi=150, 
-               facecolor=PURPLE_BG, edgecolor=PURPLE_SECONDARY)
-    buf.seek(0)
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    return img_str
+    """Encode a matplotlib figure in the configured format (base64, or a URL when stored in the database)"""
+    return encode_figure(fig, facecolor=PURPLE_BG, edgecolor=PURPLE_SECONDARY)
 
-def get_gemini_explanation(data, prompt):
-    """Get AI-generated explanation for visualizations using Gemini model"""
-    if GEMINI_AVAILABLE:
-        try:
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Unable to generate explanation: {str(e)}"
-    else:
-        return "AI explanations not available (Gemini API not installed)"
-
-def read_yolo_metrics_from_runs():
+def read_yolo_metrics_from_runs(run_id=None):
     """
-    Directly reads YOLO metrics from the results.csv file in the runs folder,
-    with a fallback to hardcoded values from the training log if file reading fails
+    Read YOLO metrics for a training run from the run index in the database.
+    Uses the most recent run when run_id is None; returns an empty dict if no run was recorded.
     """
-    import os
-    import pandas as pd
-    import glob
-    
-    metrics_info = {}
-    
-    # Set the exact path to your runs directory
-    runs_dir = r"C:\Users\parth sawant\Desktop\final\nebula\ml_system\runs"
-    
-    try:
-        # Look for results.csv files
-        results_files = glob.glob(os.path.join(runs_dir, '**/results.csv'), recursive=True)
-        
-        if results_files:
-            # Sort by modification time to get the most recent
-            results_files.sort(key=os.path.getmtime, reverse=True)
-            results_path = results_files[0]
-            
-            print(f"Found results.csv file at: {results_path}")
-            
-            # Read the CSV file
-            if os.path.exists(results_path):
-                metrics_df = pd.read_csv(results_path)
-                
-                if not metrics_df.empty:
-                    # Get the last row for final metrics
-                    metrics = metrics_df.iloc[-1].to_dict()
-                    
-                    # Check for mAP, precision, and recall columns
-                    for key in metrics.keys():
-                        if 'map50-95' in key.lower() or 'map@.5:.95' in key.lower():
-                            metrics_info['mAP50-95'] = float(metrics[key])
-                        elif 'map50' in key.lower() or 'map@.5' in key.lower():
-                            metrics_info['mAP50'] = float(metrics[key])
-                        elif 'precision' in key.lower():
-                            metrics_info['precision'] = float(metrics[key])
-                        elif 'recall' in key.lower():
-                            metrics_info['recall'] = float(metrics[key])
-    except Exception as e:
-        print(f"Error reading metrics from results.csv: {e}")
-    
-    # If metrics couldn't be loaded from file, use the values from the training log
-    if not metrics_info:
-        print("Using hardcoded metrics from training log")
-        metrics_info = {
-            'mAP50-95': 0.591,
-            'mAP50': 0.804,
-            'precision': 0.878,
-            'recall': 0.658
-        }
-    
-    print(f"Final metrics being used: {metrics_info}")
+    from yolo_runs import load_run_metrics
+    run = load_run_metrics(run_id)
+    if not run:
+        print("No recorded YOLO run metrics found")
+        return {}
+    
+    metrics_info = {k: v for k, v in run.get('metrics', {}).items()
+                    if k in ('mAP50-95', 'mAP50', 'precision', 'recall')}
+    print(f"Metrics for run {run.get('run_id')}: {metrics_info}")
     return metrics_info
 
 def extract_dataset_to_temp(dataset_dir):
     """
-    Extract dataset to a temporary directory for processing visualizations
-    Returns temp_dir path if successful, None otherwise
+    Return the staged dataset directory used for visualizations.
+    The dataset is materialized once per dataset hash and shared with the YOLO trainer,
+    so nothing is extracted here if training already staged it.
+    Returns the directory path if successful, None otherwise
     """
+    from yolo_dataset import stage_yolo_dataset, release_staged_dataset
     try:
-        # Create temporary directory
-        temp_dir = tempfile.mkdtemp()
-        print(f"Created temporary directory for visualization: {temp_dir}")
-        
-        # If dataset_dir is a database path
-        if 'ml_system' in dataset_dir:
-            # Extract directory name
-            parts = dataset_dir.replace('\\', '/').strip('/').split('/')
-            idx = parts.index('ml_system')
-            if idx + 1 < len(parts):
-                dir_name = parts[idx + 1]
-                
-                # Check for yolo_dataset.zip
-                files_in_db = db_fs.list_files(dir_name)
-                print(f"Files in database: {files_in_db}")
-                
-                if 'yolo_dataset.zip' in files_in_db:
-                    print("Found yolo_dataset.zip in database, extracting...")
-                    zip_content = db_fs.get_file('yolo_dataset.zip', dir_name)
-                    temp_zip_path = os.path.join(temp_dir, 'yolo_dataset.zip')
-                    
-                    with open(temp_zip_path, 'wb') as f:
-                        f.write(zip_content)
-                    
-                    # Extract zip
-                    with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-                        zip_ref.extractall(temp_dir)
-                    
-                    print(f"Extracted dataset to {temp_dir}")
-                    print(f"Contents after extraction: {os.listdir(temp_dir)}")
-                    return temp_dir
-        
-        # If we're here, either not a database path or no zip found
-        # Just return the original dataset_dir
-        return dataset_dir
-    
+        staged = stage_yolo_dataset(dataset_dir)
+        # Only the path is returned, so nothing holds a lease on it
+        release_staged_dataset(staged)
+        return staged['root']
     except Exception as e:
-        print(f"Error extracting dataset: {e}")
-        # Clean up
-        if 'temp_dir' in locals() and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        print(f"Error staging dataset: {e}")
         return None
 
+def _render_styled(create_func, *args):
+    """Apply the purple theme (per process) and build one visualization"""
+    apply_theme()
+    return create_func(*args)
+
 def create_object_detection_visualization(model_dir, dataset_dir, model_info, user_prompt=None):
     """
     Create visualizations specific to object detection models
@@ -261,29 +80,36 @@ def create_object_detection_visualization(model_dir, dataset_dir, model_info, us
     Returns:
     List of visualizations with base64 encoded images
     """
-    visualizations = []
-    apply_modern_style()  # Apply the purple theme styling
-    
     # If no user prompt was provided
     if user_prompt is None:
         user_prompt = "object detection task"
     
-    # Extract dataset to a temporary directory for processing (from database if needed)
-    extracted_dir = extract_dataset_to_temp(dataset_dir)
-    if extracted_dir:
-        dataset_dir = extracted_dir
-        print(f"Using directory for visualizations: {dataset_dir}")
+    from yolo_dataset import stage_yolo_dataset, release_staged_dataset
     
-    # Get data.yaml path
-    yaml_files = [f for f in os.listdir(dataset_dir) if f.endswith('.yaml')]
-    if not yaml_files:
+    # Use the staged dataset shared with the trainer (materialized from the database once)
+    try:
+        staged = stage_yolo_dataset(dataset_dir)
+    except Exception as e:
         return [{
             'title': 'Error',
-            'image': create_error_visualization("No data.yaml file found in dataset directory"),
-            'explanation': "Unable to create visualizations because the data.yaml file is missing."
+            'image': create_error_visualization(f"Error staging dataset: {str(e)}"),
+            'explanation': "Unable to create visualizations because the dataset or its data.yaml file is missing."
         }]
     
-    yaml_path = os.path.join(dataset_dir, yaml_files[0])
+    try:
+        return _visualize_staged_dataset(staged, model_dir, model_info, user_prompt)
+    finally:
+        # The staged dataset may be pruned once no job reads it
+        release_staged_dataset(staged)
+
+def _visualize_staged_dataset(staged, model_dir, model_info, user_prompt):
+    """Render the object detection visualizations from a staged dataset"""
+    from yolo_labels import load_label_index, class_counts as label_class_counts, sample_images
+    from explanation_service import attach_explanations
+    
+    dataset_dir = staged['root']
+    yaml_path = staged['data_yaml']
+    print(f"Using directory for visualizations: {dataset_dir}")
     
     # Load class names from yaml
     try:
@@ -305,49 +131,41 @@ def create_object_detection_visualization(model_dir, dataset_dir, model_info, us
             'explanation': f"Unable to load class information from data.yaml: {str(e)}"
         }]
     
-    # 1. Create mAP metrics visualization
+    # Class counts and sample boxes come from the label index (built once at ingestion)
     try:
-        metrics_vis = create_metrics_visualization(model_info, class_names, user_prompt)
-        visualizations.append(metrics_vis)
+        label_index = load_label_index(dataset_dir)
+        counts = label_class_counts(label_index, class_names) if len(label_index['label_files']) else None
+        samples = sample_images(label_index, dataset_dir, count=4) if len(label_index['label_files']) else None
     except Exception as e:
-        print(f"Error creating metrics visualization: {e}")
-    
-    # 2. Create class distribution visualization
-    try:
-        distribution_vis = create_class_distribution_visualization(dataset_dir, class_names, user_prompt)
-        visualizations.append(distribution_vis)
-    except Exception as e:
-        print(f"Error creating class distribution visualization: {e}")
-
-    # 3. Create sample images with detections (if available)
-    try:
-        samples_vis = create_sample_detections_visualization(dataset_dir, class_names, user_prompt)
-        visualizations.append(samples_vis)
-    except Exception as e:
-        print(f"Error creating sample detections visualization: {e}")
+        print(f"Error loading label index: {e}")
+        counts, samples = None, None
+    
+    # Each visualization only needs class counts, sample boxes, class names and model_info,
+    # so they are rendered (with their explanations) in parallel on the render process pool.
+    # They are always rendered as images: with FIGURE_FORMAT=data they fall back to PNG
+    tasks = [
+        # 1. mAP metrics visualization
+        task(_render_styled, create_metrics_visualization, model_info, class_names, user_prompt),
+        # 2. Class distribution visualization
+        task(_render_styled, create_class_distribution_visualization, counts, class_names, user_prompt),
+        # 3. Sample images with detections (if available)
+        task(_render_styled, create_sample_detections_visualization, samples, class_names, user_prompt),
+        # 4. Model architecture visualization
+        task(_render_styled, create_model_architecture_visualization, model_dir, user_prompt),
+        # 5. Confusion matrix visualization (or placeholder if not available)
+        task(_render_styled, create_confusion_matrix_visualization, model_info, class_names, user_prompt),
+    ]
     
-    # 4. Create model architecture visualization
-    try:
-        arch_vis = create_model_architecture_visualization(model_dir, user_prompt)
-        visualizations.append(arch_vis)
-    except Exception as e:
-        print(f"Error creating model architecture visualization: {e}")
+    # Failed visualizations come back as None and are left out
+    visualizations = [vis for vis in render_tasks(tasks) if vis is not None]
     
-    # 5. Create confusion matrix visualization (or placeholder if not available)
-    try:
-        confusion_vis = create_confusion_matrix_visualization(model_info, class_names, user_prompt)
-        visualizations.append(confusion_vis)
-    except Exception as e:
-        print(f"Error creating confusion matrix visualization: {e}")
+    # Explanations are requested here rather than in the render workers, so all of them
+    # go through one rate limit and cache
+    requests = [vis.pop('explanation_request', None) for vis in visualizations]
+    attach_explanations(visualizations, requests)
     
-    # Clean up temporary directory if we created one
-    if extracted_dir and extracted_dir != dataset_dir:
-        try:
-            import shutil
-            shutil.rmtree(extracted_dir)
-            print(f"Cleaned up temporary directory: {extracted_dir}")
-        except Exception as cleanup_error:
-            print(f"Error cleaning up temporary directory: {cleanup_error}")
+    for vis in visualizations:
+        vis.update(image_fields(vis.get('image')))
     
     return visualizations
 
@@ -380,20 +198,15 @@ def create_error_visualization(error_message):
 
 def create_metrics_visualization(model_info, class_names, user_prompt):
     """Create a visualization of object detection metrics"""
-    # Get metrics directly from the runs folder or use hardcoded values
-    runs_metrics = read_yolo_metrics_from_runs()
-    
-    # Use metrics from runs_metrics
-    metrics = runs_metrics.get('mAP50-95', 0.591)  # Default to actual value from log
-    precision = runs_metrics.get('precision', 0.878)  # Default to actual value from log
-    recall = runs_metrics.get('recall', 0.658)  # Default to actual value from log
+    # Use the metrics returned by the trainer; fall back to the recorded run in the database
+    model_info = model_info or {}
+    runs_metrics = model_info
+    if not any(k in model_info for k in ('mAP50-95', 'mAP50', 'precision', 'recall')):
+        runs_metrics = read_yolo_metrics_from_runs(model_info.get('run_id'))
     
-    # Only use placeholder values if all else fails
-    if metrics == 0.0 and precision == 0.0 and recall == 0.0:
-        print("Warning: All metrics were zero. Using placeholder values for visualization.")
-        metrics = 0.75
-        precision = 0.80
-        recall = 0.70
+    metrics = runs_metrics.get('mAP50-95', runs_metrics.get('mAP50', 0.0))
+    precision = runs_metrics.get('precision', 0.0)
+    recall = runs_metrics.get('recall', 0.0)
     
     # Create metrics display
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -412,19 +225,16 @@ def create_metrics_visualization(model_info, class_names, user_prompt):
     
     # Add glow effect to bars
     for bar in bars:
-        bar.set_path_effects([
-            path_effects.Stroke(linewidth=3, foreground=PURPLE_ACCENT, alpha=0.3),
-            path_effects.Normal()
-        ])
+        glow(bar, PURPLE_ACCENT, linewidth=3)
     
     # Add value labels on bars
     for i, (metric, value) in enumerate(metrics_dict.items()):
         ax.text(i, value + 0.02, f"{value:.3f}", ha='center', va='bottom', 
                color=PURPLE_LIGHT, fontweight='bold',
-               path_effects=[path_effects.withStroke(linewidth=3, foreground=PURPLE_BG)])
+               path_effects=outline(3, PURPLE_BG))
     
     # Add style
-    add_style_to_plot(fig, ax, 'Object Detection Performance Metrics', '', 'Score')
+    style_axes(fig, ax, 'Object Detection Performance Metrics', '', 'Score')
     
     # Add baseline at 0.5 for reference
     ax.axhline(y=0.5, linestyle='--', color=PURPLE_LIGHT, alpha=0.5, linewidth=1)
@@ -459,82 +269,38 @@ def create_metrics_visualization(model_info, class_names, user_prompt):
     How good are these values for a YOLO model?
     Provide a detailed analysis in 10-12 lines.
     """
-    explanation = get_gemini_explanation(str(metrics_dict), explanation_prompt)
+    explanation_request = (str(metrics_dict), explanation_prompt)
     
     return {
         'title': 'Performance Metrics',
         'image': metrics_img,
-        'explanation': explanation
+        'explanation': None,
+        'explanation_request': explanation_request
     }
 
-def create_class_distribution_visualization(dataset_dir, class_names, user_prompt):
-    """Create a visualization of class distribution in the dataset"""
+def create_class_distribution_visualization(counts, class_names, user_prompt):
+    """
+    Create a visualization of class distribution in the dataset
+    
+    counts: Boxes per class id from the label index, or None if the dataset has no labels
+    """
     # Make sure class_names is a dictionary
     if isinstance(class_names, list):
         class_names = {i: name for i, name in enumerate(class_names)}
     elif not isinstance(class_names, dict):
         class_names = {0: 'Object'}  # Default if invalid format
     
-    # Count class instances
-    class_counts = {class_id: 0 for class_id in class_names.keys()}
-    
-    # Find labels directory using a more robust approach
-    labels_dirs = []
-    
-    # First, look for labels directory in common locations
-    for subdir in ['train', 'training', 'valid', 'validation', 'val', 'test', 'testing']:
-        labels_path = os.path.join(dataset_dir, subdir, 'labels')
-        if os.path.exists(labels_path) and os.path.isdir(labels_path):
-            labels_dirs.append(labels_path)
-    
-    # If no labels directories found yet, do a deeper search
-    if not labels_dirs:
-        for root, dirs, _ in os.walk(dataset_dir):
-            if 'labels' in dirs:
-                labels_path = os.path.join(root, 'labels')
-                if os.path.exists(labels_path):
-                    labels_dirs.append(labels_path)
-    
-    # If still no labels directories found, check if the dataset_dir itself contains label files
-    if not labels_dirs:
-        label_files = [f for f in os.listdir(dataset_dir) if f.endswith('.txt')]
-        if label_files:
-            labels_dirs.append(dataset_dir)
-    
-    # Process label files if any labels directories were found
-    if labels_dirs:
-        for labels_dir in labels_dirs:
-            print(f"Processing labels directory: {labels_dir}")
-            
-            try:
-                for label_file in os.listdir(labels_dir):
-                    if not label_file.endswith('.txt'):
-                        continue
-                    
-                    # Process each label file
-                    label_path = os.path.join(labels_dir, label_file)
-                    with open(label_path, 'r') as f:
-                        for line in f:
-                            parts = line.strip().split()
-                            if parts and len(parts) >= 5:  # YOLO format needs at least 5 values
-                                try:
-                                    class_id = int(parts[0])
-                                    if class_id in class_counts:
-                                        class_counts[class_id] += 1
-                                    else:
-                                        class_counts[class_id] = 1
-                                except ValueError:
-                                    pass
-            except Exception as e:
-                print(f"Error processing labels in {labels_dir}: {e}")
+    if counts is not None:
+        # Count class instances
+        class_counts = {class_id: 0 for class_id in class_names.keys()}
+        class_counts.update(counts)
     else:
         print("No labels directories found in the dataset. Using class info from model_info.")
         # Use class info from model_info since we couldn't find labels
         
         # Create synthetic data for visualization
-        for class_id in class_names.keys():
-            import random
-            class_counts[class_id] = random.randint(50, 200)
+        import random
+        class_counts = {class_id: random.randint(50, 200) for class_id in class_names.keys()}
         print("Warning: No class instances found. Using placeholder values for visualization.")
     
     # Create visualization
@@ -552,8 +318,7 @@ def create_class_distribution_visualization(dataset_dir, class_names, user_promp
     
     # Create gradient colors for bars
     num_classes = len(sorted_counts)
-    cmap = plt.cm.get_cmap(purple_cmap)
-    colors = [cmap(i/max(1, num_classes-1)) for i in range(num_classes)]
+    colors = [purple_cmap(i/max(1, num_classes-1)) for i in range(num_classes)]
     
     # Create bar chart
     bars = ax.bar(
@@ -564,19 +329,16 @@ def create_class_distribution_visualization(dataset_dir, class_names, user_promp
     
     # Add glow effect to bars
     for bar in bars:
-        bar.set_path_effects([
-            path_effects.Stroke(linewidth=3, foreground=PURPLE_ACCENT, alpha=0.3),
-            path_effects.Normal()
-        ])
+        glow(bar, PURPLE_ACCENT, linewidth=3)
     
     # Add count labels on top of bars
     for i, count in enumerate(sorted_counts.values()):
         ax.text(i, count + max(sorted_counts.values())*0.02, str(count), ha='center', va='bottom', 
                color=PURPLE_LIGHT, fontweight='bold',
-               path_effects=[path_effects.withStroke(linewidth=3, foreground=PURPLE_BG)])
+               path_effects=outline(3, PURPLE_BG))
     
     # Add styling
-    add_style_to_plot(fig, ax, 'Class Distribution in Dataset', 'Class', 'Count')
+    style_axes(fig, ax, 'Class Distribution in Dataset', 'Class', 'Count')
     
     # Add class imbalance indicator
     if len(sorted_counts) > 1:
@@ -611,48 +373,30 @@ def create_class_distribution_visualization(dataset_dir, class_names, user_promp
     How might this distribution affect the model's ability to detect different objects?
     Provide a concise analysis in 10-12 lines.
     """
-    explanation = get_gemini_explanation(str(sorted_counts), explanation_prompt)
+    explanation_request = (str(sorted_counts), explanation_prompt)
     
     return {
         'title': 'Class Distribution',
         'image': class_dist_img,
-        'explanation': explanation
+        'explanation': None,
+        'explanation_request': explanation_request
     }
 
-def create_sample_detections_visualization(dataset_dir, class_names, user_prompt):
-    """Create a visualization with sample images and detection bounding boxes"""
+def create_sample_detections_visualization(samples, class_names, user_prompt):
+    """
+    Create a visualization with sample images and detection bounding boxes
+    
+    samples: (image_path, class_ids, bboxes) per sample image from the label index,
+             or None if the dataset has no labels
+    """
     # Make sure class_names is a dictionary
     if isinstance(class_names, list):
         class_names = {i: name for i, name in enumerate(class_names)}
     elif not isinstance(class_names, dict):
         class_names = {0: 'Object'}  # Default if invalid format
     
-    # Find images directory using a more robust approach
-    images_dirs = []
-    labels_dirs = []
-    
-    # Look for common directories structure
-    for subdir in ['train', 'training', 'valid', 'validation', 'val', 'test', 'testing']:
-        img_path = os.path.join(dataset_dir, subdir, 'images')
-        label_path = os.path.join(dataset_dir, subdir, 'labels')
-        
-        if os.path.exists(img_path) and os.path.isdir(img_path) and os.path.exists(label_path) and os.path.isdir(label_path):
-            images_dirs.append(img_path)
-            labels_dirs.append(label_path)
-    
-    # If no images directories found, look for any directories with images
-    if not images_dirs:
-        for root, dirs, _ in os.walk(dataset_dir):
-            if 'images' in dirs:
-                img_path = os.path.join(root, 'images')
-                label_path = os.path.join(root, 'labels')
-                
-                if os.path.exists(img_path) and os.path.exists(label_path):
-                    images_dirs.append(img_path)
-                    labels_dirs.append(label_path)
-    
     # Create a placeholder visualization if no images and labels were found
-    if not images_dirs or not labels_dirs:
+    if samples is None:
         # Create a placeholder visualization
         fig, axes = plt.subplots(2, 2, figsize=(12, 10))
         fig.patch.set_facecolor(PURPLE_BG)
@@ -681,29 +425,7 @@ def create_sample_detections_visualization(dataset_dir, class_names, user_prompt
             'explanation': "This is a placeholder visualization because no valid images and labels directories were found. In a real dataset, this would show actual object detections."
         }
     
-    # If we get here, we have at
-    # If we get here, we have at least one pair of images and labels directories
-    # Select a random images directory and matching labels directory
-    import random
-    idx = random.randrange(len(images_dirs))
-    images_dir = images_dirs[idx]
-    labels_dir = labels_dirs[idx]
-    
-    # Get image files with corresponding label files
-    valid_samples = []
-    image_exts = ('.jpg', '.jpeg', '.png', '.bmp')
-    
-    for img_file in os.listdir(images_dir):
-        if not img_file.lower().endswith(image_exts):
-            continue
-            
-        base_name = os.path.splitext(img_file)[0]
-        label_file = f"{base_name}.txt"
-        
-        if os.path.exists(os.path.join(labels_dir, label_file)):
-            valid_samples.append((img_file, label_file))
-    
-    if not valid_samples:
+    if not samples:
         # Create a placeholder visualization with empty frames
         fig, axes = plt.subplots(2, 2, figsize=(12, 10))
         fig.patch.set_facecolor(PURPLE_BG)
@@ -732,10 +454,6 @@ def create_sample_detections_visualization(dataset_dir, class_names, user_prompt
             'explanation': "This is a placeholder visualization because no valid image-label pairs were found. In a real dataset, this would show actual object detections."
         }
     
-    # Limit to 4 samples
-    if len(valid_samples) > 4:
-        valid_samples = random.sample(valid_samples, 4)
-    
     # Create figure with subplots
     fig, axes = plt.subplots(2, 2, figsize=(12, 10))
     fig.patch.set_facecolor(PURPLE_BG)
@@ -754,42 +472,28 @@ def create_sample_detections_visualization(dataset_dir, class_names, user_prompt
     class_count = {}
     
     # Plot each sample
-    for i, (img_file, label_file) in enumerate(valid_samples):
+    for i, (img_path, class_ids, bboxes) in enumerate(samples):
         if i >= len(axes):
             break
             
         try:
             # Load image
-            img_path = os.path.join(images_dir, img_file)
             img = plt.imread(img_path)
             
             # Get image dimensions
             img_height, img_width = img.shape[:2]
             
-            # Load labels
-            labels = []
-            with open(os.path.join(labels_dir, label_file), 'r') as f:
-                for line in f:
-                    parts = line.strip().split()
-                    if len(parts) >= 5:
-                        class_id = int(parts[0])
-                        # YOLO format: class_id, x_center, y_center, width, height (normalized)
-                        x_center = float(parts[1]) * img_width
-                        y_center = float(parts[2]) * img_height
-                        width = float(parts[3]) * img_width
-                        height = float(parts[4]) * img_height
-                        
-                        # Convert to (x1, y1, x2, y2) format
-                        x1 = max(0, x_center - width/2)
-                        y1 = max(0, y_center - height/2)
-                        x2 = min(img_width, x_center + width/2)
-                        y2 = min(img_height, y_center + height/2)
-                        
-                        labels.append((class_id, x1, y1, x2, y2))
-                        
-                        # Update counts
-                        total_objects += 1
-                        class_count[class_id] = class_count.get(class_id, 0) + 1
+            # YOLO boxes (x_center, y_center, width, height, normalized) to clipped pixel corners
+            scale = np.array([img_width, img_height, img_width, img_height])
+            centers, sizes = bboxes[:, :2], bboxes[:, 2:]
+            corners = np.hstack([centers - sizes / 2, centers + sizes / 2]) * scale
+            corners = np.clip(corners, 0, scale)
+            labels = [(int(class_id), *box) for class_id, box in zip(class_ids, corners)]
+            
+            # Update counts
+            total_objects += len(labels)
+            for class_id in class_ids:
+                class_count[int(class_id)] = class_count.get(int(class_id), 0) + 1
             
             # Display image
             ax = axes[i]
@@ -831,7 +535,7 @@ def create_sample_detections_visualization(dataset_dir, class_names, user_prompt
             ax.set_yticks([])
     
     # Hide any unused subplots
-    for i in range(len(valid_samples), len(axes)):
+    for i in range(len(samples), len(axes)):
         axes[i].set_visible(False)
     
     # Add title
@@ -857,7 +561,7 @@ def create_sample_detections_visualization(dataset_dir, class_names, user_prompt
     # Get AI explanation
     explanation_prompt = f"""
     Analyze these sample object detections for {user_prompt}.
-    The images show {total_objects} total objects across {len(valid_samples)} sample images.
+    The images show {total_objects} total objects across {len(samples)} sample images.
     The detected classes are: {', '.join([class_names.get(class_id, f"Class {class_id}") for class_id in class_count.keys()])}
     
     Explain what these sample detections tell us about the dataset.
@@ -865,12 +569,13 @@ def create_sample_detections_visualization(dataset_dir, class_names, user_prompt
     How representative is this sample of a typical object detection dataset?
     Provide a detailed analysis in 10-12 lines.
     """
-    explanation = get_gemini_explanation(f"Sample detections with {total_objects} objects", explanation_prompt)
+    explanation_request = (f"Sample detections with {total_objects} objects", explanation_prompt)
     
     return {
         'title': 'Sample Detections',
         'image': samples_img,
-        'explanation': explanation
+        'explanation': None,
+        'explanation_request': explanation_request
     }
 
 def create_model_architecture_visualization(model_dir, user_prompt=None):
@@ -1049,12 +754,13 @@ def create_model_architecture_visualization(model_dir, user_prompt=None):
     How does the information flow through the network?
     Provide a detailed explanation in about in 10-12 lines.
     """
-    explanation = get_gemini_explanation("YOLOv8 model architecture", explanation_prompt)
+    explanation_request = ("YOLOv8 model architecture", explanation_prompt)
     
     return {
         'title': 'Model Architecture',
         'image': arch_img,
-        'explanation': explanation
+        'explanation': None,
+        'explanation_request': explanation_request
     }
 
 def create_confusion_matrix_visualization(model_info, class_names, user_prompt=None):
@@ -1071,7 +777,6 @@ def create_confusion_matrix_visualization(model_info, class_names, user_prompt=N
     """
     import matplotlib.pyplot as plt
     import numpy as np
-    import matplotlib.patheffects as path_effects
     
     # If no user prompt was provided
     if user_prompt is None:
@@ -1136,10 +841,7 @@ def create_confusion_matrix_visualization(model_info, class_names, user_prompt=N
             text = ax.text(j, i, f"{conf_matrix[i, j]:.2f}",
                          ha="center", va="center", color=text_color, fontweight='bold')
             # Add glow effect to numbers
-            text.set_path_effects([
-                path_effects.withStroke(linewidth=2, foreground=PURPLE_BG if conf_matrix[i, j] >= 0.5 else 'white', alpha=0.3),
-                path_effects.Normal()
-            ])
+            text.set_path_effects(outline(2, PURPLE_BG if conf_matrix[i, j] >= 0.5 else 'white', alpha=0.3))
     
     # Add title and labels
     ax.set_title('Confusion Matrix (Placeholder)', fontsize=18, color=PURPLE_LIGHT, pad=20)
@@ -1195,10 +897,11 @@ def create_confusion_matrix_visualization(model_info, class_names, user_prompt=N
     Provide a detailed explanation in 10-12 lines.
     Note that this is a placeholder visualization.
     """
-    explanation = get_gemini_explanation("Confusion matrix analysis", explanation_prompt)
+    explanation_request = ("Confusion matrix analysis", explanation_prompt)
     
     return {
         'title': 'Confusion Matrix Analysis',
         'image': conf_img,
-        'explanation': explanation
+        'explanation': None,
+        'explanation_request': explanation_request
     }
\ No newline at end of file
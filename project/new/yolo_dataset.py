@@ -0,0 +1,318 @@
+import os
+import io
+import json
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import uuid
+import zipfile
+import yaml
+from db_file_system import DBFileSystem
+from yolo_labels import stage_label_index, LABEL_INDEX_FILE
+
+# Initialize database file system
+db_fs = DBFileSystem()
+
+# Staged datasets live here, one directory per dataset hash, shared by training and visualization
+STAGING_ROOT = os.getenv('YOLO_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'yolo_staging'))
+
+# Number of staged datasets kept on disk (least recently used are removed)
+STAGING_KEEP = int(os.getenv('YOLO_STAGING_KEEP', '3'))
+
+# Written last, so a directory without it is an incomplete staging attempt
+STAGED_MARKER = '.staged.json'
+
+# Lease files (.in-use-<pid>-<token>) mark a staged dataset as being read by a job;
+# a dataset with a lease of a running process is never pruned
+LEASE_PREFIX = '.in-use-'
+
+# Staged datasets used within this many seconds are never pruned either (covers the
+# moment between reusing a directory and taking its lease)
+STAGING_GRACE_SECONDS = int(os.getenv('YOLO_STAGING_GRACE', '600'))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def _split_for(filename):
+    """Guess the split (train/valid/test) of a file stored individually in the database"""
+    lower = filename.lower()
+    if 'train' in lower:
+        return 'train'
+    elif 'valid' in lower or 'val' in lower:
+        return 'valid'
+    elif 'test' in lower:
+        return 'test'
+    return 'train'
+
+
+def _class_names(yaml_data):
+    """Return class names from data.yaml as a {class_id: name} dictionary"""
+    names = yaml_data.get('names') or {}
+    if isinstance(names, list):
+        names = {i: name for i, name in enumerate(names)}
+    return names or {0: 'Object'}
+
+
+def dataset_content_hash(yaml_hash, zip_hash=None, files=None):
+    """
+    Hash of a database dataset, from the content hashes stored with its files (no content is read)
+
+    Parameters:
+    yaml_hash: Content hash of data.yaml
+    zip_hash: Content hash of yolo_dataset.zip, if the dataset is stored as an archive
+    files: Without an archive, {filename: file_info} of the individual files
+
+    Returns:
+    Hex digest identifying the dataset contents
+    """
+    h = hashlib.sha1(yaml_hash.encode('utf-8'))
+    if zip_hash is not None:
+        h.update(zip_hash.encode('utf-8'))
+    else:
+        for filename in sorted(files or {}):
+            # The label index is derived from the dataset, not part of it
+            if filename == LABEL_INDEX_FILE:
+                continue
+            info = files[filename]
+            # Files stored before content hashes were recorded: size and modification time
+            fingerprint = info.get('content_hash') or f"{info.get('size')}:{info.get('updated_at')}"
+            h.update(f"{filename}\0{fingerprint}\0".encode('utf-8'))
+    return h.hexdigest()
+
+
+def _staged_info(root):
+    """Build the staging result for an already materialized directory"""
+    data_yaml = os.path.join(root, 'data.yaml')
+    with open(data_yaml, 'r') as f:
+        yaml_data = yaml.safe_load(f) or {}
+    with open(os.path.join(root, STAGED_MARKER), 'r') as f:
+        marker = json.load(f)
+    return {
+        'root': root,
+        'data_yaml': data_yaml,
+        'dataset_hash': marker.get('dataset_hash'),
+        'class_names': _class_names(yaml_data),
+    }
+
+
+def _acquire_lease(root):
+    """Mark a staged dataset as in use by this process; returns the lease file"""
+    lease = os.path.join(root, f"{LEASE_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    open(lease, 'w').close()
+    return lease
+
+
+def release_staged_dataset(staged):
+    """Release the lease taken by stage_yolo_dataset once the staged files are no longer read"""
+    lease = staged.get('lease') if staged else None
+    if lease:
+        try:
+            os.remove(lease)
+        except FileNotFoundError:
+            pass
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # No cheap check; the lease counts until it is released
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _in_use(root):
+    """True if a running job holds a lease on root or it was used within STAGING_GRACE_SECONDS"""
+    if time.time() - os.path.getmtime(root) < STAGING_GRACE_SECONDS:
+        return True
+    for name in os.listdir(root):
+        if name.startswith(LEASE_PREFIX):
+            try:
+                pid = int(name[len(LEASE_PREFIX):].split('-')[0])
+            except ValueError:
+                continue
+            # Leases of crashed processes are ignored
+            if _pid_alive(pid):
+                return True
+    return False
+
+
+def _prune_staging(keep_root):
+    """Remove the least recently used staged datasets beyond STAGING_KEEP that are not in use"""
+    try:
+        staged = [os.path.join(STAGING_ROOT, d) for d in os.listdir(STAGING_ROOT)
+                  if os.path.exists(os.path.join(STAGING_ROOT, d, STAGED_MARKER))]
+        staged.sort(key=os.path.getmtime, reverse=True)
+        for path in staged[STAGING_KEEP:]:
+            if path == keep_root or _in_use(path):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            print(f"Removed old staged dataset: {path}")
+    except Exception as e:
+        print(f"Error pruning staged datasets: {e}")
+
+
+def _write_validation_list(root, build_dir, fraction=0.2, seed=42):
+    """
+    Pick a validation subset of the training images and write it as a file list.
+    Ultralytics accepts a .txt of image paths and finds labels via /images/ -> /labels/,
+    so no image or label is copied.
+    """
+    train_images_dir = os.path.join(build_dir, 'train', 'images')
+    images = sorted(f for f in os.listdir(train_images_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if not images:
+        return None
+
+    # Deterministic split so every run on the same dataset validates on the same images
+    random.Random(seed).shuffle(images)
+    val_images = images[:max(1, int(len(images) * fraction))]
+
+    with open(os.path.join(build_dir, 'val.txt'), 'w') as f:
+        for img in val_images:
+            # Paths point at the final staged location, not the build directory
+            f.write(os.path.join(root, 'train', 'images', img) + '\n')
+    print(f"Validation split: {len(val_images)} of {len(images)} training images (file list)")
+    return os.path.join(root, 'val.txt')
+
+
+def _materialize(build_dir, root, dir_name, files, yaml_data, zip_content):
+    """Extract the dataset into build_dir and write a data.yaml with absolute staged paths"""
+    if zip_content is not None:
+        # Extract straight from memory, without writing the archive to disk first
+        with zipfile.ZipFile(io.BytesIO(zip_content), 'r') as zip_ref:
+            zip_ref.extractall(build_dir)
+        print(f"Extracted yolo_dataset.zip to {build_dir}")
+    else:
+        print("No yolo_dataset.zip found, staging individual files")
+        for filename in files:
+            lower = filename.lower()
+            if lower.endswith(IMAGE_EXTENSIONS):
+                kind = 'images'
+            elif lower.endswith('.txt'):
+                kind = 'labels'
+            else:
+                continue
+            dest_dir = os.path.join(build_dir, _split_for(filename), kind)
+            os.makedirs(dest_dir, exist_ok=True)
+            try:
+                with open(os.path.join(dest_dir, os.path.basename(filename)), 'wb') as f:
+                    f.write(db_fs.get_file(filename, dir_name))
+            except Exception as e:
+                print(f"Error staging {filename}: {e}")
+
+    for split in ('train', 'valid', 'test'):
+        os.makedirs(os.path.join(build_dir, split, 'images'), exist_ok=True)
+        os.makedirs(os.path.join(build_dir, split, 'labels'), exist_ok=True)
+
+    # Point data.yaml at the staged directories
+    yaml_data = dict(yaml_data)
+    yaml_data['train'] = os.path.join(root, 'train', 'images')
+    if os.path.exists(os.path.join(build_dir, 'val', 'images')):
+        yaml_data['val'] = os.path.join(root, 'val', 'images')
+    elif os.listdir(os.path.join(build_dir, 'valid', 'images')):
+        yaml_data['val'] = os.path.join(root, 'valid', 'images')
+    else:
+        yaml_data['val'] = _write_validation_list(root, build_dir) or os.path.join(root, 'valid', 'images')
+    if os.listdir(os.path.join(build_dir, 'test', 'images')):
+        yaml_data['test'] = os.path.join(root, 'test', 'images')
+    else:
+        yaml_data.pop('test', None)
+    yaml_data.pop('path', None)
+
+    if not yaml_data.get('names'):
+        yaml_data['names'] = ['object']  # Default class name
+    yaml_data['nc'] = len(yaml_data['names'])
+
+    with open(os.path.join(build_dir, 'data.yaml'), 'w') as f:
+        yaml.dump(yaml_data, f, default_flow_style=False)
+
+
+def stage_yolo_dataset(dataset_folder):
+    """
+    Materialize a YOLO dataset on local disk once per dataset hash.
+
+    For database datasets the archive (or the individual files) is extracted into
+    STAGING_ROOT/<hash>, and the result is reused by every later training run and
+    visualization for the same dataset. The hash comes from the content hashes stored
+    with the files, so a dataset that is already staged is not read from the database.
+    Filesystem datasets are used in place.
+
+    The staged directory is leased to the caller and not pruned while in use; pass the
+    result to release_staged_dataset when done.
+
+    Parameters:
+    dataset_folder: Dataset directory (database path containing 'ml_system' or a local path)
+
+    Returns:
+    Dictionary with root, data_yaml, dataset_hash, class_names and lease
+    """
+    if 'ml_system' not in dataset_folder:
+        yaml_files = [f for f in os.listdir(dataset_folder) if f.endswith('.yaml')]
+        if not yaml_files:
+            raise ValueError("No data.yaml file found in the dataset folder. Please ensure your dataset includes a YAML configuration file.")
+        data_yaml = os.path.join(dataset_folder, yaml_files[0])
+        with open(data_yaml, 'r') as f:
+            yaml_data = yaml.safe_load(f) or {}
+        return {
+            'root': dataset_folder,
+            'data_yaml': data_yaml,
+            'dataset_hash': None,
+            'class_names': _class_names(yaml_data),
+            'lease': None,
+        }
+
+    # Extract directory name
+    parts = dataset_folder.replace('\\', '/').strip('/').split('/')
+    idx = parts.index('ml_system')
+    dir_name = parts[idx + 1] if idx + 1 < len(parts) else 'datasets'
+
+    infos = db_fs.file_infos(dir_name)
+    files = list(infos)
+    yaml_files = [f for f in files if f.endswith('.yaml')]
+    if not yaml_files:
+        raise ValueError("No data.yaml file found in the dataset folder. Please ensure your dataset includes a YAML configuration file.")
+    has_zip = 'yolo_dataset.zip' in infos
+
+    # The hash identifies the dataset contents; the same archive always maps to the same directory
+    yaml_hash = db_fs.content_hash(yaml_files[0], dir_name)
+    zip_hash = db_fs.content_hash('yolo_dataset.zip', dir_name) if has_zip else None
+    dataset_hash = dataset_content_hash(yaml_hash, zip_hash, None if has_zip else infos)
+    root = os.path.join(STAGING_ROOT, dataset_hash[:16])
+
+    if os.path.exists(os.path.join(root, STAGED_MARKER)):
+        print(f"Reusing staged YOLO dataset: {root}")
+        os.utime(root, None)  # Mark as recently used
+        return dict(_staged_info(root), lease=_acquire_lease(root))
+
+    yaml_content = db_fs.get_file(yaml_files[0], dir_name)
+    zip_content = db_fs.get_file('yolo_dataset.zip', dir_name) if has_zip else None
+
+    os.makedirs(STAGING_ROOT, exist_ok=True)
+    build_dir = tempfile.mkdtemp(dir=STAGING_ROOT, prefix='.build-')
+    try:
+        _materialize(build_dir, root, dir_name, files, yaml.safe_load(yaml_content) or {}, zip_content)
+        stage_label_index(build_dir, dataset_hash)
+        with open(os.path.join(build_dir, STAGED_MARKER), 'w') as f:
+            json.dump({'dataset_hash': dataset_hash, 'created_at': time.time()}, f)
+
+        # Atomic publish; if another process staged the same dataset first, use theirs
+        try:
+            os.rename(build_dir, root)
+        except OSError:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            if not os.path.exists(os.path.join(root, STAGED_MARKER)):
+                raise
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    print(f"Staged YOLO dataset at {root}")
+    lease = _acquire_lease(root)
+    _prune_staging(root)
+    return dict(_staged_info(root), lease=lease)
@@ -0,0 +1,255 @@
+import os
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from db_file_system import DBFileSystem
+
+# Initialize database file system
+db_fs = DBFileSystem()
+
+# Database directory and file name of the label index of the current YOLO dataset
+LABELS_DB_DIR = 'datasets'
+LABEL_INDEX_FILE = 'yolo_labels.npz'
+
+# Local copy kept inside a staged dataset directory
+LOCAL_INDEX_FILE = '.labels_index.npz'
+
+# Threads reading label files while the index is built
+LABEL_SCAN_WORKERS = int(os.getenv('YOLO_LABEL_SCAN_WORKERS', '8'))
+
+# Label files handled per worker task
+_SCAN_CHUNK = 256
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Label indexes kept in memory per process (least recently used are dropped)
+LABEL_INDEX_CACHE_SIZE = int(os.getenv('YOLO_LABEL_INDEX_CACHE_SIZE', '4'))
+
+# Indexes already loaded in this process, by dataset root (most recently used last)
+_loaded = OrderedDict()
+_lock = threading.Lock()
+
+
+def _find_label_files(root, subdirs=None):
+    """Label files (relative paths) in every 'labels' directory below root, or .txt files in root itself"""
+    label_files = []
+    for top in (sorted(subdirs) if subdirs else [root]):
+        for current, dirs, files in os.walk(os.path.join(root, top)):
+            dirs.sort()
+            if os.path.basename(current) == 'labels':
+                label_files.extend(os.path.relpath(os.path.join(current, f), root)
+                                   for f in sorted(files) if f.endswith('.txt'))
+    if not label_files and not subdirs:
+        label_files = sorted(f for f in os.listdir(root) if f.endswith('.txt'))
+    return label_files
+
+
+def _image_for(root, label_file, image_dirs):
+    """Relative path of the image belonging to a label file ('' if there is none)"""
+    labels_dir, name = os.path.split(label_file)
+    base = os.path.splitext(name)[0]
+    images_dir = os.path.join(os.path.dirname(labels_dir), 'images')
+    if images_dir not in image_dirs:
+        full = os.path.join(root, images_dir)
+        image_dirs[images_dir] = ({os.path.splitext(f)[0]: f for f in os.listdir(full)
+                                   if f.lower().endswith(IMAGE_EXTENSIONS)}
+                                  if os.path.isdir(full) else {})
+    image = image_dirs[images_dir].get(base)
+    return os.path.join(images_dir, image) if image else ''
+
+
+def _parse_label_text(text):
+    """(n, 5) array of class_id, x_center, y_center, width, height from a YOLO label file"""
+    # Segmentation labels carry polygon points after the box; only the first five values are used
+    rows = [parts[:5] for parts in (line.split() for line in text.splitlines()) if len(parts) >= 5]
+    if not rows:
+        return np.empty((0, 5))
+    try:
+        return np.array(rows, dtype=np.float64)
+    except ValueError:
+        # Skip malformed lines instead of the whole file
+        valid = []
+        for row in rows:
+            try:
+                valid.append([float(v) for v in row])
+            except ValueError:
+                pass
+        return np.array(valid, dtype=np.float64).reshape(-1, 5)
+
+
+def _scan_chunk(root, label_files, start):
+    """Parse a chunk of label files; returns image ids and rows for all their boxes"""
+    image_ids, rows = [], []
+    for offset, label_file in enumerate(label_files):
+        try:
+            with open(os.path.join(root, label_file), 'r') as f:
+                boxes = _parse_label_text(f.read())
+        except Exception as e:
+            print(f"Error reading label file {label_file}: {e}")
+            continue
+        if len(boxes):
+            image_ids.append(np.full(len(boxes), start + offset, dtype=np.int32))
+            rows.append(boxes)
+    return image_ids, rows
+
+
+def build_label_index(root, subdirs=None):
+    """
+    Parse every YOLO label file below a dataset directory into one set of arrays.
+
+    Label files are read on a thread pool in chunks; the result is ordered by label file.
+
+    Parameters:
+    root: Dataset directory
+    subdirs: Only index these subdirectories of root (e.g. the splits that get stored)
+
+    Returns:
+    Dictionary of arrays:
+    - label_files / image_files: relative paths per image id ('' when a label has no image)
+    - image_id, class_id: one entry per box
+    - bbox: (n_boxes, 4) normalized x_center, y_center, width, height
+    """
+    label_files = _find_label_files(root, subdirs)
+    image_dirs = {}
+    image_files = [_image_for(root, f, image_dirs) for f in label_files]
+
+    chunks = [(label_files[i:i + _SCAN_CHUNK], i) for i in range(0, len(label_files), _SCAN_CHUNK)]
+    with ThreadPoolExecutor(max_workers=max(1, LABEL_SCAN_WORKERS)) as executor:
+        results = list(executor.map(lambda chunk: _scan_chunk(root, *chunk), chunks))
+
+    image_ids = [ids for chunk_ids, _ in results for ids in chunk_ids]
+    rows = [boxes for _, chunk_rows in results for boxes in chunk_rows]
+    boxes = np.vstack(rows) if rows else np.empty((0, 5))
+
+    print(f"Indexed {len(boxes)} labels in {len(label_files)} label files under {root}")
+    return {
+        'label_files': np.array(label_files, dtype=str),
+        'image_files': np.array(image_files, dtype=str),
+        'image_id': np.concatenate(image_ids) if image_ids else np.empty(0, dtype=np.int32),
+        'class_id': boxes[:, 0].astype(np.int32),
+        'bbox': boxes[:, 1:].astype(np.float32),
+    }
+
+
+def _to_bytes(index, dataset_hash=None):
+    buf = io.BytesIO()
+    np.savez_compressed(buf, dataset_hash=np.array(dataset_hash or ''), **index)
+    return buf.getvalue()
+
+
+def _from_bytes(content):
+    with np.load(io.BytesIO(content), allow_pickle=False) as data:
+        index = {key: data[key] for key in data.files}
+    dataset_hash = str(index.pop('dataset_hash', '')) or None
+    return index, dataset_hash
+
+
+def save_label_index(index, dataset_hash=None, root=None):
+    """
+    Store a label index in the database (and as a local file in root, if given).
+
+    Parameters:
+    index: Result of build_label_index
+    dataset_hash: Hash of the dataset the index belongs to (checked when loading)
+    root: Staged dataset directory to keep a local copy in
+    """
+    content = _to_bytes(index, dataset_hash)
+    db_fs.save_file_content(content, LABEL_INDEX_FILE, LABELS_DB_DIR)
+    if root is not None:
+        with open(os.path.join(root, LOCAL_INDEX_FILE), 'wb') as f:
+            f.write(content)
+
+
+def stage_label_index(root, dataset_hash):
+    """
+    Put the label index of a dataset being staged into root.
+
+    The index built at ingestion is copied from the database when it belongs to this
+    dataset; otherwise it is built from the staged files and stored.
+    """
+    try:
+        if db_fs.file_exists(LABEL_INDEX_FILE, LABELS_DB_DIR):
+            content = db_fs.get_file(LABEL_INDEX_FILE, LABELS_DB_DIR)
+            _, stored_hash = _from_bytes(content)
+            if stored_hash == dataset_hash:
+                with open(os.path.join(root, LOCAL_INDEX_FILE), 'wb') as f:
+                    f.write(content)
+                return
+        save_label_index(build_label_index(root), dataset_hash, root)
+    except Exception as e:
+        # The index is an optimization; visualizations build it on demand if it is missing
+        print(f"Error staging label index: {e}")
+
+
+def load_label_index(root):
+    """
+    Label index of a dataset directory: cached in memory, read from the staged copy,
+    or built from the label files (for datasets used in place).
+    """
+    with _lock:
+        if root in _loaded:
+            _loaded.move_to_end(root)
+            return _loaded[root]
+
+    local_path = os.path.join(root, LOCAL_INDEX_FILE)
+    index = None
+    if os.path.exists(local_path):
+        try:
+            with open(local_path, 'rb') as f:
+                index, _ = _from_bytes(f.read())
+        except Exception as e:
+            print(f"Error reading label index {local_path}: {e}")
+    if index is None:
+        index = build_label_index(root)
+
+    with _lock:
+        _loaded[root] = index
+        _loaded.move_to_end(root)
+        while len(_loaded) > max(1, LABEL_INDEX_CACHE_SIZE):
+            _loaded.popitem(last=False)
+    return index
+
+
+def class_counts(index, class_names=None):
+    """
+    Number of boxes per class id.
+
+    Classes from class_names are always present (with 0 when they have no boxes).
+    """
+    class_ids = index['class_id'][index['class_id'] >= 0]
+    counts = np.bincount(class_ids) if len(class_ids) else np.zeros(0, dtype=np.int64)
+    result = {class_id: 0 for class_id in (class_names or {})}
+    for class_id in np.flatnonzero(counts):
+        result[int(class_id)] = int(counts[class_id])
+    return result
+
+
+def boxes_for_images(index, image_ids):
+    """
+    Boxes of the given images.
+
+    Returns:
+    List of (class_ids, bboxes) per image id
+    """
+    # Boxes are stored ordered by image id, so each image is one contiguous slice
+    starts = np.searchsorted(index['image_id'], image_ids, side='left')
+    ends = np.searchsorted(index['image_id'], image_ids, side='right')
+    return [(index['class_id'][s:e], index['bbox'][s:e]) for s, e in zip(starts, ends)]
+
+
+def sample_images(index, root, count=4, seed=None):
+    """
+    Random labelled images for the sample detections grid.
+
+    Returns:
+    List of (image_path, class_ids, bboxes)
+    """
+    candidates = np.flatnonzero(index['image_files'] != '')
+    if len(candidates) == 0:
+        return []
+    rng = np.random.default_rng(seed)
+    chosen = np.sort(rng.choice(candidates, size=min(count, len(candidates)), replace=False))
+    return [(os.path.join(root, str(index['image_files'][image_id])), class_ids, bboxes)
+            for image_id, (class_ids, bboxes) in zip(chosen, boxes_for_images(index, chosen))]
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+from db_file_system import DBFileSystem
+
+# Initialize database file system
+db_fs = DBFileSystem()
+
+# Database directory holding YOLO run metrics
+RUNS_DB_DIR = 'runs'
+
+# Index of recorded runs (newest last), so readers never scan run directories
+RUNS_INDEX_FILE = 'yolo_runs_index.json'
+
+# Number of runs kept in the index / run directories kept on disk
+RUNS_INDEX_KEEP = 50
+RUN_DIRS_KEEP = int(os.getenv('YOLO_RUN_DIRS_KEEP', '3'))
+
+# Serializes the read-modify-write of the run index, so concurrent trainings in this
+# process do not drop each other's entries
+_index_lock = threading.Lock()
+
+
+def _normalize_metric_name(column):
+    """Map Ultralytics result column names to the keys used in metrics_info"""
+    key = column.strip()
+    lower = key.lower()
+    if 'map50-95' in lower:
+        return 'mAP50-95'
+    elif 'map50' in lower:
+        return 'mAP50'
+    elif 'precision' in lower:
+        return 'precision'
+    elif 'recall' in lower:
+        return 'recall'
+    return key
+
+
+def parse_results_csv(run_dir):
+    """
+    Parse results.csv from a YOLO run directory.
+
+    Returns:
+    Dictionary with 'final' (metrics of the last epoch) and 'history' (one dict per epoch),
+    or None if the run has no results.csv
+    """
+    results_path = os.path.join(run_dir, 'results.csv')
+    if not os.path.exists(results_path):
+        return None
+
+    metrics_df = pd.read_csv(results_path)
+    if metrics_df.empty:
+        return None
+
+    metrics_df.columns = [_normalize_metric_name(c) for c in metrics_df.columns]
+    # Plain Python numbers (older pandas versions return numpy scalars here)
+    history = [
+        {k: (v.item() if isinstance(v, np.generic) else v) for k, v in row.items()}
+        for row in metrics_df.to_dict(orient='records')
+    ]
+    final = {k: history[-1][k] for k in ('mAP50-95', 'mAP50', 'precision', 'recall') if k in history[-1]}
+    return {'final': final, 'history': history}
+
+
+def record_run(run_id, run_dir, metrics, history=None, **extra):
+    """
+    Save a run's metrics and per-epoch history to the database and add it to the index.
+
+    Parameters:
+    run_id: Unique run name (also the run directory name)
+    run_dir: Directory Ultralytics wrote the run to
+    metrics: Final metrics dictionary
+    history: List of per-epoch metric dictionaries
+    extra: Additional fields stored with the index entry (profile, dataset_hash, ...)
+    """
+    metrics_file = f"yolo_metrics_{run_id}.json"
+    entry = {
+        'run_id': run_id,
+        'run_dir': run_dir,
+        'metrics_file': metrics_file,
+        'created_at': time.time(),
+        'metrics': metrics,
+    }
+    entry.update(extra)
+
+    try:
+        payload = dict(entry, history=history or [])
+        db_fs.save_file_content(json.dumps(payload, default=str).encode('utf-8'), metrics_file, RUNS_DB_DIR)
+
+        with _index_lock:
+            index = _load_index()
+            index.append(entry)
+            index = index[-RUNS_INDEX_KEEP:]
+            db_fs.save_file_content(json.dumps(index, default=str).encode('utf-8'), RUNS_INDEX_FILE, RUNS_DB_DIR)
+        print(f"Recorded YOLO run {run_id} in database")
+    except Exception as e:
+        print(f"Error recording YOLO run metrics: {e}")
+
+
+def _load_index():
+    """Return the list of recorded runs (newest last)"""
+    if not db_fs.file_exists(RUNS_INDEX_FILE, RUNS_DB_DIR):
+        return []
+    return json.loads(db_fs.get_file(RUNS_INDEX_FILE, RUNS_DB_DIR).decode('utf-8'))
+
+
+def load_run_metrics(run_id=None):
+    """
+    Load a recorded run (metrics and per-epoch history) from the database.
+
+    Parameters:
+    run_id: Run to load; the most recent run when None
+
+    Returns:
+    Dictionary with run_id, run_dir, metrics and history, or None if not found
+    """
+    try:
+        index = _load_index()
+        if not index:
+            return None
+        if run_id is None:
+            entry = index[-1]
+        else:
+            entry = next((e for e in reversed(index) if e['run_id'] == run_id), None)
+            if entry is None:
+                return None
+        return json.loads(db_fs.get_file(entry['metrics_file'], RUNS_DB_DIR).decode('utf-8'))
+    except Exception as e:
+        print(f"Error loading YOLO run metrics: {e}")
+        return None
+
+
+def prune_run_dirs(runs_root, keep=RUN_DIRS_KEEP, exclude=None):
+    """
+    Remove all but the most recent run directories under runs_root.
+
+    This deletes the older Ultralytics run directories (weights, plots, results.csv) from
+    the filesystem; their metrics and history stay available through the run index.
+    """
+    try:
+        run_dirs = [os.path.join(runs_root, d) for d in os.listdir(runs_root)
+                    if os.path.isdir(os.path.join(runs_root, d))]
+        run_dirs.sort(key=os.path.getmtime, reverse=True)
+        for path in run_dirs[keep:]:
+            if path != exclude:
+                shutil.rmtree(path, ignore_errors=True)
+    except Exception as e:
+        print(f"Error pruning YOLO run directories: {e}")
@@ -79,6 +79,8 @@ const generateProjectFiles = (config) => {
     'requirements.txt': generateRequirements(taskType),
     'app.py': generateFlaskApp(config),
     'model.py': generateModelCode(config),
+    'batching.py': generateBatchingCode(config),
+    'gunicorn.conf.py': generateGunicornConfig(config),
     'config.py': generateConfig(config),
     'docker-compose.yml': generateDockerCompose(config),
     'Dockerfile': generateDockerfile(config),
@@ -128,11 +130,24 @@ python run_local.py
 docker-compose up --build
 \`\`\`
 
+### Production server
+\`\`\`bash
+gunicorn --config gunicorn.conf.py app:app
+\`\`\`
+
+The Docker image runs this command. The model is loaded once before the workers are forked
+(\`preload_app\`), so all \`WEB_CONCURRENCY\` workers share its memory instead of holding a copy
+each; every worker then runs a warm-up prediction before it accepts requests. Use
+\`GUNICORN_THREADS\` for request threads per worker.
+
 ## API Endpoints
 
-- **Health Check**: \`GET /health\`
+- **Health Check**: \`GET /health\` (liveness)
+- **Readiness**: \`GET /ready\` (503 until the model is warmed up)
 - **Predict**: \`POST /predict\`
+- **Batch Predict**: \`POST /predict/batch\` (list of rows, list of records or \`{feature: [values]}\`)
 - **Model Info**: \`GET /model/info\`
+- **Metrics**: \`GET /metrics\` (micro-batching counters)
 
 ## Testing
 
@@ -145,6 +160,21 @@ python test_api.py
 
 Copy \`.env.example\` to \`.env\` and update the values as needed.
 
+Put the trained model next to \`app.py\` as \`model.pkl\`. If the model was also exported to
+ONNX (\`best_model.onnx\` in a FreeMind project bundle), save it as \`model.onnx\`: predictions then
+run on ONNX Runtime, which is much faster per call than scikit-learn. The exported model includes
+the preprocessing and takes raw feature values, so it is only used together with \`preprocessor.pkl\`.
+
+If the bundle contains \`preprocessor.pkl\` (the preprocessing fitted at training time), put it
+next to \`model.pkl\` as well. It is loaded once at startup; requests then send raw feature values
+(records or rows in the order of \`GET /model/info\`) and predictions use the original labels.
+
+Set \`MICRO_BATCHING=true\` to coalesce concurrent single-row \`/predict\` requests into one
+model call. A batch runs when \`BATCH_MAX_ROWS\` requests are waiting or the first one has
+waited \`BATCH_MAX_WAIT_MS\`; \`GET /metrics\` reports batch sizes, latency and throughput.
+Under gunicorn a worker only handles \`GUNICORN_THREADS\` requests at once (2 by default), so
+a batch never holds more rows than that: raise it, up to \`BATCH_MAX_ROWS\`, with batching on.
+
 ## Model Details
 
 - **Task Type**: ${taskType}
@@ -160,6 +190,7 @@ Generated by FreeMind AI Studio - ${new Date().toISOString()}
 const generateRequirements = (taskType) => {
   const baseRequirements = [
     'flask>=2.0.0',
+    'gunicorn>=20.1.0',
     'numpy>=1.21.0',
     'pandas>=1.3.0',
     'scikit-learn>=1.0.0',
@@ -170,11 +201,11 @@ const generateRequirements = (taskType) => {
   
   const taskSpecificRequirements = {
     'image_classification': ['tensorflow>=2.8.0', 'pillow>=8.0.0', 'opencv-python>=4.5.0'],
-    'text_classification': ['transformers>=4.0.0', 'torch>=1.9.0'],
-    'sentiment_analysis': ['transformers>=4.0.0', 'torch>=1.9.0'],
+    'text_classification': ['transformers>=4.0.0', 'torch>=1.9.0', 'nltk>=3.6.0'],
+    'sentiment_analysis': ['transformers>=4.0.0', 'torch>=1.9.0', 'nltk>=3.6.0'],
     'object_detection': ['tensorflow>=2.8.0', 'pillow>=8.0.0', 'opencv-python>=4.5.0'],
-    'regression': ['matplotlib>=3.3.0', 'seaborn>=0.11.0'],
-    'classification': ['matplotlib>=3.3.0', 'seaborn>=0.11.0']
+    'regression': ['matplotlib>=3.3.0', 'seaborn>=0.11.0', 'onnxruntime>=1.14.0'],
+    'classification': ['matplotlib>=3.3.0', 'seaborn>=0.11.0', 'onnxruntime>=1.14.0']
   };
   
   const requirements = [...baseRequirements, ...(taskSpecificRequirements[taskType] || [])];
@@ -190,6 +221,7 @@ from flask_cors import CORS
 import os
 import logging
 from model import ModelPredictor
+from batching import MicroBatcher
 from config import Config
 
 # Configure logging
@@ -202,6 +234,17 @@ CORS(app)
 # Initialize model
 model_predictor = ModelPredictor()
 
+# The development server warms up here; under gunicorn (gunicorn.conf.py) every worker warms up after fork
+if os.getenv('MODEL_WARMUP', 'startup') == 'startup':
+    model_predictor.warm_up()
+
+# Optional micro-batching: concurrent /predict requests share one model call
+batcher = MicroBatcher(
+    model_predictor._predict_matrix,
+    max_rows=Config.BATCH_MAX_ROWS,
+    max_wait_ms=Config.BATCH_MAX_WAIT_MS
+) if Config.MICRO_BATCHING else None
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -212,6 +255,16 @@ def health_check():
         'version': '1.0.0'
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 503 until the model is loaded and warmed up"""
+    if not model_predictor.ready:
+        return jsonify({'status': 'warming_up'}), 503
+    return jsonify({
+        'status': 'ready',
+        'runtime': model_predictor.runtime
+    })
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """Make predictions"""
@@ -225,7 +278,7 @@ def predict():
             return jsonify({'error': 'No data field provided'}), 400
         
         # Make prediction
-        result = model_predictor.predict(input_data)
+        result = model_predictor.predict(input_data, batcher=batcher)
         
         return jsonify({
             'success': True,
@@ -240,6 +293,46 @@ def predict():
             'error': str(e)
         }), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Make predictions for many rows at once (list of rows, list of records or columnar data)"""
+    try:
+        if not request.json:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        
+        # Get input data
+        input_data = request.json.get('data')
+        if input_data is None:
+            return jsonify({'error': 'No data field provided'}), 400
+        
+        # Make predictions
+        result = model_predictor.predict_batch(input_data, max_rows=Config.MAX_BATCH_SIZE)
+        
+        return jsonify({
+            'success': True,
+            'predictions': result,
+            'task_type': '${taskType}'
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Micro-batching configuration and latency/throughput counters"""
+    return jsonify({
+        'micro_batching': batcher.stats() if batcher is not None else {'enabled': False}
+    })
+
 @app.route('/model/info', methods=['GET'])
 def model_info():
     """Get model information"""
@@ -248,6 +341,7 @@ def model_info():
         'task_type': '${taskType}',
         'version': '1.0.0',
         'features': model_predictor.get_feature_info(),
+        'runtime': model_predictor.runtime,
         'created_at': model_predictor.get_creation_time()
     })
 
@@ -267,12 +361,33 @@ from datetime import datetime
 import joblib
 import os
 
+def _clean_texts(texts):
+    """Text cleaning used at training time for text datasets (requires nltk)"""
+    import re
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import PorterStemmer, WordNetLemmatizer
+    nltk.download('stopwords', quiet=True)
+    nltk.download('wordnet', quiet=True)
+    ps = PorterStemmer()
+    lemmatizer = WordNetLemmatizer()
+    all_stopwords = set(stopwords.words('english'))
+    corpus = []
+    for text in texts:
+        words = re.sub('[^a-zA-Z]', ' ', str(text)).lower().split()
+        corpus.append(' '.join(lemmatizer.lemmatize(ps.stem(word)) for word in words if word not in all_stopwords))
+    return corpus
+
 class ModelPredictor:
     """Model prediction class for ${taskType}"""
     
     def __init__(self):
         self.model = None
+        self.session = None
+        self.runtime = 'sklearn'
+        self.preprocessor = None
         self.feature_names = []
+        self.ready = False
         self.created_at = datetime.now().isoformat()
         self.load_model()
     
@@ -290,6 +405,43 @@ class ModelPredictor:
         else:
             print("No model file found, creating mock model")
             self._create_mock_model()
+        
+        self._load_onnx()
+        self._load_preprocessor()
+        if self.session is not None and self.preprocessor is None:
+            # The exported graph includes the preprocessing and takes raw columns, which are
+            # only known from preprocessor.pkl
+            print("model.onnx needs preprocessor.pkl, using the pickled model")
+            self.session = None
+            self.runtime = 'sklearn'
+    
+    def _load_preprocessor(self):
+        """Load the preprocessing fitted at training time (preprocessor.pkl), once at startup"""
+        preprocessor_path = os.path.join(os.path.dirname(__file__), 'preprocessor.pkl')
+        if not os.path.exists(preprocessor_path):
+            return
+        try:
+            self.preprocessor = joblib.load(preprocessor_path)
+            self.feature_names = list(self.preprocessor['columns'])
+            print(f"Preprocessor loaded successfully from {preprocessor_path}")
+        except Exception as e:
+            print(f"Error loading preprocessor, inputs must be model-ready features: {e}")
+            self.preprocessor = None
+    
+    def _load_onnx(self):
+        """Predict with ONNX Runtime when model.onnx is present (the pickle stays as fallback)"""
+        onnx_path = os.path.join(os.path.dirname(__file__), 'model.onnx')
+        if not os.path.exists(onnx_path):
+            return
+        try:
+            import onnxruntime as ort
+            self.session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+            self.onnx_inputs = self.session.get_inputs()
+            self.runtime = 'onnxruntime'
+            print(f"ONNX model loaded successfully from {onnx_path}")
+        except Exception as e:
+            print(f"Error loading ONNX model, using the pickled model: {e}")
+            self.session = None
     
     def _create_mock_model(self):
         """Create a mock model for demonstration"""
@@ -311,11 +463,105 @@ class ModelPredictor:
             self.model.fit(X_mock, y_mock)
             self.feature_names = [f'feature_{i}' for i in range(5)]
     
-    def predict(self, input_data):
-        """Make prediction on input data"""
+    def _predict_matrix(self, X):
+        """Predict every row of X with a single model evaluation (class ids mapped back to labels)"""
+        result = self._evaluate(X)
+        encoder = self.preprocessor.get('label_encoder') if self.preprocessor else None
+        if encoder is not None:
+            result['predictions'] = encoder.inverse_transform(np.asarray(result['predictions']).astype(int)).tolist()
+        return result
+    
+    def _evaluate(self, X):
+        """Run the model once on every row of X"""
+        if self.session is not None:
+            # Exported classifiers return labels and a probability matrix, regressors only values
+            outputs = self.session.run(None, self._onnx_feeds(X))
+            result = {'predictions': np.asarray(outputs[0]).ravel().tolist()}
+            if len(outputs) > 1:
+                probabilities = np.asarray(outputs[1])
+                result['probabilities'] = probabilities.tolist()
+                result['confidence'] = probabilities.max(axis=1).tolist()
+            return result
+        if hasattr(self.model, 'predict_proba'):
+            probabilities = self.model.predict_proba(X)
+            # The predicted class is the most probable one, so predict() is not run as well
+            indices = probabilities.argmax(axis=1)
+            classes = getattr(self.model, 'classes_', None)
+            predictions = classes[indices] if classes is not None else indices
+            return {
+                'predictions': predictions.tolist(),
+                'probabilities': probabilities.tolist(),
+                'confidence': probabilities.max(axis=1).tolist()
+            }
+        return {
+            'predictions': np.asarray(self.model.predict(X)).ravel().tolist()
+        }
+    
+    def _to_frame(self, input_data):
+        """Raw rows as a DataFrame: list of rows, list of records, columnar data or a single record"""
+        if isinstance(input_data, dict):
+            if any(isinstance(v, list) for v in input_data.values()):
+                return pd.DataFrame(input_data)
+            return pd.DataFrame([input_data])
+        if input_data and isinstance(input_data[0], dict):
+            return pd.DataFrame(input_data)
+        return pd.DataFrame(input_data, columns=self.feature_names)
+    
+    def _onnx_feeds(self, X):
+        """
+        ONNX inputs for raw rows from _prepare: one (n, 1) tensor per column, matched by
+        position since the exporter sanitizes input names
+        """
+        feeds = {}
+        for i, graph_input in enumerate(self.onnx_inputs):
+            if graph_input.type == 'tensor(string)':
+                # Missing categories are fed as empty strings, which the exported imputer fills
+                values = pd.Series(X[:, i]).fillna('').astype(str).to_numpy(dtype=object)
+            else:
+                values = pd.to_numeric(pd.Series(X[:, i]), errors='coerce').to_numpy(dtype=np.float32)
+            feeds[graph_input.name] = values.reshape(-1, 1)
+        return feeds
+    
+    def _prepare(self, df):
+        """Apply the training-time preprocessing to a batch of raw rows (one transform call)"""
+        if self.session is not None:
+            # The ONNX graph preprocesses by itself; it gets the raw columns (text cleaned)
+            if self.preprocessor['kind'] == 'text':
+                texts = _clean_texts(df[self.preprocessor['text_column']])
+                return np.asarray(texts, dtype=object).reshape(-1, 1)
+            return df.reindex(columns=self.preprocessor['columns']).to_numpy(dtype=object)
+        if self.preprocessor['kind'] == 'text':
+            X = self.preprocessor['transformer'].transform(_clean_texts(df[self.preprocessor['text_column']]))
+        else:
+            # Missing columns become NaN and are filled by the fitted imputers
+            X = self.preprocessor['transformer'].transform(df.reindex(columns=self.preprocessor['columns']))
+        return X.toarray() if hasattr(X, 'toarray') else np.asarray(X)
+    
+    def _to_matrix(self, input_data):
+        """Convert a list of rows, a list of records or columnar data ({feature: [values]}) to a 2D array"""
+        if self.preprocessor is not None:
+            return self._prepare(self._to_frame(input_data))
+        if isinstance(input_data, dict):
+            names = self.feature_names or list(input_data)
+            n_rows = max((len(v) for v in input_data.values() if isinstance(v, list)), default=None)
+            if n_rows is None:
+                # A single record
+                return np.array([[input_data.get(name, 0) for name in names]], dtype=float)
+            return np.array([input_data.get(name, [0] * n_rows) for name in names], dtype=float).T
+        if isinstance(input_data, list) and input_data and isinstance(input_data[0], dict):
+            names = self.feature_names or list(input_data[0])
+            return np.array([[row.get(name, 0) for name in names] for row in input_data], dtype=float)
+        X = np.array(input_data, dtype=float)
+        return X.reshape(1, -1) if X.ndim < 2 else X
+    
+    def predict(self, input_data, batcher=None):
+        """Make prediction on input data (coalesced with other requests if a MicroBatcher is given)"""
         try:
             # Convert input to numpy array
-            if isinstance(input_data, list):
+            if self.preprocessor is not None:
+                # Raw feature values; the fitted preprocessing turns them into model inputs
+                X = self._prepare(self._to_frame([input_data] if isinstance(input_data, list) else input_data))
+            elif isinstance(input_data, list):
                 X = np.array(input_data).reshape(1, -1)
             elif isinstance(input_data, dict):
                 # Convert dict to ordered array based on feature names
@@ -324,22 +570,69 @@ class ModelPredictor:
                 X = np.array(input_data).reshape(1, -1)
             
             # Make prediction
-            if hasattr(self.model, 'predict_proba'):
-                probabilities = self.model.predict_proba(X)[0]
-                prediction = self.model.predict(X)[0]
+            result = batcher.submit(X) if batcher is not None else self._predict_matrix(X)
+            if 'probabilities' in result:
                 return {
-                    'prediction': int(prediction),
-                    'probabilities': probabilities.tolist(),
-                    'confidence': float(np.max(probabilities))
+                    'prediction': result['predictions'][0],
+                    'probabilities': result['probabilities'][0],
+                    'confidence': result['confidence'][0]
                 }
             else:
-                prediction = self.model.predict(X)[0]
                 return {
-                    'prediction': float(prediction)
+                    'prediction': float(result['predictions'][0])
                 }
         except Exception as e:
             raise Exception(f"Prediction failed: {str(e)}")
     
+    def predict_batch(self, input_data, max_rows=None):
+        """
+        Make predictions for many rows with one model evaluation
+        
+        Returns lists with one entry per row: predictions, and for classifiers
+        probabilities and confidence
+        """
+        X = self._to_matrix(input_data)
+        if max_rows is not None and len(X) > max_rows:
+            raise ValueError(f"Batch of {len(X)} rows exceeds the limit of {max_rows}")
+        try:
+            result = self._predict_matrix(X)
+        except Exception as e:
+            raise Exception(f"Batch prediction failed: {str(e)}")
+        result['count'] = len(X)
+        return result
+    
+    def warm_up(self):
+        """
+        Run one prediction so lazy initialization is done before the first request
+        
+        Sets ready only once a prediction succeeded; an ONNX model that fails is dropped
+        for the pickled model first.
+        """
+        try:
+            if self.preprocessor is not None:
+                # An empty record: the fitted imputers fill every column
+                X = self._prepare(pd.DataFrame([{}], columns=self.feature_names))
+            else:
+                X = np.zeros((1, getattr(self.model, 'n_features_in_', len(self.feature_names))))
+            self._predict_matrix(X)
+        except Exception as e:
+            if self.session is None:
+                print(f"Model warm-up failed, not ready: {e}")
+                return
+            print(f"ONNX warm-up failed, using the pickled model: {e}")
+            self.session = None
+            self.runtime = 'sklearn'
+            return self.warm_up()
+        print(f"Model warmed up ({self.runtime})")
+        self.ready = True
+    
+    def after_fork(self):
+        """Per-worker setup under a pre-fork server (the model itself stays shared with the master)"""
+        if self.session is not None:
+            # ONNX Runtime thread pools do not survive fork; the worker needs its own session
+            self._load_onnx()
+        self.warm_up()
+    
     def get_feature_info(self):
         """Get information about model features"""
         return {
@@ -354,6 +647,157 @@ class ModelPredictor:
 `;
 };
 
+// Generate batching.py (micro-batching of /predict requests)
+const generateBatchingCode = (config) => {
+  return `import time
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+import numpy as np
+
+class MicroBatcher:
+    """
+    Coalesce single-row predictions into batched model calls
+
+    Requests are queued for up to max_wait_ms or until max_rows are waiting; the queued
+    rows are then predicted with one vectorized model call and every request gets its
+    own row of the result back.
+    """
+
+    def __init__(self, predict_matrix, max_rows=64, max_wait_ms=5, timeout=30):
+        self.predict_matrix = predict_matrix
+        self.max_rows = max(1, max_rows)
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.started_at = time.time()
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._counters = {
+            'requests': 0,
+            'batches': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'max_batch_rows': 0,
+            'queue_seconds': 0.0,
+            'model_seconds': 0.0
+        }
+
+    def submit(self, X):
+        """Predict a (1, n_features) array; blocks until its batch has run"""
+        future = Future()
+        with self._condition:
+            # Started on first use so that every forked server worker gets its own thread
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._worker.start()
+            item = (X, future, time.perf_counter())
+            self._pending.append(item)
+            self._condition.notify()
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Nobody waits for this row any more: take it out of the queue, or cancel it so
+            # the worker skips it (a row already being predicted just finishes)
+            with self._condition:
+                try:
+                    self._pending.remove(item)
+                except ValueError:
+                    pass
+            future.cancel()
+            with self._stats_lock:
+                self._counters['timeouts'] += 1
+            raise
+
+    def _next_batch(self):
+        """
+        Wait for the first request, then collect more until max_rows or its deadline.
+        Requests cancelled by a timed out caller are dropped.
+        """
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(self.max_rows, len(self._pending)))]
+        # Once running, a request can no longer be cancelled and always gets its result
+        return [item for item in batch if item[1].set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            # Rows of different widths cannot be stacked; each width gets its own model call
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[0].shape[-1], []).append(item)
+            errors = sum(self._predict_group(items) for items in groups.values())
+            self._record(batch, started, time.perf_counter(), errors)
+
+    def _predict_group(self, items):
+        """Run one model call for items and fan the rows out; returns the number of failed requests"""
+        try:
+            result = self.predict_matrix(np.vstack([X for X, _, _ in items]))
+        except Exception as e:
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+                return 1
+            # A bad row must not fail the other requests of the batch
+            return sum(self._predict_group([item]) for item in items)
+        for i, (_, future, _) in enumerate(items):
+            future.set_result({key: values[i:i + 1] for key, values in result.items()})
+        return 0
+
+    def _record(self, batch, started, finished, errors):
+        with self._stats_lock:
+            counters = self._counters
+            counters['requests'] += len(batch)
+            counters['batches'] += 1
+            counters['errors'] += errors
+            counters['max_batch_rows'] = max(counters['max_batch_rows'], len(batch))
+            counters['queue_seconds'] += sum(started - enqueued for _, _, enqueued in batch)
+            counters['model_seconds'] += finished - started
+            self._latencies.extend(finished - enqueued for _, _, enqueued in batch)
+
+    def stats(self):
+        """Configuration plus latency and throughput counters"""
+        with self._stats_lock:
+            counters = dict(self._counters)
+            latencies = np.array(self._latencies) * 1000
+        requests = counters['requests']
+        batches = counters['batches']
+        return {
+            'enabled': True,
+            'max_rows': self.max_rows,
+            'max_wait_ms': self.max_wait * 1000,
+            'requests': requests,
+            'batches': batches,
+            'errors': counters['errors'],
+            'timeouts': counters['timeouts'],
+            'queued': len(self._pending),
+            'mean_batch_rows': round(requests / batches, 2) if batches else 0,
+            'max_batch_rows': counters['max_batch_rows'],
+            'mean_queue_ms': round(counters['queue_seconds'] / requests * 1000, 3) if requests else 0,
+            'mean_model_ms': round(counters['model_seconds'] / batches * 1000, 3) if batches else 0,
+            # Over the last 1000 requests
+            'latency_ms': {
+                'p50': round(float(np.percentile(latencies, 50)), 3),
+                'p95': round(float(np.percentile(latencies, 95)), 3),
+                'p99': round(float(np.percentile(latencies, 99)), 3)
+            } if len(latencies) else None,
+            'throughput_rps': round(requests / max(time.time() - self.started_at, 1e-9), 2)
+        }
+`;
+};
+
 // Generate config.py
 const generateConfig = (config) => {
   const { environment } = config;
@@ -377,6 +821,20 @@ class Config:
     # Model
     MODEL_PATH = os.getenv('MODEL_PATH', 'model.pkl')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
+    MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 10000))  # rows per /predict/batch request
+    
+    # Micro-batching of single-row /predict requests. Under gunicorn a worker serves at most
+    # GUNICORN_THREADS requests at once, so its batches hold at most that many rows: raise
+    # GUNICORN_THREADS (up to BATCH_MAX_ROWS) together with MICRO_BATCHING
+    MICRO_BATCHING = os.getenv('MICRO_BATCHING', 'false').lower() == 'true'
+    BATCH_MAX_ROWS = int(os.getenv('BATCH_MAX_ROWS', 64))  # run the batch once this many rows wait
+    BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 5))  # longest a request waits for others
+    
+    # Production server (gunicorn.conf.py)
+    WORKERS = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))  # worker processes
+    THREADS = int(os.getenv('GUNICORN_THREADS', 2))  # request threads per worker
+    TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', 120))  # seconds before a stuck worker is restarted
+    MAX_REQUESTS = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))  # restart workers after this many requests (0 = never)
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -406,6 +864,53 @@ services:
 `;
 };
 
+// Generate gunicorn.conf.py (pre-fork production server)
+const generateGunicornConfig = (config) => {
+  return `"""Production server configuration: gunicorn --config gunicorn.conf.py app:app"""
+
+import gc
+import os
+
+# Workers warm up the model after fork (see post_fork) instead of the master at import
+os.environ.setdefault('MODEL_WARMUP', 'post_fork')
+
+from config import Config
+
+bind = f"{Config.HOST}:{Config.PORT}"
+
+# Worker processes and request threads per worker
+workers = Config.WORKERS
+threads = Config.THREADS
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Load the app and the model once in the master; forked workers share those pages copy-on-write
+preload_app = True
+
+timeout = Config.TIMEOUT
+graceful_timeout = 30
+keepalive = 5
+
+max_requests = Config.MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = Config.LOG_LEVEL.lower()
+
+def pre_fork(server, worker):
+    # Move the loaded model out of the garbage collector's reach, so collections in the
+    # workers do not write to (and copy) the shared pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Native thread pools (ONNX Runtime, OpenMP) do not survive fork; each worker sets up
+    # its own and runs a warm-up prediction before it accepts requests
+    from app import model_predictor
+    model_predictor.after_fork()
+    server.log.info(f"Worker {worker.pid} ready ({model_predictor.runtime})")
+`;
+};
+
 const generateDockerfile = (config) => {
   return `FROM python:3.9-slim
 
@@ -418,7 +923,10 @@ COPY . .
 
 EXPOSE 5000
 
-CMD ["python", "app.py"]
+# Ready once the workers have loaded and warmed up the model
+HEALTHCHECK --interval=30s --timeout=5s --start-period=60s CMD python -c "import os, urllib.request; urllib.request.urlopen('http://localhost:' + os.getenv('PORT', '5000') + '/ready')"
+
+CMD ["gunicorn", "--config", "gunicorn.conf.py", "app:app"]
 `;
 };
 
@@ -433,6 +941,19 @@ HOST=0.0.0.0
 # Model Configuration
 MODEL_PATH=model.pkl
 MAX_CONTENT_LENGTH=16777216
+MAX_BATCH_SIZE=10000
+
+# Micro-batching (coalesces concurrent /predict requests into one model call)
+# A gunicorn worker batches at most GUNICORN_THREADS rows at once; raise it when enabling this
+MICRO_BATCHING=false
+BATCH_MAX_ROWS=64
+BATCH_MAX_WAIT_MS=5
+
+# Production server (gunicorn -c gunicorn.conf.py app:app)
+WEB_CONCURRENCY=4
+GUNICORN_THREADS=2
+GUNICORN_TIMEOUT=120
+GUNICORN_MAX_REQUESTS=0
 
 # Logging
 LOG_LEVEL=INFO
@@ -503,6 +1024,23 @@ def test_prediction():
     print(json.dumps(response.json(), indent=2))
     return response.status_code == 200
 
+def test_batch_prediction():
+    """Test batch prediction endpoint"""
+    # Rows as lists; records or columnar data ({feature: [values]}) work as well
+    test_data = {
+        'data': [[1.0, 2.0, 3.0, 4.0, 5.0], [5.0, 4.0, 3.0, 2.0, 1.0]]  # Adjust based on your model
+    }
+    
+    response = requests.post(
+        f'{BASE_URL}/predict/batch',
+        json=test_data,
+        headers={'Content-Type': 'application/json'}
+    )
+    
+    print(f"Batch Prediction Test: {response.status_code}")
+    print(json.dumps(response.json(), indent=2))
+    return response.status_code == 200
+
 def test_model_info():
     """Test model info endpoint"""
     response = requests.get(f'{BASE_URL}/model/info')
@@ -516,15 +1054,18 @@ if __name__ == '__main__':
     
     try:
         health_ok = test_health()
-        print("\n" + "-" * 30)
+        print("\\n" + "-" * 30)
         
         info_ok = test_model_info()
-        print("\n" + "-" * 30)
+        print("\\n" + "-" * 30)
         
         pred_ok = test_prediction()
-        print("\n" + "=" * 50)
+        print("\\n" + "-" * 30)
+        
+        batch_ok = test_batch_prediction()
+        print("\\n" + "=" * 50)
         
-        if health_ok and info_ok and pred_ok:
+        if health_ok and info_ok and pred_ok and batch_ok:
             print("✅ All tests passed!")
         else:
             print("❌ Some tests failed!")
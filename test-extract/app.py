@@ -3,6 +3,7 @@ from flask_cors import CORS
 import os
 import logging
 from model import ModelPredictor
+from batching import MicroBatcher
 from config import Config
 
 # Configure logging
@@ -15,6 +16,17 @@ CORS(app)
 # Initialize model
 model_predictor = ModelPredictor()
 
+# The development server warms up here; under gunicorn (gunicorn.conf.py) every worker warms up after fork
+if os.getenv('MODEL_WARMUP', 'startup') == 'startup':
+    model_predictor.warm_up()
+
+# Optional micro-batching: concurrent /predict requests share one model call
+batcher = MicroBatcher(
+    model_predictor._predict_matrix,
+    max_rows=Config.BATCH_MAX_ROWS,
+    max_wait_ms=Config.BATCH_MAX_WAIT_MS
+) if Config.MICRO_BATCHING else None
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -25,6 +37,16 @@ def health_check():
         'version': '1.0.0'
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 503 until the model is loaded and warmed up"""
+    if not model_predictor.ready:
+        return jsonify({'status': 'warming_up'}), 503
+    return jsonify({
+        'status': 'ready',
+        'runtime': model_predictor.runtime
+    })
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """Make predictions"""
@@ -38,7 +60,7 @@ def predict():
             return jsonify({'error': 'No data field provided'}), 400
         
         # Make prediction
-        result = model_predictor.predict(input_data)
+        result = model_predictor.predict(input_data, batcher=batcher)
         
         return jsonify({
             'success': True,
@@ -53,6 +75,46 @@ def predict():
             'error': str(e)
         }), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Make predictions for many rows at once (list of rows, list of records or columnar data)"""
+    try:
+        if not request.json:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        
+        # Get input data
+        input_data = request.json.get('data')
+        if input_data is None:
+            return jsonify({'error': 'No data field provided'}), 400
+        
+        # Make predictions
+        result = model_predictor.predict_batch(input_data, max_rows=Config.MAX_BATCH_SIZE)
+        
+        return jsonify({
+            'success': True,
+            'predictions': result,
+            'task_type': 'classification'
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Micro-batching configuration and latency/throughput counters"""
+    return jsonify({
+        'micro_batching': batcher.stats() if batcher is not None else {'enabled': False}
+    })
+
 @app.route('/model/info', methods=['GET'])
 def model_info():
     """Get model information"""
@@ -61,6 +123,7 @@ def model_info():
         'task_type': 'classification',
         'version': '1.0.0',
         'features': model_predictor.get_feature_info(),
+        'runtime': model_predictor.runtime,
         'created_at': model_predictor.get_creation_time()
     })
 
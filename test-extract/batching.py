@@ -0,0 +1,146 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+import numpy as np
+
+class MicroBatcher:
+    """
+    Coalesce single-row predictions into batched model calls
+
+    Requests are queued for up to max_wait_ms or until max_rows are waiting; the queued
+    rows are then predicted with one vectorized model call and every request gets its
+    own row of the result back.
+    """
+
+    def __init__(self, predict_matrix, max_rows=64, max_wait_ms=5, timeout=30):
+        self.predict_matrix = predict_matrix
+        self.max_rows = max(1, max_rows)
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.started_at = time.time()
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._counters = {
+            'requests': 0,
+            'batches': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'max_batch_rows': 0,
+            'queue_seconds': 0.0,
+            'model_seconds': 0.0
+        }
+
+    def submit(self, X):
+        """Predict a (1, n_features) array; blocks until its batch has run"""
+        future = Future()
+        with self._condition:
+            # Started on first use so that every forked server worker gets its own thread
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._worker.start()
+            item = (X, future, time.perf_counter())
+            self._pending.append(item)
+            self._condition.notify()
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Nobody waits for this row any more: take it out of the queue, or cancel it so
+            # the worker skips it (a row already being predicted just finishes)
+            with self._condition:
+                try:
+                    self._pending.remove(item)
+                except ValueError:
+                    pass
+            future.cancel()
+            with self._stats_lock:
+                self._counters['timeouts'] += 1
+            raise
+
+    def _next_batch(self):
+        """
+        Wait for the first request, then collect more until max_rows or its deadline.
+        Requests cancelled by a timed out caller are dropped.
+        """
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(self.max_rows, len(self._pending)))]
+        # Once running, a request can no longer be cancelled and always gets its result
+        return [item for item in batch if item[1].set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            # Rows of different widths cannot be stacked; each width gets its own model call
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[0].shape[-1], []).append(item)
+            errors = sum(self._predict_group(items) for items in groups.values())
+            self._record(batch, started, time.perf_counter(), errors)
+
+    def _predict_group(self, items):
+        """Run one model call for items and fan the rows out; returns the number of failed requests"""
+        try:
+            result = self.predict_matrix(np.vstack([X for X, _, _ in items]))
+        except Exception as e:
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+                return 1
+            # A bad row must not fail the other requests of the batch
+            return sum(self._predict_group([item]) for item in items)
+        for i, (_, future, _) in enumerate(items):
+            future.set_result({key: values[i:i + 1] for key, values in result.items()})
+        return 0
+
+    def _record(self, batch, started, finished, errors):
+        with self._stats_lock:
+            counters = self._counters
+            counters['requests'] += len(batch)
+            counters['batches'] += 1
+            counters['errors'] += errors
+            counters['max_batch_rows'] = max(counters['max_batch_rows'], len(batch))
+            counters['queue_seconds'] += sum(started - enqueued for _, _, enqueued in batch)
+            counters['model_seconds'] += finished - started
+            self._latencies.extend(finished - enqueued for _, _, enqueued in batch)
+
+    def stats(self):
+        """Configuration plus latency and throughput counters"""
+        with self._stats_lock:
+            counters = dict(self._counters)
+            latencies = np.array(self._latencies) * 1000
+        requests = counters['requests']
+        batches = counters['batches']
+        return {
+            'enabled': True,
+            'max_rows': self.max_rows,
+            'max_wait_ms': self.max_wait * 1000,
+            'requests': requests,
+            'batches': batches,
+            'errors': counters['errors'],
+            'timeouts': counters['timeouts'],
+            'queued': len(self._pending),
+            'mean_batch_rows': round(requests / batches, 2) if batches else 0,
+            'max_batch_rows': counters['max_batch_rows'],
+            'mean_queue_ms': round(counters['queue_seconds'] / requests * 1000, 3) if requests else 0,
+            'mean_model_ms': round(counters['model_seconds'] / batches * 1000, 3) if batches else 0,
+            # Over the last 1000 requests
+            'latency_ms': {
+                'p50': round(float(np.percentile(latencies, 50)), 3),
+                'p95': round(float(np.percentile(latencies, 95)), 3),
+                'p99': round(float(np.percentile(latencies, 99)), 3)
+            } if len(latencies) else None,
+            'throughput_rps': round(requests / max(time.time() - self.started_at, 1e-9), 2)
+        }
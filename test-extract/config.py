@@ -17,6 +17,20 @@ class Config:
     # Model
     MODEL_PATH = os.getenv('MODEL_PATH', 'model.pkl')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
+    MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 10000))  # rows per /predict/batch request
+    
+    # Micro-batching of single-row /predict requests. Under gunicorn a worker serves at most
+    # GUNICORN_THREADS requests at once, so its batches hold at most that many rows: raise
+    # GUNICORN_THREADS (up to BATCH_MAX_ROWS) together with MICRO_BATCHING
+    MICRO_BATCHING = os.getenv('MICRO_BATCHING', 'false').lower() == 'true'
+    BATCH_MAX_ROWS = int(os.getenv('BATCH_MAX_ROWS', 64))  # run the batch once this many rows wait
+    BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 5))  # longest a request waits for others
+    
+    # Production server (gunicorn.conf.py)
+    WORKERS = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))  # worker processes
+    THREADS = int(os.getenv('GUNICORN_THREADS', 2))  # request threads per worker
+    TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', 120))  # seconds before a stuck worker is restarted
+    MAX_REQUESTS = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))  # restart workers after this many requests (0 = never)
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -0,0 +1,42 @@
+"""Production server configuration: gunicorn --config gunicorn.conf.py app:app"""
+
+import gc
+import os
+
+# Workers warm up the model after fork (see post_fork) instead of the master at import
+os.environ.setdefault('MODEL_WARMUP', 'post_fork')
+
+from config import Config
+
+bind = f"{Config.HOST}:{Config.PORT}"
+
+# Worker processes and request threads per worker
+workers = Config.WORKERS
+threads = Config.THREADS
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Load the app and the model once in the master; forked workers share those pages copy-on-write
+preload_app = True
+
+timeout = Config.TIMEOUT
+graceful_timeout = 30
+keepalive = 5
+
+max_requests = Config.MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = Config.LOG_LEVEL.lower()
+
+def pre_fork(server, worker):
+    # Move the loaded model out of the garbage collector's reach, so collections in the
+    # workers do not write to (and copy) the shared pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Native thread pools (ONNX Runtime, OpenMP) do not survive fork; each worker sets up
+    # its own and runs a warm-up prediction before it accepts requests
+    from app import model_predictor
+    model_predictor.after_fork()
+    server.log.info(f"Worker {worker.pid} ready ({model_predictor.runtime})")
@@ -4,12 +4,33 @@ from datetime import datetime
 import joblib
 import os
 
+def _clean_texts(texts):
+    """Text cleaning used at training time for text datasets (requires nltk)"""
+    import re
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import PorterStemmer, WordNetLemmatizer
+    nltk.download('stopwords', quiet=True)
+    nltk.download('wordnet', quiet=True)
+    ps = PorterStemmer()
+    lemmatizer = WordNetLemmatizer()
+    all_stopwords = set(stopwords.words('english'))
+    corpus = []
+    for text in texts:
+        words = re.sub('[^a-zA-Z]', ' ', str(text)).lower().split()
+        corpus.append(' '.join(lemmatizer.lemmatize(ps.stem(word)) for word in words if word not in all_stopwords))
+    return corpus
+
 class ModelPredictor:
     """Model prediction class for classification"""
     
     def __init__(self):
         self.model = None
+        self.session = None
+        self.runtime = 'sklearn'
+        self.preprocessor = None
         self.feature_names = []
+        self.ready = False
         self.created_at = datetime.now().isoformat()
         self.load_model()
     
@@ -27,6 +48,43 @@ class ModelPredictor:
         else:
             print("No model file found, creating mock model")
             self._create_mock_model()
+        
+        self._load_onnx()
+        self._load_preprocessor()
+        if self.session is not None and self.preprocessor is None:
+            # The exported graph includes the preprocessing and takes raw columns, which are
+            # only known from preprocessor.pkl
+            print("model.onnx needs preprocessor.pkl, using the pickled model")
+            self.session = None
+            self.runtime = 'sklearn'
+    
+    def _load_preprocessor(self):
+        """Load the preprocessing fitted at training time (preprocessor.pkl), once at startup"""
+        preprocessor_path = os.path.join(os.path.dirname(__file__), 'preprocessor.pkl')
+        if not os.path.exists(preprocessor_path):
+            return
+        try:
+            self.preprocessor = joblib.load(preprocessor_path)
+            self.feature_names = list(self.preprocessor['columns'])
+            print(f"Preprocessor loaded successfully from {preprocessor_path}")
+        except Exception as e:
+            print(f"Error loading preprocessor, inputs must be model-ready features: {e}")
+            self.preprocessor = None
+    
+    def _load_onnx(self):
+        """Predict with ONNX Runtime when model.onnx is present (the pickle stays as fallback)"""
+        onnx_path = os.path.join(os.path.dirname(__file__), 'model.onnx')
+        if not os.path.exists(onnx_path):
+            return
+        try:
+            import onnxruntime as ort
+            self.session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+            self.onnx_inputs = self.session.get_inputs()
+            self.runtime = 'onnxruntime'
+            print(f"ONNX model loaded successfully from {onnx_path}")
+        except Exception as e:
+            print(f"Error loading ONNX model, using the pickled model: {e}")
+            self.session = None
     
     def _create_mock_model(self):
         """Create a mock model for demonstration"""
@@ -48,11 +106,105 @@ class ModelPredictor:
             self.model.fit(X_mock, y_mock)
             self.feature_names = [f'feature_{i}' for i in range(5)]
     
-    def predict(self, input_data):
-        """Make prediction on input data"""
+    def _predict_matrix(self, X):
+        """Predict every row of X with a single model evaluation (class ids mapped back to labels)"""
+        result = self._evaluate(X)
+        encoder = self.preprocessor.get('label_encoder') if self.preprocessor else None
+        if encoder is not None:
+            result['predictions'] = encoder.inverse_transform(np.asarray(result['predictions']).astype(int)).tolist()
+        return result
+    
+    def _evaluate(self, X):
+        """Run the model once on every row of X"""
+        if self.session is not None:
+            # Exported classifiers return labels and a probability matrix, regressors only values
+            outputs = self.session.run(None, self._onnx_feeds(X))
+            result = {'predictions': np.asarray(outputs[0]).ravel().tolist()}
+            if len(outputs) > 1:
+                probabilities = np.asarray(outputs[1])
+                result['probabilities'] = probabilities.tolist()
+                result['confidence'] = probabilities.max(axis=1).tolist()
+            return result
+        if hasattr(self.model, 'predict_proba'):
+            probabilities = self.model.predict_proba(X)
+            # The predicted class is the most probable one, so predict() is not run as well
+            indices = probabilities.argmax(axis=1)
+            classes = getattr(self.model, 'classes_', None)
+            predictions = classes[indices] if classes is not None else indices
+            return {
+                'predictions': predictions.tolist(),
+                'probabilities': probabilities.tolist(),
+                'confidence': probabilities.max(axis=1).tolist()
+            }
+        return {
+            'predictions': np.asarray(self.model.predict(X)).ravel().tolist()
+        }
+    
+    def _to_frame(self, input_data):
+        """Raw rows as a DataFrame: list of rows, list of records, columnar data or a single record"""
+        if isinstance(input_data, dict):
+            if any(isinstance(v, list) for v in input_data.values()):
+                return pd.DataFrame(input_data)
+            return pd.DataFrame([input_data])
+        if input_data and isinstance(input_data[0], dict):
+            return pd.DataFrame(input_data)
+        return pd.DataFrame(input_data, columns=self.feature_names)
+    
+    def _onnx_feeds(self, X):
+        """
+        ONNX inputs for raw rows from _prepare: one (n, 1) tensor per column, matched by
+        position since the exporter sanitizes input names
+        """
+        feeds = {}
+        for i, graph_input in enumerate(self.onnx_inputs):
+            if graph_input.type == 'tensor(string)':
+                # Missing categories are fed as empty strings, which the exported imputer fills
+                values = pd.Series(X[:, i]).fillna('').astype(str).to_numpy(dtype=object)
+            else:
+                values = pd.to_numeric(pd.Series(X[:, i]), errors='coerce').to_numpy(dtype=np.float32)
+            feeds[graph_input.name] = values.reshape(-1, 1)
+        return feeds
+    
+    def _prepare(self, df):
+        """Apply the training-time preprocessing to a batch of raw rows (one transform call)"""
+        if self.session is not None:
+            # The ONNX graph preprocesses by itself; it gets the raw columns (text cleaned)
+            if self.preprocessor['kind'] == 'text':
+                texts = _clean_texts(df[self.preprocessor['text_column']])
+                return np.asarray(texts, dtype=object).reshape(-1, 1)
+            return df.reindex(columns=self.preprocessor['columns']).to_numpy(dtype=object)
+        if self.preprocessor['kind'] == 'text':
+            X = self.preprocessor['transformer'].transform(_clean_texts(df[self.preprocessor['text_column']]))
+        else:
+            # Missing columns become NaN and are filled by the fitted imputers
+            X = self.preprocessor['transformer'].transform(df.reindex(columns=self.preprocessor['columns']))
+        return X.toarray() if hasattr(X, 'toarray') else np.asarray(X)
+    
+    def _to_matrix(self, input_data):
+        """Convert a list of rows, a list of records or columnar data ({feature: [values]}) to a 2D array"""
+        if self.preprocessor is not None:
+            return self._prepare(self._to_frame(input_data))
+        if isinstance(input_data, dict):
+            names = self.feature_names or list(input_data)
+            n_rows = max((len(v) for v in input_data.values() if isinstance(v, list)), default=None)
+            if n_rows is None:
+                # A single record
+                return np.array([[input_data.get(name, 0) for name in names]], dtype=float)
+            return np.array([input_data.get(name, [0] * n_rows) for name in names], dtype=float).T
+        if isinstance(input_data, list) and input_data and isinstance(input_data[0], dict):
+            names = self.feature_names or list(input_data[0])
+            return np.array([[row.get(name, 0) for name in names] for row in input_data], dtype=float)
+        X = np.array(input_data, dtype=float)
+        return X.reshape(1, -1) if X.ndim < 2 else X
+    
+    def predict(self, input_data, batcher=None):
+        """Make prediction on input data (coalesced with other requests if a MicroBatcher is given)"""
         try:
             # Convert input to numpy array
-            if isinstance(input_data, list):
+            if self.preprocessor is not None:
+                # Raw feature values; the fitted preprocessing turns them into model inputs
+                X = self._prepare(self._to_frame([input_data] if isinstance(input_data, list) else input_data))
+            elif isinstance(input_data, list):
                 X = np.array(input_data).reshape(1, -1)
             elif isinstance(input_data, dict):
                 # Convert dict to ordered array based on feature names
@@ -61,22 +213,69 @@ class ModelPredictor:
                 X = np.array(input_data).reshape(1, -1)
             
             # Make prediction
-            if hasattr(self.model, 'predict_proba'):
-                probabilities = self.model.predict_proba(X)[0]
-                prediction = self.model.predict(X)[0]
+            result = batcher.submit(X) if batcher is not None else self._predict_matrix(X)
+            if 'probabilities' in result:
                 return {
-                    'prediction': int(prediction),
-                    'probabilities': probabilities.tolist(),
-                    'confidence': float(np.max(probabilities))
+                    'prediction': result['predictions'][0],
+                    'probabilities': result['probabilities'][0],
+                    'confidence': result['confidence'][0]
                 }
             else:
-                prediction = self.model.predict(X)[0]
                 return {
-                    'prediction': float(prediction)
+                    'prediction': float(result['predictions'][0])
                 }
         except Exception as e:
             raise Exception(f"Prediction failed: {str(e)}")
     
+    def predict_batch(self, input_data, max_rows=None):
+        """
+        Make predictions for many rows with one model evaluation
+        
+        Returns lists with one entry per row: predictions, and for classifiers
+        probabilities and confidence
+        """
+        X = self._to_matrix(input_data)
+        if max_rows is not None and len(X) > max_rows:
+            raise ValueError(f"Batch of {len(X)} rows exceeds the limit of {max_rows}")
+        try:
+            result = self._predict_matrix(X)
+        except Exception as e:
+            raise Exception(f"Batch prediction failed: {str(e)}")
+        result['count'] = len(X)
+        return result
+    
+    def warm_up(self):
+        """
+        Run one prediction so lazy initialization is done before the first request
+        
+        Sets ready only once a prediction succeeded; an ONNX model that fails is dropped
+        for the pickled model first.
+        """
+        try:
+            if self.preprocessor is not None:
+                # An empty record: the fitted imputers fill every column
+                X = self._prepare(pd.DataFrame([{}], columns=self.feature_names))
+            else:
+                X = np.zeros((1, getattr(self.model, 'n_features_in_', len(self.feature_names))))
+            self._predict_matrix(X)
+        except Exception as e:
+            if self.session is None:
+                print(f"Model warm-up failed, not ready: {e}")
+                return
+            print(f"ONNX warm-up failed, using the pickled model: {e}")
+            self.session = None
+            self.runtime = 'sklearn'
+            return self.warm_up()
+        print(f"Model warmed up ({self.runtime})")
+        self.ready = True
+    
+    def after_fork(self):
+        """Per-worker setup under a pre-fork server (the model itself stays shared with the master)"""
+        if self.session is not None:
+            # ONNX Runtime thread pools do not survive fork; the worker needs its own session
+            self._load_onnx()
+        self.warm_up()
+    
     def get_feature_info(self):
         """Get information about model features"""
         return {
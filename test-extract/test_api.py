@@ -30,6 +30,23 @@ def test_prediction():
     print(json.dumps(response.json(), indent=2))
     return response.status_code == 200
 
+def test_batch_prediction():
+    """Test batch prediction endpoint"""
+    # Rows as lists; records or columnar data ({feature: [values]}) work as well
+    test_data = {
+        'data': [[1.0, 2.0, 3.0, 4.0, 5.0], [5.0, 4.0, 3.0, 2.0, 1.0]]  # Adjust based on your model
+    }
+    
+    response = requests.post(
+        f'{BASE_URL}/predict/batch',
+        json=test_data,
+        headers={'Content-Type': 'application/json'}
+    )
+    
+    print(f"Batch Prediction Test: {response.status_code}")
+    print(json.dumps(response.json(), indent=2))
+    return response.status_code == 200
+
 def test_model_info():
     """Test model info endpoint"""
     response = requests.get(f'{BASE_URL}/model/info')
@@ -43,18 +60,18 @@ if __name__ == '__main__':
     
     try:
         health_ok = test_health()
-        print("
-" + "-" * 30)
+        print("\n" + "-" * 30)
         
         info_ok = test_model_info()
-        print("
-" + "-" * 30)
+        print("\n" + "-" * 30)
         
         pred_ok = test_prediction()
-        print("
-" + "=" * 50)
+        print("\n" + "-" * 30)
+        
+        batch_ok = test_batch_prediction()
+        print("\n" + "=" * 50)
         
-        if health_ok and info_ok and pred_ok:
+        if health_ok and info_ok and pred_ok and batch_ok:
             print("✅ All tests passed!")
         else:
             print("❌ Some tests failed!")